@@ -0,0 +1,63 @@
+"""Latency of single-request vs sentence-chunked parallel TTS as text length grows.
+
+Usage: python -m benchmarks.bench_chunked_tts [--ms-per-char 8] [--base-ms 300]
+
+The fake ElevenLabs client sleeps ``base + ms_per_char * len(text)`` and
+returns valid MP3 frames, so the numbers include the real split and concat.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from src.services.audio import AudioService
+
+SENTENCE = "叶片通过光合作用把阳光转化为化学能。"
+FRAME = b"\xff\xfb\x90\x00" + b"\x00" * 413
+
+
+class FakeElevenLabsClient:
+    voice_id = "bench"
+
+    def __init__(self, base_ms: float, ms_per_char: float) -> None:
+        self.base = base_ms / 1000
+        self.per_char = ms_per_char / 1000
+
+    async def synthesize_speech(self, *, text: str, model_id: str, output_format: str) -> bytes:
+        await asyncio.sleep(self.base + self.per_char * len(text))
+        return FRAME * max(1, len(text) // 4)
+
+
+async def measure(service: AudioService, text: str) -> float:
+    started = time.perf_counter()
+    await service.synthesize(text)
+    return (time.perf_counter() - started) * 1000
+
+
+async def main(base_ms: float, ms_per_char: float) -> None:
+    client = FakeElevenLabsClient(base_ms, ms_per_char)
+    single = AudioService(elevenlabs_client=client, storage_service=None)  # type: ignore[arg-type]
+    chunked = AudioService(
+        elevenlabs_client=client,  # type: ignore[arg-type]
+        storage_service=None,  # type: ignore[arg-type]
+        chunk_threshold_chars=160,
+        chunk_max_chars=120,
+        max_parallel_chunks=4,
+    )
+
+    print(f"{'chars':>6} {'single ms':>10} {'chunked ms':>11} {'speedup':>8}")
+    for sentences in (2, 5, 10, 20, 40):
+        text = SENTENCE * sentences
+        single_ms = await measure(single, text)
+        chunked_ms = await measure(chunked, text)
+        print(f"{len(text):>6} {single_ms:>10.0f} {chunked_ms:>11.0f} {single_ms / chunked_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-ms", type=float, default=300)
+    parser.add_argument("--ms-per-char", type=float, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.base_ms, args.ms_per_char))
@@ -0,0 +1,65 @@
+"""Compare per-call httpx clients with the shared, lifespan-managed pool.
+
+Usage: python -m benchmarks.bench_http_pool [--requests 200] [--concurrency 10]
+
+The stub server speaks plain HTTP, so the numbers only include TCP setup.
+Against real upstreams every avoided connection also saves a TLS handshake.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.stub_server import StubServer
+from src.clients.http_pool import build_http_client
+
+
+async def _per_call(url: str) -> None:
+    async with httpx.AsyncClient(timeout=10) as client:
+        (await client.post(url, json={"query": "bench"})).raise_for_status()
+
+
+async def _pooled(client: httpx.AsyncClient, url: str) -> None:
+    (await client.post(url, json={"query": "bench"})).raise_for_status()
+
+
+async def _drive(factory, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await factory()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - started
+
+
+async def main(total: int, concurrency: int) -> None:
+    server = await StubServer().start()
+    url = f"{server.base_url}/chat-messages"
+    try:
+        elapsed = await _drive(lambda: _per_call(url), total, concurrency)
+        print(f"per-call clients : {elapsed * 1000:8.1f} ms  connections={server.connections}")
+
+        server.connections = 0
+        client = build_http_client(timeout=10)
+        try:
+            elapsed = await _drive(lambda: _pooled(client, url), total, concurrency)
+        finally:
+            await client.aclose()
+        print(f"shared pool      : {elapsed * 1000:8.1f} ms  connections={server.connections}")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
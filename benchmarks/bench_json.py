@@ -0,0 +1,92 @@
+"""Micro-benchmarks for response serialization and Dify answer parsing.
+
+Usage: python -m benchmarks.bench_json [--number 20000]
+
+Compares the previous paths (dict round trip through FastAPI's encoder and
+``json.dumps``; regex fence stripping plus ``json.loads``) with the helpers in
+``src.utils.serialization``. Run once with and once without orjson installed
+to see what the optional dependency adds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from src.models.response import CardGenerationResponse, ChatResponse
+from src.utils.serialization import ModelResponse, dumps, orjson_available, parse_fenced_json
+
+CARD_RESULT = {
+    "title": "银杏叶",
+    "desc": "银杏是现存最古老的种子植物之一，扇形叶片在秋季转为金黄色。" * 6,
+    "central_object": "ginkgo leaf",
+    "highlighted_image_url": "https://cdn.example.com/highlighted_image/1712345678_abcdef12.png",
+    "highlighted_thumbnail_url": "https://cdn.example.com/highlighted_thumbnail/1712345678_abcdef12.webp",
+    "audio_url": "https://cdn.example.com/card_audio/1712345678_abcdef12.mp3",
+}
+CHAT_RESULT = {
+    "answer": "银杏原产中国，常被称为“活化石”。它的种子在烹饪中使用，但生食有毒。" * 4,
+    "conversation_id": "5f0c4a4e-2d5e-4b8e-9a77-1c2f7e9b0d11",
+    "audio_url": None,
+}
+CARD_ANSWER = "```json\n{}\n```".format(
+    json.dumps({"title": CARD_RESULT["title"], "desc": CARD_RESULT["desc"]}, ensure_ascii=False, indent=2)
+)
+
+CODE_BLOCK_PATTERN = re.compile(r"^```(?:json)?\s*(?P<body>.*?)\s*```$", re.DOTALL | re.IGNORECASE)
+
+
+def _previous_response(model_type, result) -> bytes:
+    # What the routes used to do: build the model, let FastAPI re-validate and
+    # encode it to a dict, then render with json.dumps.
+    model = model_type.model_validate(model_type(**result))
+    content = jsonable_encoder(model)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _direct_response(model_type, result) -> bytes:
+    return ModelResponse(model_type(**result)).body
+
+
+def _previous_parse(answer: str):
+    text = answer.strip()
+    match = CODE_BLOCK_PATTERN.match(text)
+    if match:
+        text = match.group("body").strip()
+    return json.loads(text)
+
+
+def _report(label: str, number: int, *candidates) -> None:
+    timings = [(name, min(timeit.repeat(func, number=number, repeat=3)) / number) for name, func in candidates]
+    baseline = timings[0][1]
+    for name, seconds in timings:
+        print(f"{label:<6} {name:<22} {seconds * 1e6:8.2f} us  x{baseline / seconds:4.1f}")
+
+
+def main(number: int) -> None:
+    print(f"orjson available: {orjson_available()}")
+    payloads = (("card", CardGenerationResponse, CARD_RESULT), ("chat", ChatResponse, CHAT_RESULT))
+    for label, model_type, result in payloads:
+        _report(
+            label,
+            number,
+            ("dict round trip", lambda: _previous_response(model_type, result)),
+            ("ModelResponse", lambda: _direct_response(model_type, result)),
+            ("dumps(dict)", lambda: dumps(result)),
+        )
+    _report(
+        "parse",
+        number,
+        ("regex + json.loads", lambda: _previous_parse(CARD_ANSWER)),
+        ("parse_fenced_json", lambda: parse_fenced_json(CARD_ANSWER)),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    main(parser.parse_args().number)
@@ -0,0 +1,330 @@
+"""Closed-loop load test of the API against local upstream stand-ins.
+
+Usage: python -m benchmarks.loadtest [--duration 20] [--concurrency 16]
+       [--mix upload=1,card=2,chat=3] [--time-scale 0.05]
+       [--profile dify:median=2.0,error_rate=0.02] [--save-baseline]
+
+Starts the stand-ins from ``benchmarks.standins``, launches the API with
+uvicorn in a subprocess pointed at them (caches off, so every request reaches
+the stand-ins), drives ``images/upload``, ``cards/generate`` and ``chat/``
+under ``/api/v1`` with ``--concurrency`` virtual users and prints RPS,
+p50/p95/p99 latency and error rate per scenario, peak RSS of the API process
+and event-loop lag read from ``/metrics``.
+
+The report is compared with ``benchmarks/baseline.json``; latency, RSS or
+lag more than ``--tolerance`` above the baseline, or RPS that far below it,
+exits with status 1. Baselines are machine specific: regenerate one with
+``--save-baseline`` before comparing on new hardware.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.standins import DEFAULT_PROFILES, LatencyProfile, StandInCluster
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+SCENARIOS = ("upload", "card", "chat")
+API_PREFIX = "/api/v1"
+
+
+@dataclass
+class ScenarioStats:
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, seconds: float, status: str) -> None:
+        self.latencies.append(seconds)
+        self.statuses[status] += 1
+
+    def summary(self, duration: float) -> Dict[str, float]:
+        ordered = sorted(self.latencies)
+        failed = sum(count for status, count in self.statuses.items() if not status.startswith("2"))
+        return {
+            "requests": len(ordered),
+            "rps": round(len(ordered) / duration, 2),
+            "p50_ms": _percentile_ms(ordered, 0.50),
+            "p95_ms": _percentile_ms(ordered, 0.95),
+            "p99_ms": _percentile_ms(ordered, 0.99),
+            "error_rate": round(failed / len(ordered), 4) if ordered else 0.0,
+        }
+
+
+def _percentile_ms(ordered: List[float], quantile: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(quantile * len(ordered)) - 1))
+    return round(ordered[index] * 1000, 1)
+
+
+def _sample_image() -> Tuple[bytes, str, str]:
+    try:
+        from PIL import Image
+    except ImportError:
+        # Not a decodable JPEG, but enough for the upload route without Pillow.
+        return b"\xff\xd8\xff\xe0" + os.urandom(64 * 1024) + b"\xff\xd9", "bench.jpg", "image/jpeg"
+    image = Image.effect_noise((1024, 768), 64).convert("RGB")
+    output = BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue(), "bench.jpg", "image/jpeg"
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, *, mix: Dict[str, int], image_base_url: str, seed: int) -> None:
+        self.base_url = base_url
+        self.image_base_url = image_base_url
+        self._scenarios = [name for name, weight in mix.items() for _ in range(weight)]
+        self._rng = random.Random(seed)
+        self._image = _sample_image()
+        self._sequence = 0
+        self.stats: Dict[str, ScenarioStats] = {name: ScenarioStats() for name in mix}
+
+    async def run(self, *, duration: float, concurrency: int) -> float:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=120, limits=limits) as client:
+            deadline = time.perf_counter() + duration
+            started = time.perf_counter()
+            await asyncio.gather(*(self._user(client, deadline) for _ in range(concurrency)))
+            return time.perf_counter() - started
+
+    async def _user(self, client: httpx.AsyncClient, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            scenario = self._rng.choice(self._scenarios)
+            started = time.perf_counter()
+            try:
+                response = await getattr(self, f"_{scenario}")(client)
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            self.stats[scenario].record(time.perf_counter() - started, status)
+
+    async def _upload(self, client: httpx.AsyncClient) -> httpx.Response:
+        data, filename, content_type = self._image
+        return await client.post("/images/upload", files={"file": (filename, data, content_type)})
+
+    async def _card(self, client: httpx.AsyncClient) -> httpx.Response:
+        # A unique URL per request keeps singleflight and caches out of the measurement.
+        self._sequence += 1
+        image_url = f"{self.image_base_url}/bench/original/{self._sequence}.jpg"
+        return await client.post("/cards/generate", json={"image_url": image_url})
+
+    async def _chat(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.post(
+            "/chat/",
+            json={"card_context": "Teapot: a vessel for steeping tea.", "question": "Where was it invented?"},
+        )
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_api(port: int, environment: Dict[str, str]) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        **environment,
+        "LOG_LEVEL": "WARNING",
+        "CARD_CACHE_BACKEND": "none",
+        "PREPROCESS_CACHE_BACKEND": "none",
+        "TTS_CACHE_BACKEND": "none",
+    }
+    command = [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--no-access-log"]
+    return subprocess.Popen(command, env=env, cwd=Path(__file__).resolve().parent.parent)
+
+
+async def _wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=2) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"API exited with status {process.returncode}")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API did not become ready")
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+async def _sample_rss(pid: int, samples: List[int], interval: float = 0.5) -> None:
+    while True:
+        rss = _rss_bytes(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+def _loop_lag(metrics_text: str) -> Dict[str, float]:
+    """Mean and bucketed p99 of ``snapopedia_event_loop_lag_seconds`` from a scrape."""
+    buckets: List[Tuple[float, float]] = []
+    total = count = 0.0
+    for line in metrics_text.splitlines():
+        if line.startswith("snapopedia_event_loop_lag_seconds_bucket"):
+            bound = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets.append((float("inf") if bound == "+Inf" else float(bound), float(line.rsplit(" ", 1)[1])))
+        elif line.startswith("snapopedia_event_loop_lag_seconds_sum"):
+            total = float(line.rsplit(" ", 1)[1])
+        elif line.startswith("snapopedia_event_loop_lag_seconds_count"):
+            count = float(line.rsplit(" ", 1)[1])
+    if not count:
+        return {"mean_ms": 0.0, "p99_ms": 0.0}
+    p99 = next((bound for bound, cumulative in buckets if cumulative >= 0.99 * count), float("inf"))
+    return {"mean_ms": round(total / count * 1000, 2), "p99_ms": round(p99 * 1000, 2)}
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Describe every metric that regressed by more than ``tolerance`` (a fraction)."""
+    regressions: List[str] = []
+
+    def check(label: str, current: float, previous: float, higher_is_worse: bool = True) -> None:
+        if not previous:
+            return
+        change = (current - previous) / previous
+        if (change > tolerance) if higher_is_worse else (change < -tolerance):
+            regressions.append(f"{label}: {previous} -> {current} ({change:+.0%})")
+
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        check(f"{name} rps", current["rps"], previous["rps"], higher_is_worse=False)
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            check(f"{name} {key}", current[key], previous[key])
+        if current["error_rate"] > previous["error_rate"] + tolerance / 10:
+            regressions.append(f"{name} error_rate: {previous['error_rate']} -> {current['error_rate']}")
+    check("rss_peak_mb", report["rss_peak_mb"], baseline.get("rss_peak_mb", 0))
+    previous_lag = baseline.get("event_loop_lag", {}).get("mean_ms", 0)
+    check("event_loop_lag mean_ms", report["event_loop_lag"]["mean_ms"], previous_lag)
+    return regressions
+
+
+def _print_report(report: Dict) -> None:
+    print(f"{'scenario':<8} {'reqs':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, row in report["scenarios"].items():
+        print(
+            f"{name:<8} {row['requests']:>6} {row['rps']:>8} {row['p50_ms']:>9} "
+            f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['error_rate']:>7.2%}"
+        )
+    lag = report["event_loop_lag"]
+    print(f"rss peak {report['rss_peak_mb']} MB, event-loop lag mean {lag['mean_ms']} ms / p99 <= {lag['p99_ms']} ms")
+    print(f"upstream calls: {json.dumps(report['upstreams'])}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    profiles = dict(DEFAULT_PROFILES)
+    for spec in args.profile:
+        name, _, settings = spec.partition(":")
+        profiles[name] = LatencyProfile.parse(settings, profiles[name])
+
+    cluster = StandInCluster(profiles, time_scale=args.time_scale, seed=args.seed).start()
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = _start_api(port, cluster.environment())
+    try:
+        await _wait_ready(base_url, process)
+        generator = LoadGenerator(base_url + API_PREFIX, mix=args.mix, image_base_url=cluster.url("s3"), seed=args.seed)
+        rss_samples: List[int] = []
+        sampler = asyncio.create_task(_sample_rss(process.pid, rss_samples))
+        try:
+            elapsed = await generator.run(duration=args.duration, concurrency=args.concurrency)
+        finally:
+            sampler.cancel()
+        async with httpx.AsyncClient(base_url=base_url, timeout=10) as client:
+            metrics_text = (await client.get("/metrics")).text
+    finally:
+        process.terminate()
+        process.wait(timeout=15)
+        cluster.stop()
+
+    report = {
+        "config": {
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "time_scale": args.time_scale,
+            "mix": args.mix,
+        },
+        "scenarios": {name: stats.summary(elapsed) for name, stats in generator.stats.items()},
+        "rss_peak_mb": round(max(rss_samples, default=0) / 2**20, 1),
+        "event_loop_lag": _loop_lag(metrics_text),
+        "upstreams": cluster.counters(),
+    }
+    _print_report(report)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print("no baseline to compare with; run with --save-baseline first")
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("config") != report["config"]:
+        print("warning: baseline was recorded with a different configuration")
+    regressions = compare(report, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"no regressions beyond {args.tolerance:.0%} of the baseline")
+    return 1 if regressions else 0
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix: Dict[str, int] = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+        if int(weight or 1) > 0:
+            mix[name] = int(weight or 1)
+    if not mix:
+        raise argparse.ArgumentTypeError("the mix needs at least one scenario")
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("upload=1,card=2,chat=3"))
+    parser.add_argument("--time-scale", type=float, default=0.05, help="multiplier for stand-in latencies")
+    parser.add_argument(
+        "--profile",
+        action="append",
+        default=[],
+        metavar="UPSTREAM:SETTINGS",
+        help="override a stand-in, e.g. openrouter:median=4,sigma=0.6,error_rate=0.05",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    sys.exit(asyncio.run(main(parser.parse_args())))
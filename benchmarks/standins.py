@@ -0,0 +1,325 @@
+"""Local stand-ins for Dify, OpenRouter, ElevenLabs and S3 used by the load test.
+
+Each stand-in is a small Starlette app with a ``LatencyProfile``: every
+request sleeps for a log-normally distributed time and fails with
+``error_status`` at ``error_rate``. Responses are just realistic enough for
+the real clients to parse, so the API runs its normal code paths end to end.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import random
+import socket
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+PREPROCESS_KEY = "bench-preprocess"
+CARD_KEY = "bench-card"
+QA_KEY = "bench-qa"
+
+# 1x1 transparent PNG: the smallest payload the highlight node can decode.
+HIGHLIGHT_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+FAKE_MP3 = b"ID3\x03\x00\x00\x00\x00\x00\x00" + b"\xff\xfb\x90\x00" * 4096
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Log-normal latency (``median`` seconds, shape ``sigma``) plus error injection."""
+
+    median: float
+    sigma: float = 0.3
+    error_rate: float = 0.0
+    error_status: int = 503
+
+    def sample(self, rng: random.Random, time_scale: float) -> float:
+        if self.median <= 0:
+            return 0.0
+        return rng.lognormvariate(0.0, self.sigma) * self.median * time_scale
+
+    def fails(self, rng: random.Random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+    @classmethod
+    def parse(cls, spec: str, base: "LatencyProfile") -> "LatencyProfile":
+        """Apply ``median=0.8,sigma=0.4,error_rate=0.01,error_status=500`` on top of ``base``."""
+        changes: Dict[str, float] = {}
+        for item in filter(None, spec.split(",")):
+            name, _, value = item.partition("=")
+            name = name.strip()
+            if name not in {"median", "sigma", "error_rate", "error_status"}:
+                raise ValueError(f"unknown latency setting: {name}")
+            changes[name] = int(value) if name == "error_status" else float(value)
+        return replace(base, **changes)
+
+
+# Medians are rough production figures; ``time_scale`` shrinks them for quick runs.
+DEFAULT_PROFILES: Dict[str, LatencyProfile] = {
+    "dify": LatencyProfile(median=2.0, sigma=0.35),
+    "openrouter": LatencyProfile(median=6.0, sigma=0.4),
+    "elevenlabs": LatencyProfile(median=1.5, sigma=0.3),
+    "s3": LatencyProfile(median=0.08, sigma=0.5),
+}
+
+
+class StandIn:
+    """One stand-in app; ``handle`` applies the latency profile before building the response."""
+
+    def __init__(self, name: str, profile: LatencyProfile, *, time_scale: float, seed: int) -> None:
+        self.name = name
+        self.profile = profile
+        self.time_scale = time_scale
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+
+    async def delay_or_fail(self) -> Optional[Response]:
+        self.requests += 1
+        await asyncio.sleep(self.profile.sample(self._rng, self.time_scale))
+        if self.profile.fails(self._rng):
+            self.errors += 1
+            return JSONResponse({"message": "injected failure"}, status_code=self.profile.error_status)
+        return None
+
+    def app(self) -> Starlette:
+        raise NotImplementedError
+
+
+class DifyStandIn(StandIn):
+    """``POST /v1/chat-messages``; the bearer key selects the preprocess, card or QA answer."""
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[Route("/v1/chat-messages", self.chat_messages, methods=["POST"])])
+
+    async def chat_messages(self, request: Request) -> Response:
+        payload = await request.json()
+        failure = await self.delay_or_fail()
+        if failure is not None:
+            return failure
+
+        key = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if key == PREPROCESS_KEY:
+            answer = json.dumps({"image_status": "clear", "central_object": "teapot"})
+        elif key == CARD_KEY:
+            answer = "```json\n" + json.dumps(
+                {"title": "Teapot", "desc": "A vessel for steeping tea leaves in hot water."}
+            ) + "\n```"
+        else:
+            answer = f"Stand-in answer to: {payload.get('query', '')[:64]}"
+        return JSONResponse(
+            {
+                "event": "message",
+                "answer": answer,
+                "conversation_id": payload.get("conversation_id") or uuid4().hex,
+                "message_id": uuid4().hex,
+            }
+        )
+
+
+class OpenRouterStandIn(StandIn):
+    """``POST /api/v1/chat/completions`` returning a highlight image as a data URL."""
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[Route("/api/v1/chat/completions", self.completions, methods=["POST"])])
+
+    async def completions(self, request: Request) -> Response:
+        payload = await request.json()
+        failure = await self.delay_or_fail()
+        if failure is not None:
+            return failure
+        data_url = "data:image/png;base64," + base64.b64encode(HIGHLIGHT_PNG).decode("ascii")
+        return JSONResponse(
+            {
+                "id": f"gen-{uuid4().hex}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": payload.get("model", "stand-in"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": "",
+                            "images": [{"type": "image_url", "image_url": {"url": data_url}}],
+                        },
+                    }
+                ],
+            }
+        )
+
+
+class ElevenLabsStandIn(StandIn):
+    """``POST /v1/text-to-speech/{voice}`` (and ``/stream``) returning fixed MP3-ish bytes."""
+
+    def app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/v1/text-to-speech/{voice}", self.tts, methods=["POST"]),
+                Route("/v1/text-to-speech/{voice}/stream", self.tts, methods=["POST"]),
+            ]
+        )
+
+    async def tts(self, request: Request) -> Response:
+        await request.body()
+        failure = await self.delay_or_fail()
+        if failure is not None:
+            return failure
+        return Response(FAKE_MP3, media_type="audio/mpeg")
+
+
+class S3StandIn(StandIn):
+    """Path-style S3 subset used by ``R2Client``: PUT/HEAD objects and multipart uploads."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.objects: Dict[str, int] = {}
+        self._uploads: Dict[str, List[int]] = {}
+
+    def app(self) -> Starlette:
+        return Starlette(
+            routes=[Route("/{bucket}/{key:path}", self.object, methods=["PUT", "HEAD", "POST", "DELETE"])]
+        )
+
+    async def object(self, request: Request) -> Response:
+        body = await request.body()
+        path = request.url.path
+        query = request.query_params
+
+        if request.method == "HEAD":
+            return Response(status_code=200 if path in self.objects else 404)
+
+        failure = await self.delay_or_fail()
+        if failure is not None:
+            return Response(status_code=failure.status_code)
+
+        if request.method == "POST" and "uploads" in query:
+            upload_id = uuid4().hex
+            self._uploads[upload_id] = []
+            return _xml(
+                "InitiateMultipartUploadResult",
+                f"<Bucket>{request.path_params['bucket']}</Bucket>"
+                f"<Key>{request.path_params['key']}</Key><UploadId>{upload_id}</UploadId>",
+            )
+        if request.method == "POST" and "uploadId" in query:
+            self.objects[path] = sum(self._uploads.pop(query["uploadId"], []))
+            return _xml(
+                "CompleteMultipartUploadResult",
+                f'<Key>{request.path_params["key"]}</Key><ETag>"{uuid4().hex}"</ETag>',
+            )
+        if request.method == "DELETE":
+            self._uploads.pop(query.get("uploadId", ""), None)
+            return Response(status_code=204)
+        if "partNumber" in query:
+            self._uploads.setdefault(query["uploadId"], []).append(len(body))
+        else:
+            self.objects[path] = len(body)
+        return Response(status_code=200, headers={"ETag": f'"{uuid4().hex}"'})
+
+
+def _xml(root: str, inner: str) -> Response:
+    body = f'<?xml version="1.0" encoding="UTF-8"?><{root}>{inner}</{root}>'
+    return Response(body, media_type="application/xml")
+
+
+STAND_INS = {
+    "dify": DifyStandIn,
+    "openrouter": OpenRouterStandIn,
+    "elevenlabs": ElevenLabsStandIn,
+    "s3": S3StandIn,
+}
+
+
+class StandInCluster:
+    """Serve every stand-in from one background thread with its own event loop.
+
+    Keeping them off the load generator's loop means stand-in work does not
+    show up as client-side latency.
+    """
+
+    def __init__(
+        self,
+        profiles: Optional[Dict[str, LatencyProfile]] = None,
+        *,
+        time_scale: float = 1.0,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+    ) -> None:
+        profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+        self.host = host
+        self.stand_ins = {
+            name: factory(name, profiles[name], time_scale=time_scale, seed=seed + index)
+            for index, (name, factory) in enumerate(STAND_INS.items())
+        }
+        self.ports: Dict[str, int] = {}
+        self._servers: List[uvicorn.Server] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def url(self, name: str) -> str:
+        return f"http://{self.host}:{self.ports[name]}"
+
+    def environment(self) -> Dict[str, str]:
+        """Settings that point the API at the stand-ins."""
+        return {
+            "DIFY_BASE_URL": f"{self.url('dify')}/v1",
+            "DIFY_API_KEY_PREPROCESSING": PREPROCESS_KEY,
+            "DIFY_API_KEY_CARD_GEN": CARD_KEY,
+            "DIFY_API_KEY_QA": QA_KEY,
+            "OPENROUTER_BASE_URL": f"{self.url('openrouter')}/api/v1",
+            "OPENROUTER_API_KEY": "bench",
+            "ELEVENLABS_BASE_URL": f"{self.url('elevenlabs')}/v1",
+            "ELEVENLABS_API_KEY": "bench",
+            "ELEVENLABS_VOICE_ID": "bench-voice",
+            "R2_ENDPOINT": self.url("s3"),
+            "R2_ACCESS_KEY_ID": "bench",
+            "R2_SECRET_ACCESS_KEY": "bench",
+            "R2_BUCKET_NAME": "bench",
+            "R2_PUBLIC_URL": f"{self.url('s3')}/bench",
+        }
+
+    def start(self) -> "StandInCluster":
+        sockets = []
+        for name, stand_in in self.stand_ins.items():
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.host, 0))
+            self.ports[name] = sock.getsockname()[1]
+            sockets.append(sock)
+            config = uvicorn.Config(stand_in.app(), log_level="warning", access_log=False, lifespan="off")
+            self._servers.append(uvicorn.Server(config))
+
+        started = threading.Event()
+
+        async def serve() -> None:
+            tasks = [asyncio.create_task(server.serve(sockets=[sock])) for server, sock in zip(self._servers, sockets)]
+            while not all(server.started for server in self._servers):
+                await asyncio.sleep(0.01)
+            started.set()
+            await asyncio.gather(*tasks)
+
+        self._thread = threading.Thread(target=asyncio.run, args=(serve(),), name="stand-ins", daemon=True)
+        self._thread.start()
+        if not started.wait(timeout=10):
+            raise RuntimeError("stand-in servers did not start")
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers:
+            server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def counters(self) -> Dict[str, Dict[str, int]]:
+        return {name: {"requests": s.requests, "errors": s.errors} for name, s in self.stand_ins.items()}
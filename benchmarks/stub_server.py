@@ -0,0 +1,59 @@
+"""Minimal keep-alive HTTP/1.1 stub server used by the offline benchmarks."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+RESPONSE_BODY = b'{"answer": "{}", "conversation_id": "bench"}'
+
+
+@dataclass
+class StubServer:
+    host: str = "127.0.0.1"
+    port: int = 0
+    delay: float = 0.0
+    body_factory: Callable[[bytes], bytes] = field(default=lambda _: RESPONSE_BODY)
+    connections: int = 0
+    requests: int = 0
+    _server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> "StubServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                body = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                payload = self.body_factory(body)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+                    + f"content-length: {len(payload)}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
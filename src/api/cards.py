@@ -1,23 +1,90 @@
 from http import HTTPStatus
+from typing import AsyncIterator
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
 from src.models.request import CardGenerationRequest
-from src.models.response import CardGenerationResponse
+from src.models.response import CardGenerationResponse, CardJobResponse
+from src.services.jobs import CardJobService, Job, get_card_job_service
 from src.services.pipeline import PipelineService, get_pipeline_service
+from src.utils.admission import AdmissionTicket, admission_slot, admission_ticket
+from src.utils.deadline import request_deadline
+from src.utils.errors import AppException, ErrorCode, format_error_response
+from src.utils.logger import get_logger
+from src.utils.serialization import ModelResponse
+from src.utils.sse import SSE_HEADERS, format_sse
 
 router = APIRouter(prefix="/cards", tags=["cards"])
+logger = get_logger(__name__)
 
 
 def get_service() -> PipelineService:
     return get_pipeline_service()
 
 
-@router.post("/generate", response_model=CardGenerationResponse, status_code=HTTPStatus.OK)
+@router.post(
+    "/generate",
+    response_model=CardGenerationResponse,
+    status_code=HTTPStatus.OK,
+    dependencies=[Depends(request_deadline("cards")), Depends(admission_slot("cards"))],
+)
 async def generate_card(
     request: CardGenerationRequest,
     service: PipelineService = Depends(get_service),
-) -> CardGenerationResponse:
+) -> Response:
     payload = request.model_dump(mode="json")
     result = await service.generate_card(payload)
-    return CardGenerationResponse(**result)
+    return ModelResponse(CardGenerationResponse(**result))
+
+
+@router.post("/generate/stream", status_code=HTTPStatus.OK)
+async def generate_card_stream(
+    request: CardGenerationRequest,
+    service: PipelineService = Depends(get_service),
+    ticket: AdmissionTicket = Depends(admission_ticket("cards")),
+) -> StreamingResponse:
+    payload = request.model_dump(mode="json")
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for event, data in service.generate_card_stream(payload):
+                yield format_sse(event, data)
+        except AppException as exc:
+            yield format_sse("error", format_error_response(exc.error_code, str(exc.detail)))
+        except Exception:
+            logger.exception("卡片流式生成失败")
+            yield format_sse("error", format_error_response(ErrorCode.INTERNAL_ERROR, "卡片生成失败"))
+        finally:
+            ticket.release()
+
+    ticket.hand_over()
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers=SSE_HEADERS, background=BackgroundTask(ticket.release)
+    )
+
+
+@router.post("/jobs", response_model=CardJobResponse, status_code=HTTPStatus.ACCEPTED)
+async def submit_card_job(
+    request: CardGenerationRequest,
+    http_request: Request,
+    jobs: CardJobService = Depends(get_card_job_service),
+) -> Response:
+    job = jobs.submit(request.model_dump(mode="json"))
+    location = str(http_request.url_for("get_card_job", job_id=job.id))
+    return ModelResponse(_job_response(job), status_code=HTTPStatus.ACCEPTED, headers={"Location": location})
+
+
+@router.get("/jobs/{job_id}", response_model=CardJobResponse, status_code=HTTPStatus.OK)
+async def get_card_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="长轮询等待秒数，任务完成后立即返回"),
+    jobs: CardJobService = Depends(get_card_job_service),
+) -> Response:
+    job = await jobs.wait(job_id, wait)
+    return ModelResponse(_job_response(job))
+
+
+def _job_response(job: Job) -> CardJobResponse:
+    return CardJobResponse(**job.to_dict())
@@ -1,16 +1,33 @@
 from http import HTTPStatus
+from typing import AsyncIterator
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 
-from src.models.request import ChatRequest
+from src.models.request import AudioStreamRequest, ChatRequest
 from src.models.response import ChatResponse
+from src.services.audio import AudioService, get_audio_service
 from src.services.chat import ChatService, get_chat_service
+from src.utils.admission import AdmissionTicket, admission_slot, admission_ticket
+from src.utils.deadline import request_deadline
+from src.utils.errors import AppException, ErrorCode, ExternalServiceError, format_error_response
+from src.utils.logger import get_logger
+from src.utils.serialization import ModelResponse
+from src.utils.signing import verify_answer_token
+from src.utils.sse import SSE_HEADERS, format_sse
 
 router = APIRouter(prefix="/chat", tags=["chat"])
+logger = get_logger(__name__)
 
 
-@router.post("/", response_model=ChatResponse, status_code=HTTPStatus.OK)
-async def chat(request: ChatRequest, service: ChatService = Depends(get_chat_service)) -> ChatResponse:
+@router.post(
+    "/",
+    response_model=ChatResponse,
+    status_code=HTTPStatus.OK,
+    dependencies=[Depends(request_deadline("chat")), Depends(admission_slot("chat"))],
+)
+async def chat(request: ChatRequest, service: ChatService = Depends(get_chat_service)) -> Response:
     result = await service.chat(
         question=request.question,
         card_context=request.card_context,
@@ -20,4 +37,86 @@ async def chat(request: ChatRequest, service: ChatService = Depends(get_chat_ser
         image_url=str(request.image_url) if request.image_url else None,
         need_audio=request.need_audio,
     )
-    return ChatResponse(**result)
+    return ModelResponse(ChatResponse(**result))
+
+
+@router.post("/stream", status_code=HTTPStatus.OK)
+async def chat_stream(
+    request: ChatRequest,
+    service: ChatService = Depends(get_chat_service),
+    ticket: AdmissionTicket = Depends(admission_ticket("chat")),
+) -> StreamingResponse:
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for event, data in service.chat_stream(
+                question=request.question,
+                card_context=request.card_context,
+                user_id="snapopedia-chat",
+                user_preference=request.user_preference,
+                conversation_id=request.conversation_id,
+                image_url=str(request.image_url) if request.image_url else None,
+                need_audio=request.need_audio,
+            ):
+                yield format_sse(event, data)
+        except AppException as exc:
+            yield format_sse("error", format_error_response(exc.error_code, str(exc.detail)))
+        except ExternalServiceError as exc:
+            logger.warning("问答流式调用失败: %s", exc)
+            yield format_sse("error", format_error_response(ErrorCode.EXTERNAL_SERVICE_ERROR, "问答服务暂不可用"))
+        except Exception:
+            logger.exception("问答流式调用失败")
+            yield format_sse("error", format_error_response(ErrorCode.INTERNAL_ERROR, "问答失败"))
+        finally:
+            ticket.release()
+
+    ticket.hand_over()
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers=SSE_HEADERS, background=BackgroundTask(ticket.release)
+    )
+
+
+@router.post("/audio/stream", status_code=HTTPStatus.OK, response_class=StreamingResponse)
+async def stream_audio(
+    request: AudioStreamRequest,
+    service: AudioService = Depends(get_audio_service),
+    ticket: AdmissionTicket = Depends(admission_ticket("chat")),
+) -> Response:
+    if not verify_answer_token(request.text, request.answer_token):
+        raise AppException(
+            error_code=ErrorCode.VALIDATION_ERROR,
+            message="只能为问答生成的回答合成语音",
+            status_code=HTTPStatus.FORBIDDEN,
+        )
+
+    cached_url = await service.cached_audio_url(request.text)
+    if cached_url:
+        return RedirectResponse(cached_url, status_code=HTTPStatus.SEE_OTHER, headers={"X-Audio-Url": cached_url})
+
+    chunks = service.stream_text_to_audio(request.text)
+    try:
+        first_chunk = await anext(chunks)
+    except StopAsyncIteration:
+        first_chunk = b""
+    except ExternalServiceError as exc:
+        logger.warning("流式语音生成失败: %s", exc)
+        raise AppException(
+            error_code=ErrorCode.EXTERNAL_SERVICE_ERROR,
+            message="语音服务暂不可用",
+            status_code=HTTPStatus.BAD_GATEWAY,
+        ) from exc
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            ticket.release()
+
+    ticket.hand_over()
+    return StreamingResponse(
+        body(),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "no-cache"},
+        background=BackgroundTask(ticket.release),
+    )
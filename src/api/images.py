@@ -1,9 +1,10 @@
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi import APIRouter, Depends, File, Response, UploadFile
 
 from src.models.response import ImageUploadResponse
 from src.services.storage import ImageUploadService, get_image_upload_service
+from src.utils.serialization import ModelResponse
 
 router = APIRouter(prefix="/images", tags=["images"])
 
@@ -16,6 +17,6 @@ def get_upload_service() -> ImageUploadService:
 async def upload_image(
     file: UploadFile = File(...),
     service: ImageUploadService = Depends(get_upload_service),
-) -> ImageUploadResponse:
+) -> Response:
     url = await service.upload_original_image(file)
-    return ImageUploadResponse(url=url)
+    return ModelResponse(ImageUploadResponse(url=url), status_code=HTTPStatus.CREATED)
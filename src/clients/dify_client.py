@@ -1,15 +1,20 @@
 from __future__ import annotations
 
-import json
 from dataclasses import dataclass
 from functools import lru_cache
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 import httpx
-import re
 
+from src.clients.http_pool import build_http_client, get_http_client
 from src.config import get_settings
+from src.utils.circuit_breaker import CircuitBreaker, get_circuit_breaker, guarded
+from src.utils.deadline import DeadlineExceeded, clip_timeout, expired
 from src.utils.errors import ExternalServiceError
+from src.utils.hedging import HedgePolicy
+from src.utils.metrics import PAYLOAD_BYTES, track_upstream
+from src.utils.serialization import JSONDecodeError, loads, parse_fenced_json
+from src.utils.sse import SSEDecoder
 
 DEFAULT_QUERY = "DO THIS"
 
@@ -25,47 +30,129 @@ def _build_image_payload(image_url: str) -> Dict[str, str]:
 class DifyClient:
     BASE_URL = "https://api.dify.ai/v1"
 
-    def __init__(self, api_key: str, timeout: int, *, transport: httpx.BaseTransport | None = None) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        timeout: int,
+        *,
+        transport: httpx.AsyncBaseTransport | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        operation: str = "chat",
+        base_url: Optional[str] = None,
+        hedge: Optional[HedgePolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
         if not api_key:
             raise ValueError("Dify API key is required")
 
+        self._base_url = (base_url or self.BASE_URL).rstrip("/")
+        self._operation = operation
+        self._hedge = hedge
+        self._breaker = breaker
         self._headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
         }
         self._timeout = timeout
-        self._transport = transport
+        self._http_client = http_client or build_http_client(timeout=timeout, transport=transport)
 
-    async def send_message(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _build_request_body(payload: Dict[str, Any], response_mode: str) -> Dict[str, Any]:
         if "inputs" not in payload:
             payload = {**payload, "inputs": {}}
-        request_body = {
-            "response_mode": "blocking",
+        return {
+            "response_mode": response_mode,
             "conversation_id": payload.get("conversation_id") or "",
             "user": payload.get("user") or "snapopedia",
             **payload,
         }
 
-        async with httpx.AsyncClient(
-            base_url=self.BASE_URL,
-            timeout=self._timeout,
-            transport=self._transport,
-        ) as client:
+    async def send_message(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        request_body = self._build_request_body(payload, "blocking")
+        if self._hedge is None:
+            response = await self._send_blocking(request_body)
+        else:
+            response = await self._hedge.run(lambda: self._send_blocking(request_body))
+        PAYLOAD_BYTES.inc(len(response.content), peer="dify", direction="received")
+
+        try:
+            return response.json()
+        except ValueError as exc:
+            raise ExternalServiceError("dify", "Invalid JSON response from Dify") from exc
+
+    async def _send_blocking(self, request_body: Dict[str, Any]) -> httpx.Response:
+        with guarded(self._breaker), track_upstream("dify", self._operation):
+            return await self._post_blocking(request_body)
+
+    async def _post_blocking(self, request_body: Dict[str, Any]) -> httpx.Response:
+        try:
+            response = await self._http_client.post(
+                f"{self._base_url}/chat-messages",
+                headers=self._headers,
+                json=request_body,
+                timeout=clip_timeout(self._timeout),
+            )
+            response.raise_for_status()
+        except httpx.TimeoutException as exc:
+            if expired():
+                raise DeadlineExceeded() from exc
+            raise ExternalServiceError("dify", "Dify request timed out") from exc
+        except httpx.TransportError as exc:
+            raise ExternalServiceError("dify", f"Dify request failed: {exc}") from exc
+        except httpx.HTTPStatusError as exc:
+            error_message = exc.response.text or "Dify returned an error"
+            raise ExternalServiceError(
+                "dify", error_message, status_code=exc.response.status_code
+            ) from exc
+        return response
+
+    async def stream_message(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Send a message in ``streaming`` mode and yield Dify events as they arrive."""
+        request_body = self._build_request_body(payload, "streaming")
+        decoder = SSEDecoder()
+
+        with guarded(self._breaker), track_upstream("dify", f"{self._operation}_stream"):
             try:
-                response = await client.post("/chat-messages", headers=self._headers, json=request_body)
-                response.raise_for_status()
+                async with self._http_client.stream(
+                    "POST",
+                    f"{self._base_url}/chat-messages",
+                    headers=self._headers,
+                    json=request_body,
+                    timeout=clip_timeout(self._timeout),
+                ) as response:
+                    if response.is_error:
+                        await response.aread()
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        decoded = decoder.feed(line)
+                        if decoded is not None:
+                            yield self._parse_stream_event(decoded[1])
+                    decoded = decoder.flush()
+                    if decoded is not None:
+                        yield self._parse_stream_event(decoded[1])
             except httpx.TimeoutException as exc:
+                if expired():
+                    raise DeadlineExceeded() from exc
                 raise ExternalServiceError("dify", "Dify request timed out") from exc
+            except httpx.TransportError as exc:
+                raise ExternalServiceError("dify", f"Dify request failed: {exc}") from exc
             except httpx.HTTPStatusError as exc:
                 error_message = exc.response.text or "Dify returned an error"
                 raise ExternalServiceError(
                     "dify", error_message, status_code=exc.response.status_code
                 ) from exc
 
+    @staticmethod
+    def _parse_stream_event(data: str) -> Dict[str, Any]:
         try:
-            return response.json()
+            event = loads(data)
         except ValueError as exc:
-            raise ExternalServiceError("dify", "Invalid JSON response from Dify") from exc
+            raise ExternalServiceError("dify", "Invalid JSON event from Dify stream") from exc
+        if event.get("event") == "error":
+            raise ExternalServiceError(
+                "dify", event.get("message") or "Dify stream error", status_code=event.get("status")
+            )
+        return event
 
 
 @dataclass
@@ -89,9 +176,38 @@ class QAResult:
     message_id: Optional[str] = None
 
 
+@dataclass
+class QAStreamChunk:
+    """One streamed piece of a QA answer; the last chunk has ``done`` set and carries ids."""
+
+    delta: str = ""
+    done: bool = False
+    conversation_id: Optional[str] = None
+    message_id: Optional[str] = None
+
+
 class DifyPreprocessingClient:
-    def __init__(self, api_key: str, timeout: int, *, transport: httpx.BaseTransport | None = None) -> None:
-        self._client = DifyClient(api_key=api_key, timeout=timeout, transport=transport)
+    def __init__(
+        self,
+        api_key: str,
+        timeout: int,
+        *,
+        transport: httpx.AsyncBaseTransport | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        base_url: Optional[str] = None,
+        hedge: Optional[HedgePolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self._client = DifyClient(
+            api_key=api_key,
+            timeout=timeout,
+            transport=transport,
+            http_client=http_client,
+            operation="preprocess",
+            base_url=base_url,
+            hedge=hedge,
+            breaker=breaker,
+        )
 
     async def analyze(
         self,
@@ -121,8 +237,8 @@ class DifyPreprocessingClient:
     @staticmethod
     def _parse_answer(answer: str) -> Dict[str, Any]:
         try:
-            parsed = json.loads(_extract_json_payload(answer))
-        except json.JSONDecodeError as exc:
+            parsed = parse_fenced_json(answer)
+        except JSONDecodeError as exc:
             raise ExternalServiceError("dify", "预处理 workflow 返回的 answer 不是有效 JSON") from exc
 
         if "image_status" not in parsed:
@@ -131,8 +247,27 @@ class DifyPreprocessingClient:
 
 
 class DifyCardGenerationClient:
-    def __init__(self, api_key: str, timeout: int, *, transport: httpx.BaseTransport | None = None) -> None:
-        self._client = DifyClient(api_key=api_key, timeout=timeout, transport=transport)
+    def __init__(
+        self,
+        api_key: str,
+        timeout: int,
+        *,
+        transport: httpx.AsyncBaseTransport | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        base_url: Optional[str] = None,
+        hedge: Optional[HedgePolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self._client = DifyClient(
+            api_key=api_key,
+            timeout=timeout,
+            transport=transport,
+            http_client=http_client,
+            operation="card",
+            base_url=base_url,
+            hedge=hedge,
+            breaker=breaker,
+        )
 
     async def generate_card(
         self,
@@ -164,8 +299,8 @@ class DifyCardGenerationClient:
     @staticmethod
     def _parse_answer(answer: str) -> Dict[str, Any]:
         try:
-            parsed = json.loads(_extract_json_payload(answer))
-        except json.JSONDecodeError as exc:
+            parsed = parse_fenced_json(answer)
+        except JSONDecodeError as exc:
             raise ExternalServiceError("dify", "卡片生成 workflow 返回的 answer 不是有效 JSON") from exc
 
         if "title" not in parsed or "desc" not in parsed:
@@ -174,8 +309,25 @@ class DifyCardGenerationClient:
 
 
 class DifyQAClient:
-    def __init__(self, api_key: str, timeout: int, *, transport: httpx.BaseTransport | None = None) -> None:
-        self._client = DifyClient(api_key=api_key, timeout=timeout, transport=transport)
+    def __init__(
+        self,
+        api_key: str,
+        timeout: int,
+        *,
+        transport: httpx.AsyncBaseTransport | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        base_url: Optional[str] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self._client = DifyClient(
+            api_key=api_key,
+            timeout=timeout,
+            transport=transport,
+            http_client=http_client,
+            operation="qa",
+            base_url=base_url,
+            breaker=breaker,
+        )
 
     async def ask(
         self,
@@ -187,6 +339,57 @@ class DifyQAClient:
         image_url: Optional[str] = None,
         user_preference: Optional[str] = None,
     ) -> QAResult:
+        payload = self._build_payload(
+            question=question,
+            card_context=card_context,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            image_url=image_url,
+            user_preference=user_preference,
+        )
+        response = await self._client.send_message(payload)
+        return QAResult(
+            answer=response.get("answer", ""),
+            conversation_id=response.get("conversation_id"),
+            message_id=response.get("message_id"),
+        )
+
+    async def ask_stream(
+        self,
+        *,
+        question: str,
+        card_context: str,
+        user_id: str,
+        conversation_id: Optional[str] = None,
+        image_url: Optional[str] = None,
+        user_preference: Optional[str] = None,
+    ) -> AsyncIterator[QAStreamChunk]:
+        payload = self._build_payload(
+            question=question,
+            card_context=card_context,
+            user_id=user_id,
+            conversation_id=conversation_id,
+            image_url=image_url,
+            user_preference=user_preference,
+        )
+        message_id = None
+        async for event in self._client.stream_message(payload):
+            conversation_id = event.get("conversation_id") or conversation_id
+            message_id = event.get("message_id") or message_id
+            if event.get("event") in {"message", "agent_message"} and event.get("answer"):
+                yield QAStreamChunk(delta=event["answer"])
+        yield QAStreamChunk(done=True, conversation_id=conversation_id, message_id=message_id)
+
+    @staticmethod
+    def _build_payload(
+        *,
+        question: str,
+        card_context: str,
+        user_id: str,
+        conversation_id: Optional[str],
+        image_url: Optional[str],
+        user_preference: Optional[str],
+    ) -> Dict[str, Any]:
         preference = user_preference or DEFAULT_QUERY
         inputs: Dict[str, Any] = {"card_context": card_context, "user_preference": preference}
         files = None
@@ -203,13 +406,21 @@ class DifyQAClient:
         }
         if files:
             payload["files"] = files
+        return payload
 
-        response = await self._client.send_message(payload)
-        return QAResult(
-            answer=response.get("answer", ""),
-            conversation_id=response.get("conversation_id"),
-            message_id=response.get("message_id"),
-        )
+
+def _build_hedge_policy(operation: str) -> Optional[HedgePolicy]:
+    # QA calls are never hedged: a duplicate would append a second turn to the conversation.
+    settings = get_settings()
+    if not settings.dify_hedge_enabled:
+        return None
+    return HedgePolicy(
+        "dify",
+        operation,
+        budget_percent=settings.dify_hedge_budget_percent,
+        quantile=settings.dify_hedge_quantile,
+        min_delay=settings.dify_hedge_min_delay,
+    )
 
 
 @lru_cache(maxsize=1)
@@ -218,6 +429,10 @@ def get_dify_preprocessing_client() -> DifyPreprocessingClient:
     return DifyPreprocessingClient(
         api_key=settings.dify_api_key_preprocessing or "",
         timeout=settings.timeout_dify_preprocessing,
+        http_client=get_http_client("dify"),
+        base_url=settings.dify_base_url,
+        hedge=_build_hedge_policy("preprocess"),
+        breaker=get_circuit_breaker("dify"),
     )
 
 
@@ -227,6 +442,10 @@ def get_dify_card_generation_client() -> DifyCardGenerationClient:
     return DifyCardGenerationClient(
         api_key=settings.dify_api_key_card_gen or "",
         timeout=settings.timeout_dify_card_gen,
+        http_client=get_http_client("dify"),
+        base_url=settings.dify_base_url,
+        hedge=_build_hedge_policy("card"),
+        breaker=get_circuit_breaker("dify"),
     )
 
 
@@ -236,13 +455,7 @@ def get_dify_qa_client() -> DifyQAClient:
     return DifyQAClient(
         api_key=settings.dify_api_key_qa or "",
         timeout=settings.timeout_dify_qa,
+        http_client=get_http_client("dify"),
+        base_url=settings.dify_base_url,
+        breaker=get_circuit_breaker("dify"),
     )
-CODE_BLOCK_PATTERN = re.compile(r"^```(?:json)?\s*(?P<body>.*?)\s*```$", re.DOTALL | re.IGNORECASE)
-
-
-def _extract_json_payload(answer: str) -> str:
-    text = answer.strip()
-    match = CODE_BLOCK_PATTERN.match(text)
-    if match:
-        return match.group("body").strip()
-    return text
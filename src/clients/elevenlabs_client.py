@@ -1,15 +1,23 @@
 from __future__ import annotations
 
 from functools import lru_cache
+from typing import AsyncIterator
 
 import httpx
 
+from src.clients.http_pool import build_http_client, get_http_client
 from src.config import get_settings
+from src.utils.circuit_breaker import CircuitBreaker, get_circuit_breaker, guarded
+from src.utils.deadline import DeadlineExceeded, clip_timeout, expired, with_deadline
 from src.utils.errors import ExternalServiceError
+from src.utils.metrics import PAYLOAD_BYTES, track_upstream
+from src.utils.singleflight import SingleFlight
 
 
 class ElevenLabsClient:
     BASE_URL = "https://api.elevenlabs.io/v1"
+    DEFAULT_MODEL_ID = "eleven_flash_v2_5"
+    DEFAULT_OUTPUT_FORMAT = "mp3_22050_32"
 
     def __init__(
         self,
@@ -17,7 +25,10 @@ class ElevenLabsClient:
         voice_id: str,
         timeout: int,
         *,
-        transport: httpx.BaseTransport | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        base_url: str | None = None,
+        breaker: CircuitBreaker | None = None,
     ) -> None:
         if not api_key:
             raise ValueError("ElevenLabs API key is required")
@@ -25,39 +36,56 @@ class ElevenLabsClient:
             raise ValueError("ElevenLabs voice id is required")
 
         self._voice_id = voice_id
+        self._base_url = (base_url or self.BASE_URL).rstrip("/")
         self._timeout = timeout
-        self._transport = transport
+        self._http_client = http_client or build_http_client(timeout=timeout, transport=transport)
+        self._inflight = SingleFlight()
+        self._breaker = breaker
         self._headers = {
             "xi-api-key": api_key,
             "Content-Type": "application/json",
         }
 
+    @property
+    def voice_id(self) -> str:
+        return self._voice_id
+
     async def synthesize_speech(
         self,
         *,
         text: str,
-        model_id: str = "eleven_flash_v2_5",
-        output_format: str = "mp3_22050_32",
+        model_id: str = DEFAULT_MODEL_ID,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
     ) -> bytes:
+        """Synthesize ``text``; identical concurrent requests share one upstream call."""
+        return await with_deadline(
+            self._inflight.do(
+                (text, model_id, output_format),
+                lambda: self._synthesize_speech(text=text, model_id=model_id, output_format=output_format),
+            )
+        )
+
+    async def _synthesize_speech(self, *, text: str, model_id: str, output_format: str) -> bytes:
         payload = {
             "model_id": model_id,
             "text": text,
             "output_format": output_format,
         }
-        async with httpx.AsyncClient(
-            base_url=self.BASE_URL,
-            timeout=self._timeout,
-            transport=self._transport,
-        ) as client:
+        with guarded(self._breaker), track_upstream("elevenlabs", "tts"):
             try:
-                response = await client.post(
-                    f"/text-to-speech/{self._voice_id}",
+                response = await self._http_client.post(
+                    f"{self._base_url}/text-to-speech/{self._voice_id}",
                     headers=self._headers,
                     json=payload,
+                    timeout=clip_timeout(self._timeout),
                 )
                 response.raise_for_status()
             except httpx.TimeoutException as exc:
+                if expired():
+                    raise DeadlineExceeded() from exc
                 raise ExternalServiceError("elevenlabs", "ElevenLabs 请求超时") from exc
+            except httpx.TransportError as exc:
+                raise ExternalServiceError("elevenlabs", f"ElevenLabs 连接失败: {exc}") from exc
             except httpx.HTTPStatusError as exc:
                 message = exc.response.text or "ElevenLabs 返回错误"
                 raise ExternalServiceError(
@@ -66,8 +94,48 @@ class ElevenLabsClient:
                     status_code=exc.response.status_code,
                 ) from exc
 
+        PAYLOAD_BYTES.inc(len(response.content), peer="elevenlabs", direction="received")
         return response.content
 
+    async def stream_speech(
+        self,
+        *,
+        text: str,
+        model_id: str = DEFAULT_MODEL_ID,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+    ) -> AsyncIterator[bytes]:
+        """Yield audio bytes from the streaming endpoint as ElevenLabs produces them."""
+        payload = {"model_id": model_id, "text": text}
+        with guarded(self._breaker), track_upstream("elevenlabs", "tts_stream"):
+            try:
+                async with self._http_client.stream(
+                    "POST",
+                    f"{self._base_url}/text-to-speech/{self._voice_id}/stream",
+                    headers=self._headers,
+                    params={"output_format": output_format},
+                    json=payload,
+                    timeout=clip_timeout(self._timeout),
+                ) as response:
+                    if response.is_error:
+                        await response.aread()
+                        response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        PAYLOAD_BYTES.inc(len(chunk), peer="elevenlabs", direction="received")
+                        yield chunk
+            except httpx.TimeoutException as exc:
+                if expired():
+                    raise DeadlineExceeded() from exc
+                raise ExternalServiceError("elevenlabs", "ElevenLabs 请求超时") from exc
+            except httpx.TransportError as exc:
+                raise ExternalServiceError("elevenlabs", f"ElevenLabs 连接失败: {exc}") from exc
+            except httpx.HTTPStatusError as exc:
+                message = exc.response.text or "ElevenLabs 返回错误"
+                raise ExternalServiceError(
+                    "elevenlabs",
+                    message,
+                    status_code=exc.response.status_code,
+                ) from exc
+
 
 @lru_cache(maxsize=1)
 def get_elevenlabs_client() -> ElevenLabsClient:
@@ -76,4 +144,7 @@ def get_elevenlabs_client() -> ElevenLabsClient:
         api_key=settings.elevenlabs_api_key or "",
         voice_id=settings.elevenlabs_voice_id or "",
         timeout=settings.timeout_elevenlabs_tts,
+        http_client=get_http_client("elevenlabs"),
+        base_url=settings.elevenlabs_base_url,
+        breaker=get_circuit_breaker("elevenlabs"),
     )
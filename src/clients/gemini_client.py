@@ -1,15 +1,19 @@
 from __future__ import annotations
 
-from base64 import b64decode
+import asyncio
+import binascii
 from functools import lru_cache
 from typing import Optional
 
-import anyio
 import httpx
-from openai import OpenAI
+from openai import AsyncOpenAI
 
+from src.clients.http_pool import build_http_client, get_http_client
 from src.config import get_settings
+from src.utils.circuit_breaker import CircuitBreaker, get_circuit_breaker, guarded
+from src.utils.deadline import DeadlineExceeded, clip_timeout, expired
 from src.utils.errors import ExternalServiceError
+from src.utils.metrics import PAYLOAD_BYTES, track_upstream
 
 
 class GeminiClient:
@@ -23,7 +27,10 @@ class GeminiClient:
         *,
         site_url: Optional[str] = None,
         site_name: Optional[str] = None,
-        openai_client: OpenAI | None = None,
+        openai_client: AsyncOpenAI | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        max_concurrency: int = 8,
+        breaker: Optional[CircuitBreaker] = None,
     ) -> None:
         if not api_key:
             raise ValueError("OpenRouter API key is required")
@@ -34,16 +41,35 @@ class GeminiClient:
             self._headers["HTTP-Referer"] = site_url
         if site_name:
             self._headers["X-Title"] = site_name
-        self._client = openai_client or OpenAI(base_url=base_url, api_key=api_key, timeout=timeout)
+        self._http_client = http_client or build_http_client(timeout=timeout)
+        self._client = openai_client or AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            timeout=timeout,
+            http_client=self._http_client,
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._breaker = breaker
 
     async def highlight_object(self, image_url: str, prompt: str) -> bytes:
-        return await anyio.to_thread.run_sync(self._generate_image_bytes, image_url, prompt)
-
-    def _generate_image_bytes(self, image_url: str, prompt: str) -> bytes:
+        # The breaker is checked before queueing on the semaphore so an open
+        # circuit fails immediately instead of after other callers' timeouts.
+        with guarded(self._breaker):
+            async with self._semaphore:
+                with track_upstream("gemini", "highlight"):
+                    completion = await self._create_completion(image_url, prompt)
+                    message = self._extract_message(completion)
+                    image_bytes = await self._extract_image_bytes(message)
+        PAYLOAD_BYTES.inc(len(image_bytes), peer="gemini", direction="received")
+        return image_bytes
+
+    async def _create_completion(self, image_url: str, prompt: str) -> object:
+        timeout = clip_timeout(self._timeout)
         try:
-            completion = self._client.chat.completions.create(
+            return await self._client.chat.completions.create(
                 extra_headers=self._headers,
                 model=self.MODEL_ID,
+                timeout=timeout,
                 messages=[
                     {
                         "role": "user",
@@ -55,11 +81,10 @@ class GeminiClient:
                 ],
             )
         except Exception as exc:  # pragma: no cover - third-party raises many subclasses
+            if expired():
+                raise DeadlineExceeded() from exc
             raise ExternalServiceError("gemini", f"OpenRouter 调用失败: {exc}") from exc
 
-        message = self._extract_message(completion)
-        return self._extract_image_bytes(message)
-
     @staticmethod
     def _extract_message(completion) -> object:
         choices = getattr(completion, "choices", None)
@@ -70,7 +95,7 @@ class GeminiClient:
             raise ExternalServiceError("gemini", "OpenRouter 响应缺少 message 字段")
         return message
 
-    def _extract_image_bytes(self, message) -> bytes:
+    async def _extract_image_bytes(self, message) -> bytes:
         images = getattr(message, "images", None)
         if not images:
             raise ExternalServiceError("gemini", "OpenRouter 未返回图像结果")
@@ -80,22 +105,24 @@ class GeminiClient:
             raise ExternalServiceError("gemini", "OpenRouter 图像数据缺失")
 
         if data_url.startswith("data:"):
-            return self._decode_data_url(data_url)
+            return await asyncio.to_thread(self._decode_data_url, data_url)
         if data_url.startswith("http"):
-            return self._download_image(data_url)
+            return await self._download_image(data_url)
         raise ExternalServiceError("gemini", "不支持的图片数据格式")
 
     @staticmethod
     def _decode_data_url(data_url: str) -> bytes:
+        separator = data_url.find(",")
+        if separator < 0:
+            raise ExternalServiceError("gemini", "无效的 data URL")
         try:
-            _, encoded = data_url.split(",", 1)
-        except ValueError as exc:
+            return binascii.a2b_base64(data_url[separator + 1 :])
+        except ValueError as exc:  # binascii.Error, or non-ASCII input
             raise ExternalServiceError("gemini", "无效的 data URL") from exc
-        return b64decode(encoded)
 
-    def _download_image(self, url: str) -> bytes:
+    async def _download_image(self, url: str) -> bytes:
         try:
-            response = httpx.get(url, timeout=self._timeout)
+            response = await self._http_client.get(url, timeout=clip_timeout(self._timeout))
             response.raise_for_status()
         except httpx.HTTPError as exc:
             raise ExternalServiceError("gemini", f"下载生成的图片失败: {exc}") from exc
@@ -111,4 +138,7 @@ def get_gemini_client() -> GeminiClient:
         timeout=settings.timeout_gemini_highlight,
         site_url=settings.openrouter_site_url,
         site_name=settings.openrouter_site_name,
+        http_client=get_http_client("openrouter"),
+        max_concurrency=settings.gemini_max_concurrency,
+        breaker=get_circuit_breaker("gemini"),
     )
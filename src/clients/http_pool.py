@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import httpx
+
+from src.config import AppSettings, get_settings
+from src.utils.tracing import TRACE_HEADER, current_trace_id
+
+UPSTREAMS = ("dify", "elevenlabs", "openrouter")
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def build_http_client(
+    *,
+    timeout: Optional[float] = None,
+    transport: httpx.AsyncBaseTransport | None = None,
+    settings: Optional[AppSettings] = None,
+) -> httpx.AsyncClient:
+    """Build a keepalive-pooled client using the pool limits from settings."""
+    settings = settings or get_settings()
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=limits,
+        http2=settings.http2_enabled and transport is None,
+        transport=transport,
+        event_hooks={"request": [_propagate_trace_id]},
+    )
+
+
+async def _propagate_trace_id(request: httpx.Request) -> None:
+    trace_id = current_trace_id()
+    if trace_id and TRACE_HEADER not in request.headers:
+        request.headers[TRACE_HEADER] = trace_id
+
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    """Return the shared pooled client for an upstream, creating it on first use."""
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = build_http_client()
+        _clients[upstream] = client
+    return client
+
+
+def open_http_clients() -> None:
+    for upstream in UPSTREAMS:
+        get_http_client(upstream)
+
+
+async def close_http_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
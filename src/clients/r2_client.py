@@ -1,17 +1,26 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, List, Optional
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
 from src.config import AppSettings
+from src.utils.tracing import TRACE_HEADER, current_trace_id
 
 
 class R2ClientError(RuntimeError):
     pass
 
 
+def _add_trace_header(request, **_: object) -> None:
+    # Runs in the upload worker thread; the caller copies the request context into it.
+    trace_id = current_trace_id()
+    if trace_id:
+        request.headers[TRACE_HEADER] = trace_id
+
+
 class R2Client:
     def __init__(
         self,
@@ -21,7 +30,7 @@ class R2Client:
     ) -> None:
         if not all(
             [
-                settings.r2_account_id,
+                settings.r2_endpoint_url,
                 settings.r2_access_key_id,
                 settings.r2_secret_access_key,
                 settings.r2_bucket_name,
@@ -36,13 +45,22 @@ class R2Client:
 
         self._bucket = settings.r2_bucket_name
         self._public_url = settings.r2_public_url.rstrip("/")
-        self._client = boto_client or boto3.client(
-            "s3",
-            region_name="auto",
-            endpoint_url=endpoint,
-            aws_access_key_id=settings.r2_access_key_id,
-            aws_secret_access_key=settings.r2_secret_access_key,
-        )
+        if boto_client is None:
+            boto_client = boto3.client(
+                "s3",
+                region_name="auto",
+                endpoint_url=endpoint,
+                aws_access_key_id=settings.r2_access_key_id,
+                aws_secret_access_key=settings.r2_secret_access_key,
+                config=Config(
+                    max_pool_connections=settings.r2_max_pool_connections,
+                    connect_timeout=settings.r2_connect_timeout,
+                    read_timeout=settings.r2_read_timeout,
+                    retries={"max_attempts": settings.r2_max_attempts, "mode": "standard"},
+                ),
+            )
+            boto_client.meta.events.register("before-sign.s3", _add_trace_header)
+        self._client = boto_client
 
     def upload_file(self, *, key: str, data: bytes, content_type: str) -> str:
         try:
@@ -50,4 +68,56 @@ class R2Client:
         except (ClientError, BotoCoreError) as exc:
             raise R2ClientError(str(exc)) from exc
 
+        return self.build_public_url(key)
+
+    def build_public_url(self, key: str) -> str:
         return f"{self._public_url}/{key}"
+
+    def object_exists(self, *, key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self._bucket, Key=key)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+                return False
+            raise R2ClientError(str(exc)) from exc
+        except BotoCoreError as exc:
+            raise R2ClientError(str(exc)) from exc
+        return True
+
+    def create_multipart_upload(self, *, key: str, content_type: str) -> str:
+        try:
+            response = self._client.create_multipart_upload(Bucket=self._bucket, Key=key, ContentType=content_type)
+        except (ClientError, BotoCoreError) as exc:
+            raise R2ClientError(str(exc)) from exc
+        return response["UploadId"]
+
+    def upload_part(self, *, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        try:
+            response = self._client.upload_part(
+                Bucket=self._bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=data,
+            )
+        except (ClientError, BotoCoreError) as exc:
+            raise R2ClientError(str(exc)) from exc
+        return response["ETag"]
+
+    def complete_multipart_upload(self, *, key: str, upload_id: str, parts: List[Dict[str, object]]) -> str:
+        try:
+            self._client.complete_multipart_upload(
+                Bucket=self._bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except (ClientError, BotoCoreError) as exc:
+            raise R2ClientError(str(exc)) from exc
+        return self.build_public_url(key)
+
+    def abort_multipart_upload(self, *, key: str, upload_id: str) -> None:
+        try:
+            self._client.abort_multipart_upload(Bucket=self._bucket, Key=key, UploadId=upload_id)
+        except (ClientError, BotoCoreError) as exc:
+            raise R2ClientError(str(exc)) from exc
@@ -21,15 +21,38 @@ class AppSettings(BaseSettings):
 
     # Cloudflare R2
     r2_account_id: Optional[str] = None
+    # Overrides the endpoint derived from the account id (S3-compatible stand-ins, local MinIO)
+    r2_endpoint: Optional[str] = None
     r2_access_key_id: Optional[str] = None
     r2_secret_access_key: Optional[str] = None
     r2_bucket_name: Optional[str] = None
     r2_public_url: Optional[str] = None
+    r2_upload_workers: int = 8
+    r2_max_pool_connections: int = 16
+    r2_connect_timeout: float = 5.0
+    r2_read_timeout: float = 30.0
+    r2_max_attempts: int = 3
+    r2_content_addressed: bool = False
+
+    # Image upload (chunk size must stay >= 5 MiB, the S3 minimum multipart part size)
+    upload_max_bytes: int = 15 * 1024 * 1024
+    upload_chunk_size: int = 5 * 1024 * 1024
+    # Downscaled WebP derivative sent to vision upstreams (requires Pillow; 0 disables)
+    upload_derivative_max_edge: int = 1280
+    upload_derivative_quality: int = 80
+    # Derivative encodes run on their own threads; uploads arriving while all are busy skip it
+    upload_derivative_workers: int = 2
 
     # DIFY API Keys
     dify_api_key_preprocessing: Optional[str] = None
     dify_api_key_card_gen: Optional[str] = None
     dify_api_key_qa: Optional[str] = None
+    dify_base_url: str = "https://api.dify.ai/v1"
+    # Hedged requests for preprocess / card generation (a backup call once the observed quantile passes)
+    dify_hedge_enabled: bool = False
+    dify_hedge_budget_percent: float = 5.0
+    dify_hedge_quantile: float = 0.95
+    dify_hedge_min_delay: float = 0.5
 
     # Gemini
     gemini_api_key: Optional[str] = None
@@ -37,6 +60,9 @@ class AppSettings(BaseSettings):
     # ElevenLabs
     elevenlabs_api_key: Optional[str] = None
     elevenlabs_voice_id: Optional[str] = None
+    elevenlabs_base_url: str = "https://api.elevenlabs.io/v1"
+    # Signs chat answers so /chat/audio/stream only voices generated text (share it across workers)
+    answer_token_secret: Optional[str] = None
 
     # Timeouts
     timeout_dify_preprocessing: int = 30
@@ -50,6 +76,72 @@ class AppSettings(BaseSettings):
     openrouter_site_url: Optional[str] = None
     openrouter_site_name: Optional[str] = None
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
+    gemini_max_concurrency: int = 8
+    # Highlight output is transcoded to WebP plus a thumbnail before upload (requires Pillow)
+    highlight_webp_quality: int = 85
+    highlight_thumbnail_max_edge: int = 320
+
+    # Card pipeline stages
+    pipeline_stage_retries: int = 1
+    pipeline_retry_backoff: float = 0.5
+    pipeline_optional_stage_timeout: float = 45.0
+    pipeline_optional_stage_max_concurrency: int = 16
+
+    # Request deadlines per route group (seconds, 0 disables; X-Request-Timeout can only shorten them)
+    deadline_cards_seconds: float = 60.0
+    deadline_chat_seconds: float = 30.0
+    # Optional stages (highlight, audio) are skipped when less than this budget remains
+    deadline_optional_stage_min_budget: float = 3.0
+
+    # Circuit breakers per upstream (dify / gemini / elevenlabs / r2)
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_failure_threshold: int = 5
+    circuit_breaker_recovery_timeout: float = 30.0
+    circuit_breaker_half_open_max_calls: int = 1
+
+    # Admission control per route group (beyond concurrency requests queue, beyond queue they get 503)
+    admission_cards_max_concurrency: int = 16
+    admission_cards_max_queue: int = 32
+    admission_chat_max_concurrency: int = 32
+    admission_chat_max_queue: int = 64
+    admission_queue_timeout: float = 10.0
+
+    # Asynchronous card jobs
+    card_job_workers: int = 4
+    card_job_queue_size: int = 64
+    card_job_ttl_seconds: int = 600
+    card_job_max_wait_seconds: float = 25.0
+
+    # Card result cache (backend: none / memory / sqlite)
+    card_cache_backend: str = "memory"
+    card_cache_ttl_seconds: int = 3600
+    card_cache_max_entries: int = 1024
+    card_cache_sqlite_path: str = ".cache/card_results.sqlite3"
+
+    # Preprocess (image analysis) cache
+    preprocess_cache_backend: str = "memory"
+    preprocess_cache_ttl_seconds: int = 1800
+    preprocess_cache_max_entries: int = 2048
+    preprocess_cache_sqlite_path: str = ".cache/preprocess.sqlite3"
+    preprocess_cache_preference_fallback: bool = True
+
+    # TTS audio URL cache (backend: none / memory / sqlite)
+    tts_cache_backend: str = "sqlite"
+    tts_cache_ttl_seconds: int = 7 * 24 * 3600
+    tts_cache_max_entries: int = 10000
+    tts_cache_sqlite_path: str = ".cache/tts_audio.sqlite3"
+
+    # Sentence-chunked parallel TTS for long texts
+    tts_chunking_enabled: bool = True
+    tts_chunk_threshold_chars: int = 160
+    tts_chunk_max_chars: int = 120
+    tts_max_parallel_chunks: int = 4
+
+    # Upstream HTTP connection pools
+    http2_enabled: bool = True
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
 
     @field_validator("log_level")
     @classmethod
@@ -62,6 +154,8 @@ class AppSettings(BaseSettings):
 
     @property
     def r2_endpoint_url(self) -> Optional[str]:
+        if self.r2_endpoint:
+            return self.r2_endpoint.rstrip("/")
         if self.r2_account_id:
             return f"https://{self.r2_account_id}.r2.cloudflarestorage.com"
         return None
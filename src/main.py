@@ -1,11 +1,61 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.api import api_router
+from src.clients.dify_client import get_dify_card_generation_client, get_dify_preprocessing_client, get_dify_qa_client
+from src.clients.elevenlabs_client import get_elevenlabs_client
+from src.clients.gemini_client import get_gemini_client
+from src.clients.http_pool import close_http_clients, open_http_clients
 from src.config import get_settings
 from src.models.response import HealthResponse
+from src.services.audio import get_audio_service
+from src.services.chat import get_chat_service
+from src.services.jobs import get_card_job_service
+from src.services.pipeline import get_pipeline_service
+from src.services.storage import get_image_upload_service
+from src.utils.admission import admission_stats
+from src.utils.circuit_breaker import circuit_stats
 from src.utils.errors import register_exception_handlers
 from src.utils.logger import get_logger
+from src.utils.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, monitor_event_loop_lag
+from src.utils.serialization import FastJSONResponse
+from src.utils.tracing import TRACE_HEADER, TracingMiddleware
+
+# Cached singletons that hold a pooled HTTP client, directly or through a client.
+# They are dropped with the pools so the next lifespan builds them on fresh ones.
+POOLED_SINGLETONS = (
+    get_dify_preprocessing_client,
+    get_dify_card_generation_client,
+    get_dify_qa_client,
+    get_elevenlabs_client,
+    get_gemini_client,
+    get_audio_service,
+    get_chat_service,
+    get_pipeline_service,
+)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    open_http_clients()
+    get_card_job_service().start()
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    try:
+        yield
+    finally:
+        lag_monitor.cancel()
+        await get_card_job_service().stop()
+        await close_http_clients()
+        for factory in POOLED_SINGLETONS:
+            factory.cache_clear()
+        if get_image_upload_service.cache_info().currsize:
+            # Its executors are shut down; the next lifespan needs a new service.
+            get_image_upload_service().close()
+            get_image_upload_service.cache_clear()
 
 
 def create_app() -> FastAPI:
@@ -17,6 +67,8 @@ def create_app() -> FastAPI:
         description="Backend service for card generation pipeline",
         version="0.1.0",
         debug=settings.debug,
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse,
     )
 
     app.add_middleware(
@@ -25,15 +77,25 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Audio-Url", TRACE_HEADER, "Server-Timing"],
     )
 
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(TracingMiddleware)
+
     register_exception_handlers(app)
     app.include_router(api_router)
 
     @app.get("/health", response_model=HealthResponse, tags=["system"])
     async def health_check() -> HealthResponse:
         logger.debug("Health check requested")
-        return HealthResponse(data={"status": "healthy"})
+        return HealthResponse(
+            data={"status": "healthy", "admission": admission_stats(), "circuits": circuit_stats()}
+        )
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics() -> Response:
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
     return app
 
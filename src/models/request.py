@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pydantic import BaseModel, HttpUrl, field_validator
+from pydantic import BaseModel, Field, HttpUrl, field_validator
 
 
 class BaseRequest(BaseModel):
@@ -26,3 +26,10 @@ class ChatRequest(BaseRequest):
     conversation_id: Optional[str] = None
     image_url: Optional[HttpUrl] = None
     need_audio: bool = False
+
+
+class AudioStreamRequest(BaseModel):
+    # Only answers produced by the chat endpoints, identified by their answer_token.
+    # Answers have no length cap of their own, so the signature is the only bound.
+    text: str = Field(min_length=1)
+    answer_token: str = Field(min_length=1, max_length=128)
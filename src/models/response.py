@@ -21,10 +21,19 @@ class CardGenerationResponse(BaseResponse):
     desc: str
     central_object: Optional[str] = None
     highlighted_image_url: Optional[str] = None
+    highlighted_thumbnail_url: Optional[str] = None
     audio_url: Optional[str] = None
 
 
+class CardJobResponse(BaseResponse):
+    job_id: str
+    status: str
+    result: Optional[CardGenerationResponse] = None
+    error: Optional[Dict[str, Any]] = None
+
+
 class ChatResponse(BaseResponse):
     answer: str
+    answer_token: Optional[str] = None
     conversation_id: Optional[str] = None
     audio_url: Optional[str] = None
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Any, Mapping
+
+from src.clients.dify_client import CardGenerationResult
+from src.nodes import image2card
+from src.pipeline import Node
+from src.services.audio import AudioService
+from src.utils.errors import AppException, ExternalServiceError
+
+NAME = "audio"
+
+
+def build_speech_text(card_result: CardGenerationResult) -> str:
+    return f"{card_result.title}。{card_result.desc}"
+
+
+def build_node(audio_service: AudioService, **options: Any) -> Node:
+    async def synthesize(context: Mapping[str, Any]) -> str:
+        return await audio_service.text_to_audio_url(build_speech_text(context[image2card.NAME]))
+
+    return Node(
+        name=NAME,
+        func=synthesize,
+        deps=(image2card.NAME,),
+        optional=True,
+        soft_fail_on=(ExternalServiceError, AppException),
+        **options,
+    )
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Any, Mapping
+
+from src.clients.dify_client import CardGenerationResult, DifyCardGenerationClient
+from src.nodes import image_analysis
+from src.pipeline import Node
+
+NAME = "card"
+
+
+def build_node(card_client: DifyCardGenerationClient, **options: Any) -> Node:
+    async def generate(context: Mapping[str, Any]) -> CardGenerationResult:
+        return await card_client.generate_card(
+            image_url=context["upstream_image_url"],
+            central_object=context[image_analysis.NAME].central_object,
+            user_preference=context["user_preference"],
+            user_id=context["user_id"],
+        )
+
+    return Node(name=NAME, func=generate, deps=(image_analysis.NAME,), **options)
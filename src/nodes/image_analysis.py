@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from typing import Any, Mapping, Optional
+
+from src.clients.dify_client import DifyPreprocessingClient, PreprocessResult
+from src.pipeline import Node
+from src.services.cache import PreprocessCache
+from src.utils.errors import AppException, ErrorCode
+
+NAME = "preprocess"
+
+
+def build_node(
+    preprocess_client: DifyPreprocessingClient,
+    cache: Optional[PreprocessCache] = None,
+    **options: Any,
+) -> Node:
+    async def analyze(context: Mapping[str, Any]) -> PreprocessResult:
+        image_url = context["image_url"]
+        user_preference = context["user_preference"]
+        result = await cache.get(image_url, user_preference) if cache is not None else None
+        if result is None:
+            result = await preprocess_client.analyze(
+                image_url=context["upstream_image_url"],
+                user_preference=user_preference,
+                user_id=context["user_id"],
+            )
+            if cache is not None:
+                await cache.set(image_url, user_preference, result)
+        if result.image_status != "clear" or not result.central_object:
+            raise AppException(
+                error_code=ErrorCode.VALIDATION_ERROR,
+                message="图片不够清晰或与主题不符，请重新拍摄",
+            )
+        return result
+
+    return Node(name=NAME, func=analyze, **options)
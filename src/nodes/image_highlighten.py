@@ -1,4 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Mapping, Optional, Tuple
+
+from src.clients.gemini_client import GeminiClient
+from src.nodes import image_analysis
+from src.pipeline import Node
+from src.services.storage import ImageUploadService
+from src.utils.errors import AppException, ExternalServiceError
+from src.utils.images import to_webp_variants
+from src.utils.logger import get_logger
+from src.utils.metrics import HIGHLIGHT_BYTES_SAVED
+
+NAME = "highlight"
+
+logger = get_logger(__name__)
+
 PROMPT = """
 Highlight and emphasize the central object in the image with a glowing effect. The main subject in the center should be sharply outlined and accentuated. Add a soft, translucent luminous halo radiating from the edges of the central object, creating a dreamy bokeh effect around the borders. The surrounding areas should have a gentle blur with semi-transparent light diffusion, making the central object stand out prominently as the focal point.
 """
 
+
+def build_prompt(central_object: str) -> str:
+    return f"{PROMPT.strip()}\n中心物体：{central_object}"
+
+
+@dataclass
+class HighlightImage:
+    url: str
+    thumbnail_url: Optional[str] = None
+
+
+def transcode(image_bytes: bytes, *, thumbnail_max_edge: int, quality: int) -> Optional[Tuple[bytes, bytes]]:
+    """WebP full-size and thumbnail variants, or ``None`` to keep the original bytes."""
+    try:
+        variants = to_webp_variants(image_bytes, max_edges=(None, thumbnail_max_edge), quality=quality)
+    except Exception as exc:
+        logger.warning("高亮图转码失败，保留原图: %s", exc)
+        return None
+    if variants is None or len(variants[0]) >= len(image_bytes):
+        return None
+    return variants[0], variants[1]
+
+
+def build_node(
+    gemini_client: GeminiClient,
+    storage_service: ImageUploadService,
+    *,
+    thumbnail_max_edge: int = 320,
+    quality: int = 85,
+    **options: Any,
+) -> Node:
+    async def highlight(context: Mapping[str, Any]) -> HighlightImage:
+        prompt = build_prompt(context[image_analysis.NAME].central_object)
+        image_bytes = await gemini_client.highlight_object(image_url=context["upstream_image_url"], prompt=prompt)
+        variants = await asyncio.to_thread(
+            partial(transcode, image_bytes, thumbnail_max_edge=thumbnail_max_edge, quality=quality)
+        )
+        if variants is None:
+            return HighlightImage(url=await storage_service.upload_highlight_image(image_bytes))
+
+        webp, thumbnail = variants
+        url, thumbnail_url = await asyncio.gather(
+            storage_service.upload_highlight_image(webp, extension="webp"),
+            storage_service.upload_highlight_thumbnail(thumbnail, extension="webp"),
+        )
+        saved = len(image_bytes) - len(webp)
+        HIGHLIGHT_BYTES_SAVED.inc(saved)
+        logger.info("高亮图转码 WebP 节省 %d 字节 (%d -> %d)", saved, len(image_bytes), len(webp))
+        return HighlightImage(url=url, thumbnail_url=thumbnail_url)
+
+    return Node(
+        name=NAME,
+        func=highlight,
+        deps=(image_analysis.NAME,),
+        optional=True,
+        soft_fail_on=(ExternalServiceError, AppException),
+        **options,
+    )
@@ -0,0 +1,203 @@
+"""Small dependency-driven stage runner used by the card pipeline.
+
+Each ``Node`` declares the nodes it depends on; ``Pipeline.run`` starts a
+node as soon as all of its dependencies have produced a result, so
+independent branches overlap without any hand-written ordering.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Type
+
+from src.utils.circuit_breaker import CircuitOpenError
+from src.utils.deadline import DeadlineExceeded, clip_timeout, expired, has_budget
+from src.utils.errors import ExternalServiceError
+from src.utils.logger import get_logger
+from src.utils.metrics import PIPELINE_STAGE_SECONDS
+from src.utils.tracing import record_span
+
+NodeFunc = Callable[[Mapping[str, Any]], Awaitable[Any]]
+ResultCallback = Callable[[str, Any], Awaitable[None]]
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, ExternalServiceError):
+        return exc.status_code is None or exc.status_code >= 500
+    return False
+
+
+@dataclass
+class Node:
+    name: str
+    func: NodeFunc
+    deps: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+    retries: int = 0
+    retry_backoff: float = 0.0
+    retry_if: Callable[[BaseException], bool] = is_retryable
+    max_concurrency: Optional[int] = None
+    optional: bool = False
+    # Skip the node (DeadlineExceeded) when less than this much of the request deadline is left.
+    min_budget: Optional[float] = None
+    soft_fail_on: Tuple[Type[BaseException], ...] = (Exception,)
+    _semaphore: Optional[asyncio.Semaphore] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.max_concurrency is not None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+
+class Pipeline:
+    def __init__(
+        self,
+        nodes: Iterable[Node],
+        *,
+        name: str = "pipeline",
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.name = name
+        self._nodes: Dict[str, Node] = {}
+        for node in nodes:
+            if node.name in self._nodes:
+                raise ValueError(f"Duplicate pipeline node: {node.name}")
+            self._nodes[node.name] = node
+        self._order = self._topological_order()
+        self._logger = logger or get_logger(self.__class__.__name__)
+
+    @property
+    def node_names(self) -> List[str]:
+        return list(self._order)
+
+    async def run(
+        self,
+        inputs: Mapping[str, Any],
+        *,
+        on_result: Optional[ResultCallback] = None,
+    ) -> Dict[str, Any]:
+        """Run every node and return their results by name.
+
+        Optional nodes that fail with one of their ``soft_fail_on`` errors
+        resolve to ``None`` and their dependents are skipped (also ``None``).
+        Any other failure cancels the nodes still running and propagates.
+        """
+        context: Dict[str, Any] = dict(inputs)
+        results: Dict[str, Any] = {}
+        skipped: set[str] = set()
+        pending = list(self._order)
+        running: Dict[asyncio.Task, str] = {}
+
+        async def publish(name: str, value: Any) -> None:
+            results[name] = value
+            context[name] = value
+            if on_result is not None:
+                await on_result(name, value)
+
+        async def launch_ready() -> None:
+            for name in list(pending):
+                node = self._nodes[name]
+                if not all(dep in results for dep in node.deps):
+                    continue
+                pending.remove(name)
+                if any(dep in skipped for dep in node.deps):
+                    skipped.add(name)
+                    await publish(name, None)
+                    continue
+                running[asyncio.create_task(self._run_node(node, context))] = name
+
+        try:
+            await launch_ready()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    node = self._nodes[name]
+                    try:
+                        value = task.result()
+                    except node.soft_fail_on as exc:
+                        if not node.optional:
+                            raise
+                        self._logger.warning("可选阶段 %s 失败，已降级: %s", name, exc)
+                        skipped.add(name)
+                        value = None
+                    await publish(name, value)
+                await launch_ready()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        return results
+
+    async def _run_node(self, node: Node, context: Mapping[str, Any]) -> Any:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            if node.min_budget is not None and not has_budget(node.min_budget):
+                outcome = "skipped"
+                raise DeadlineExceeded(f"剩余时间不足，跳过阶段 {node.name}")
+            if node._semaphore is None:
+                result = await self._attempt(node, context)
+            else:
+                async with node._semaphore:
+                    result = await self._attempt(node, context)
+            outcome = "ok"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            PIPELINE_STAGE_SECONDS.observe(elapsed, pipeline=self.name, stage=node.name, outcome=outcome)
+            record_span(node.name, elapsed)
+
+    async def _attempt(self, node: Node, context: Mapping[str, Any]) -> Any:
+        attempt = 0
+        while True:
+            timeout = clip_timeout(node.timeout)
+            try:
+                if timeout is None:
+                    return await node.func(context)
+                return await asyncio.wait_for(node.func(context), timeout=timeout)
+            except asyncio.TimeoutError as exc:
+                error: BaseException = ExternalServiceError(node.name, f"阶段 {node.name} 超时")
+                error.__cause__ = exc
+            except Exception as exc:
+                error = exc
+            if expired() and not isinstance(error, DeadlineExceeded):
+                raise DeadlineExceeded() from error
+            if attempt >= node.retries or not node.retry_if(error):
+                raise error
+            attempt += 1
+            self._logger.info("阶段 %s 第 %d 次重试: %s", node.name, attempt, error)
+            if node.retry_backoff:
+                await asyncio.sleep(node.retry_backoff * attempt)
+
+    def _topological_order(self) -> List[str]:
+        for node in self._nodes.values():
+            missing = [dep for dep in node.deps if dep not in self._nodes]
+            if missing:
+                raise ValueError(f"Node {node.name} depends on unknown nodes: {', '.join(missing)}")
+
+        order: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str) -> None:
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline has a cycle through node: {name}")
+            state[name] = "visiting"
+            for dep in self._nodes[name].deps:
+                visit(dep)
+            state[name] = "done"
+            order.append(name)
+
+        for name in self._nodes:
+            visit(name)
+        return order
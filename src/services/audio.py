@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Set
+
+from src.clients.elevenlabs_client import ElevenLabsClient, get_elevenlabs_client
+from src.config import get_settings
+from src.services.cache import TTSCache, get_tts_cache
+from src.services.storage import ImageUploadService, get_image_upload_service
+from src.utils.errors import AppException
+from src.utils.logger import get_logger
+from src.utils.mp3 import concat_mp3
+from src.utils.text import split_sentences
+
+
+class AudioService:
+    """Turns text into a stored audio URL, reusing earlier syntheses of the same text."""
+
+    def __init__(
+        self,
+        *,
+        elevenlabs_client: ElevenLabsClient,
+        storage_service: ImageUploadService,
+        tts_cache: Optional[TTSCache] = None,
+        model_id: str = ElevenLabsClient.DEFAULT_MODEL_ID,
+        output_format: str = ElevenLabsClient.DEFAULT_OUTPUT_FORMAT,
+        chunk_threshold_chars: Optional[int] = None,
+        chunk_max_chars: int = 120,
+        max_parallel_chunks: int = 4,
+    ) -> None:
+        self.elevenlabs_client = elevenlabs_client
+        self.storage_service = storage_service
+        self.tts_cache = tts_cache
+        self.model_id = model_id
+        self.output_format = output_format
+        self.chunk_threshold_chars = chunk_threshold_chars
+        self.chunk_max_chars = chunk_max_chars
+        self.max_parallel_chunks = max_parallel_chunks
+        self.logger = get_logger(self.__class__.__name__)
+        self._background_uploads: Set[asyncio.Task] = set()
+
+    async def text_to_audio_url(self, text: str) -> str:
+        cache_key = self._cache_key(text)
+        cached_url = await self.cached_audio_url(text)
+        if cached_url:
+            return cached_url
+
+        audio_bytes = await self.synthesize(text)
+        url = await self.storage_service.upload_audio(audio_bytes)
+        if cache_key is not None:
+            await self.tts_cache.set(cache_key, url)
+        return url
+
+    async def synthesize(self, text: str) -> bytes:
+        """Synthesize long text as sentence chunks in parallel and join them; short text in one call."""
+        chunks = self._split_for_synthesis(text)
+        if len(chunks) < 2:
+            return await self._synthesize_one(text)
+
+        semaphore = asyncio.Semaphore(self.max_parallel_chunks)
+
+        async def synthesize_chunk(chunk: str) -> bytes:
+            async with semaphore:
+                return await self._synthesize_one(chunk)
+
+        segments = await asyncio.gather(*(synthesize_chunk(chunk) for chunk in chunks))
+        try:
+            return concat_mp3(segments)
+        except ValueError as exc:
+            self.logger.warning("分段语音拼接失败，改为整段合成: %s", exc)
+            return await self._synthesize_one(text)
+
+    def _split_for_synthesis(self, text: str) -> List[str]:
+        if self.chunk_threshold_chars is None or len(text) <= self.chunk_threshold_chars:
+            return [text]
+        if not self.output_format.startswith("mp3"):
+            return [text]
+        return split_sentences(text, self.chunk_max_chars)
+
+    async def _synthesize_one(self, text: str) -> bytes:
+        return await self.elevenlabs_client.synthesize_speech(
+            text=text,
+            model_id=self.model_id,
+            output_format=self.output_format,
+        )
+
+    async def cached_audio_url(self, text: str) -> Optional[str]:
+        cache_key = self._cache_key(text)
+        if cache_key is None:
+            return None
+        cached_url = await self.tts_cache.get(cache_key)
+        if cached_url:
+            self.logger.info("语音缓存命中 key=%s", cache_key)
+        return cached_url
+
+    def stream_text_to_audio(self, text: str) -> AsyncIterator[bytes]:
+        """Relay ElevenLabs chunks as they arrive.
+
+        Once the stream completes, the collected audio is uploaded in the
+        background like any other synthesis and recorded in the TTS cache, so
+        the next request for the text is served from storage. An interrupted
+        stream uploads nothing.
+        """
+
+        async def relay() -> AsyncIterator[bytes]:
+            chunks = []
+            async for chunk in self.elevenlabs_client.stream_speech(
+                text=text,
+                model_id=self.model_id,
+                output_format=self.output_format,
+            ):
+                chunks.append(chunk)
+                yield chunk
+            task = asyncio.create_task(self._store_streamed_audio(text, b"".join(chunks)))
+            self._background_uploads.add(task)
+            task.add_done_callback(self._background_uploads.discard)
+
+        return relay()
+
+    async def _store_streamed_audio(self, text: str, data: bytes) -> None:
+        try:
+            url = await self.storage_service.upload_audio(data)
+        except AppException as exc:
+            self.logger.warning("流式语音上传失败: %s", exc)
+            return
+        cache_key = self._cache_key(text)
+        if cache_key is not None:
+            await self.tts_cache.set(cache_key, url)
+
+    def _cache_key(self, text: str) -> Optional[str]:
+        if self.tts_cache is None:
+            return None
+        return self.tts_cache.key_for(
+            voice_id=self.elevenlabs_client.voice_id,
+            model_id=self.model_id,
+            output_format=self.output_format,
+            text=text,
+        )
+
+
+@lru_cache(maxsize=1)
+def get_audio_service() -> AudioService:
+    settings = get_settings()
+    return AudioService(
+        elevenlabs_client=get_elevenlabs_client(),
+        storage_service=get_image_upload_service(),
+        tts_cache=get_tts_cache(),
+        chunk_threshold_chars=settings.tts_chunk_threshold_chars if settings.tts_chunking_enabled else None,
+        chunk_max_chars=settings.tts_chunk_max_chars,
+        max_parallel_chunks=settings.tts_max_parallel_chunks,
+    )
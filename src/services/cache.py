@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from src.clients.dify_client import PreprocessResult
+from src.config import get_settings
+from src.services.storage import ORIGINAL_PREFIX
+from src.utils.cache import ResultCache, build_cache_backend
+
+CONTENT_KEY_PATTERN = re.compile(r"(?P<shard>[0-9a-f]{2}/[0-9a-f]{2})/(?P<digest>[0-9a-f]{64})\.[A-Za-z0-9]+")
+
+
+def original_image_url_prefix() -> Optional[str]:
+    """Public URL prefix of the content-addressed originals this service stores."""
+    public_url = get_settings().r2_public_url
+    if not public_url:
+        return None
+    return f"{public_url.rstrip('/')}/{ORIGINAL_PREFIX}/"
+
+
+def image_fingerprint(image_url: str, content_url_prefix: Optional[str] = None) -> str:
+    """Content hash for our own content-addressed originals, otherwise a hash of the URL itself.
+
+    Only URLs under ``content_url_prefix`` are trusted to be named after their
+    content; anyone can put a digest-shaped filename on another host.
+    """
+    path = image_url.split("?", 1)[0]
+    if content_url_prefix and path.startswith(content_url_prefix):
+        match = CONTENT_KEY_PATTERN.fullmatch(path[len(content_url_prefix) :])
+        if match and match.group("shard") == f"{match.group('digest')[:2]}/{match.group('digest')[2:4]}":
+            return match.group("digest")
+    return hashlib.sha256(image_url.encode("utf-8")).hexdigest()
+
+
+def normalize_preference(user_preference: Optional[str]) -> str:
+    return " ".join((user_preference or "").split()).casefold()
+
+
+class CardResultCache:
+    def __init__(self, cache: ResultCache, *, content_url_prefix: Optional[str] = None) -> None:
+        self._cache = cache
+        self._content_url_prefix = content_url_prefix
+
+    def key_for(self, image_url: str, user_preference: Optional[str]) -> str:
+        fingerprint = image_fingerprint(image_url, self._content_url_prefix)
+        return f"card:{fingerprint}:{normalize_preference(user_preference)}"
+
+    async def get(self, image_url: str, user_preference: Optional[str]) -> Optional[Dict[str, Any]]:
+        return await self._cache.get(self.key_for(image_url, user_preference))
+
+    async def set(self, image_url: str, user_preference: Optional[str], result: Dict[str, Any]) -> None:
+        await self._cache.set(self.key_for(image_url, user_preference), result)
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+class TTSCache:
+    def __init__(self, cache: ResultCache) -> None:
+        self._cache = cache
+
+    @staticmethod
+    def key_for(*, voice_id: str, model_id: str, output_format: str, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"tts:{voice_id}:{model_id}:{output_format}:{text_hash}"
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._cache.get(key)
+
+    async def set(self, key: str, url: str) -> None:
+        await self._cache.set(key, url)
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+class PreprocessCache:
+    """Caches image analysis per (image, preference), with an image-only fallback.
+
+    The fallback entry is only written for ``clear`` results: clarity and the
+    central object rarely change with the subject tag, but an ``unclear``
+    verdict may mean "off-topic for this preference" and must be re-checked.
+    """
+
+    def __init__(
+        self,
+        cache: ResultCache,
+        *,
+        preference_fallback: bool = True,
+        content_url_prefix: Optional[str] = None,
+    ) -> None:
+        self._cache = cache
+        self._preference_fallback = preference_fallback
+        self._content_url_prefix = content_url_prefix
+
+    def key_for(self, image_url: str, user_preference: Optional[str]) -> str:
+        return f"{self.image_key_for(image_url)}:{normalize_preference(user_preference)}"
+
+    def image_key_for(self, image_url: str) -> str:
+        return f"preprocess:{image_fingerprint(image_url, self._content_url_prefix)}"
+
+    async def get(self, image_url: str, user_preference: Optional[str]) -> Optional[PreprocessResult]:
+        entry = await self._cache.get(self.key_for(image_url, user_preference))
+        if entry is None and self._preference_fallback:
+            entry = await self._cache.get(self.image_key_for(image_url))
+        if entry is None:
+            return None
+        return PreprocessResult(image_status=entry["image_status"], central_object=entry.get("central_object"))
+
+    async def set(self, image_url: str, user_preference: Optional[str], result: PreprocessResult) -> None:
+        entry = {"image_status": result.image_status, "central_object": result.central_object}
+        await self._cache.set(self.key_for(image_url, user_preference), entry)
+        if result.image_status == "clear" and result.central_object:
+            await self._cache.set(self.image_key_for(image_url), entry)
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+
+@lru_cache(maxsize=1)
+def get_card_result_cache() -> Optional[CardResultCache]:
+    settings = get_settings()
+    backend = build_cache_backend(
+        settings.card_cache_backend,
+        ttl_seconds=settings.card_cache_ttl_seconds,
+        max_entries=settings.card_cache_max_entries,
+        sqlite_path=settings.card_cache_sqlite_path,
+    )
+    if backend is None:
+        return None
+    return CardResultCache(ResultCache(backend), content_url_prefix=original_image_url_prefix())
+
+
+@lru_cache(maxsize=1)
+def get_tts_cache() -> Optional[TTSCache]:
+    settings = get_settings()
+    backend = build_cache_backend(
+        settings.tts_cache_backend,
+        ttl_seconds=settings.tts_cache_ttl_seconds,
+        max_entries=settings.tts_cache_max_entries,
+        sqlite_path=settings.tts_cache_sqlite_path,
+    )
+    return TTSCache(ResultCache(backend)) if backend is not None else None
+
+
+@lru_cache(maxsize=1)
+def get_preprocess_cache() -> Optional[PreprocessCache]:
+    settings = get_settings()
+    backend = build_cache_backend(
+        settings.preprocess_cache_backend,
+        ttl_seconds=settings.preprocess_cache_ttl_seconds,
+        max_entries=settings.preprocess_cache_max_entries,
+        sqlite_path=settings.preprocess_cache_sqlite_path,
+    )
+    if backend is None:
+        return None
+    return PreprocessCache(
+        ResultCache(backend),
+        preference_fallback=settings.preprocess_cache_preference_fallback,
+        content_url_prefix=original_image_url_prefix(),
+    )
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from src.clients.dify_client import DifyQAClient, QAResult, get_dify_qa_client
 from src.clients.elevenlabs_client import ElevenLabsClient, get_elevenlabs_client
+from src.config import get_settings
+from src.services.audio import AudioService, get_audio_service
 from src.services.storage import ImageUploadService, get_image_upload_service
+from src.utils.deadline import has_budget, with_deadline
 from src.utils.errors import AppException, ErrorCode, ExternalServiceError
 from src.utils.logger import get_logger
+from src.utils.signing import answer_token
 
 
 class ChatService:
@@ -17,10 +21,17 @@ class ChatService:
         qa_client: DifyQAClient,
         elevenlabs_client: ElevenLabsClient,
         storage_service: ImageUploadService,
+        audio_service: Optional[AudioService] = None,
+        audio_min_budget: float = 0.0,
     ) -> None:
         self.qa_client = qa_client
         self.elevenlabs_client = elevenlabs_client
         self.storage_service = storage_service
+        self.audio_service = audio_service or AudioService(
+            elevenlabs_client=elevenlabs_client,
+            storage_service=storage_service,
+        )
+        self.audio_min_budget = audio_min_budget
         self.logger = get_logger(self.__class__.__name__)
 
     async def chat(
@@ -49,14 +60,62 @@ class ChatService:
 
         return {
             "answer": qa_result.answer,
+            "answer_token": answer_token(qa_result.answer),
             "conversation_id": qa_result.conversation_id,
             "audio_url": audio_url,
         }
 
+    async def chat_stream(
+        self,
+        *,
+        question: str,
+        card_context: str,
+        user_id: str,
+        user_preference: Optional[str],
+        conversation_id: Optional[str],
+        image_url: Optional[str],
+        need_audio: bool,
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``("answer", {"delta": ...})`` events, then ``("done", metadata)``."""
+        parts = []
+        result = QAResult(answer="", conversation_id=conversation_id)
+        async for chunk in self.qa_client.ask_stream(
+            question=question,
+            card_context=card_context,
+            user_id=user_id,
+            user_preference=user_preference,
+            conversation_id=conversation_id,
+            image_url=image_url,
+        ):
+            if chunk.done:
+                result = QAResult(
+                    answer="".join(parts),
+                    conversation_id=chunk.conversation_id,
+                    message_id=chunk.message_id,
+                )
+            elif chunk.delta:
+                parts.append(chunk.delta)
+                yield "answer", {"delta": chunk.delta}
+
+        audio_url = None
+        if need_audio and result.answer:
+            audio_url = await self._maybe_generate_audio(result)
+
+        yield "done", {
+            "answer": result.answer,
+            "answer_token": answer_token(result.answer),
+            "conversation_id": result.conversation_id,
+            "message_id": result.message_id,
+            "audio_url": audio_url,
+        }
+
     async def _maybe_generate_audio(self, qa_result: QAResult) -> Optional[str]:
+        # The answer is already in hand; spend the rest of the deadline on audio only if enough is left.
+        if not has_budget(self.audio_min_budget):
+            self.logger.warning("剩余时间不足，跳过问答语音生成")
+            return None
         try:
-            audio_bytes = await self.elevenlabs_client.synthesize_speech(text=qa_result.answer)
-            return await self.storage_service.upload_audio(audio_bytes)
+            return await with_deadline(self.audio_service.text_to_audio_url(qa_result.answer))
         except (ExternalServiceError, AppException) as exc:
             self.logger.warning("问答语音生成失败: %s", exc)
             return None
@@ -68,4 +127,6 @@ def get_chat_service() -> ChatService:
         qa_client=get_dify_qa_client(),
         elevenlabs_client=get_elevenlabs_client(),
         storage_service=get_image_upload_service(),
+        audio_service=get_audio_service(),
+        audio_min_budget=get_settings().deadline_optional_stage_min_budget,
     )
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import lru_cache
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from src.config import get_settings
+from src.utils.errors import AppException, ErrorCode, format_error_response
+from src.utils.logger import get_logger
+from src.utils.metrics import REGISTRY
+
+JobRunner = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    payload: Dict[str, Any]
+    status: JobStatus = JobStatus.QUEUED
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"job_id": self.id, "status": self.status.value, "result": self.result, "error": self.error}
+
+
+class CardJobService:
+    """Runs card generation in a fixed pool of workers fed by a bounded queue.
+
+    Submissions beyond ``queue_size`` are rejected with 503 instead of piling
+    up; finished jobs are kept for ``ttl_seconds`` so clients can poll them.
+    """
+
+    def __init__(
+        self,
+        runner: JobRunner,
+        *,
+        workers: int = 4,
+        queue_size: int = 64,
+        ttl_seconds: float = 600.0,
+        max_wait_seconds: float = 25.0,
+    ) -> None:
+        self._runner = runner
+        self._worker_count = workers
+        self._queue_size = queue_size
+        self._ttl = ttl_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._logger = get_logger(self.__class__.__name__)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self._worker_count)]
+        self._tasks.append(asyncio.create_task(self._sweep_expired()))
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+
+    def submit(self, payload: Dict[str, Any]) -> Job:
+        self.start()
+        job = Job(id=uuid4().hex, payload=payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise AppException(
+                error_code=ErrorCode.SERVICE_UNAVAILABLE,
+                message="卡片生成任务繁忙，请稍后重试",
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            ) from None
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise AppException(
+                error_code=ErrorCode.NOT_FOUND,
+                message="任务不存在或已过期",
+                status_code=HTTPStatus.NOT_FOUND,
+            )
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Job:
+        """Return the job once it finishes or ``timeout`` seconds pass, whichever is first."""
+        job = self.get(job_id)
+        timeout = min(timeout, self.max_wait_seconds)
+        if timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": sum(1 for job in self._jobs.values() if job.status is JobStatus.RUNNING),
+            "tracked": len(self._jobs),
+        }
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job: Job = await self._queue.get()
+            job.status = JobStatus.RUNNING
+            try:
+                job.result = await self._runner(job.payload)
+                job.status = JobStatus.SUCCEEDED
+            except AppException as exc:
+                job.error = format_error_response(exc.error_code, str(exc.detail))
+                job.status = JobStatus.FAILED
+            except Exception:
+                self._logger.exception("卡片任务执行失败 job_id=%s worker=%d", job.id, index)
+                job.error = format_error_response(ErrorCode.INTERNAL_ERROR, "卡片生成失败")
+                job.status = JobStatus.FAILED
+            finally:
+                job.finished_at = time.monotonic()
+                job.done.set()
+                self._queue.task_done()
+
+    async def _sweep_expired(self) -> None:
+        while True:
+            await asyncio.sleep(min(max(self._ttl, 1.0), 60.0))
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        cutoff = time.monotonic() - self._ttl
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at <= cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+
+@lru_cache(maxsize=1)
+def get_card_job_service() -> CardJobService:
+    from src.services.pipeline import get_pipeline_service
+
+    settings = get_settings()
+
+    async def generate_card(payload: Dict[str, Any]) -> Dict[str, Any]:
+        return await get_pipeline_service().generate_card(payload)
+
+    return CardJobService(
+        generate_card,
+        workers=settings.card_job_workers,
+        queue_size=settings.card_job_queue_size,
+        ttl_seconds=settings.card_job_ttl_seconds,
+        max_wait_seconds=settings.card_job_max_wait_seconds,
+    )
+
+
+def _job_samples(field: str):
+    if not get_card_job_service.cache_info().currsize:
+        return []
+    return [({}, get_card_job_service().stats()[field])]
+
+
+REGISTRY.callback_gauge("snapopedia_card_jobs_queued", "Card jobs waiting for a worker.", lambda: _job_samples("queued"))
+REGISTRY.callback_gauge("snapopedia_card_jobs_running", "Card jobs being generated.", lambda: _job_samples("running"))
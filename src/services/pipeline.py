@@ -1,19 +1,26 @@
 import asyncio
+import json
 import logging
 from functools import lru_cache
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from src.clients.dify_client import (
     CardGenerationResult,
     DifyCardGenerationClient,
     DifyPreprocessingClient,
+    PreprocessResult,
 )
 from src.clients.elevenlabs_client import ElevenLabsClient
 from src.clients.gemini_client import GeminiClient
-from src.nodes.image_highlighten import PROMPT as HIGHLIGHT_PROMPT
+from src.config import get_settings
+from src.nodes import card_text_tts, image2card, image_analysis, image_highlighten
+from src.pipeline import Pipeline
+from src.services.audio import AudioService
+from src.services.cache import CardResultCache, PreprocessCache, get_card_result_cache, get_preprocess_cache
 from src.services.storage import ImageUploadService, get_image_upload_service
-from src.utils.errors import AppException, ErrorCode, ExternalServiceError
+from src.utils.deadline import with_deadline
 from src.utils.logger import get_logger
+from src.utils.singleflight import SingleFlight
 
 
 class PipelineService:
@@ -26,6 +33,16 @@ class PipelineService:
         elevenlabs_client: ElevenLabsClient,
         storage_service: ImageUploadService,
         logger: logging.Logger,
+        result_cache: Optional[CardResultCache] = None,
+        audio_service: Optional[AudioService] = None,
+        preprocess_cache: Optional[PreprocessCache] = None,
+        stage_retries: int = 0,
+        retry_backoff: float = 0.0,
+        optional_stage_timeout: Optional[float] = None,
+        optional_stage_max_concurrency: Optional[int] = None,
+        optional_stage_min_budget: Optional[float] = None,
+        highlight_thumbnail_max_edge: int = 320,
+        highlight_webp_quality: int = 85,
     ):
         self.preprocess_client = preprocess_client
         self.card_client = card_client
@@ -33,67 +50,173 @@ class PipelineService:
         self.elevenlabs_client = elevenlabs_client
         self.storage_service = storage_service
         self.logger = logger
+        self.result_cache = result_cache
+        self.preprocess_cache = preprocess_cache
+        self._inflight = SingleFlight()
+        self.audio_service = audio_service or AudioService(
+            elevenlabs_client=elevenlabs_client,
+            storage_service=storage_service,
+        )
+        self.card_pipeline = self._build_card_pipeline(
+            stage_retries=stage_retries,
+            retry_backoff=retry_backoff,
+            optional_stage_timeout=optional_stage_timeout,
+            optional_stage_max_concurrency=optional_stage_max_concurrency,
+            optional_stage_min_budget=optional_stage_min_budget,
+            highlight_thumbnail_max_edge=highlight_thumbnail_max_edge,
+            highlight_webp_quality=highlight_webp_quality,
+        )
 
     async def generate_card(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         image_url = payload["image_url"]
         user_preference = payload.get("user_preference")
-        user_id = payload.get("user_id", "snapopedia")
+        if self.result_cache is not None:
+            cached = await self.result_cache.get(image_url, user_preference)
+            if cached is not None:
+                self.logger.info("卡片缓存命中 image_url=%s", image_url)
+                return cached
 
-        preprocess = await self.preprocess_client.analyze(
-            image_url=image_url,
-            user_preference=user_preference,
-            user_id=user_id,
-        )
-        if preprocess.image_status != "clear" or not preprocess.central_object:
-            raise AppException(
-                error_code=ErrorCode.VALIDATION_ERROR,
-                message="图片不够清晰或与主题不符，请重新拍摄",
-            )
-
-        highlight_task = asyncio.create_task(
-            self._generate_highlight(image_url=image_url, central_object=preprocess.central_object)
-        )
-        card_result = await self.card_client.generate_card(
-            image_url=image_url,
-            central_object=preprocess.central_object,
-            user_preference=user_preference,
-            user_id=user_id,
+        # Identical payloads already in flight share one pipeline run, bounded by
+        # the latest of their deadlines; each caller waits only as long as its own allows.
+        flight_key = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return await with_deadline(self._inflight.do(flight_key, lambda: self._generate_and_store(payload)))
+
+    async def _generate_and_store(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        result = await self._run_pipeline(payload)
+        await self._store_result(payload, result)
+        return result
+
+    async def generate_card_stream(self, payload: Dict[str, Any]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``(event, data)`` pairs as each part of the card becomes available.
+
+        Events arrive in completion order: ``central_object``, ``card``
+        (title/desc), then ``highlighted_image_url`` and ``audio_url`` in
+        whichever order they finish, followed by ``done`` with the full result.
+        """
+        if self.result_cache is not None:
+            cached = await self.result_cache.get(payload["image_url"], payload.get("user_preference"))
+            if cached is not None:
+                for event in self._result_events(cached):
+                    yield event
+                yield "done", cached
+                return
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def on_result(name: str, value: Any) -> None:
+            event = self._stage_event(name, value)
+            if event is not None:
+                queue.put_nowait(event)
+
+        inputs = await self._pipeline_inputs(payload)
+        run_task = asyncio.create_task(self.card_pipeline.run(inputs, on_result=on_result))
+        run_task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+            results = run_task.result()
+        finally:
+            if not run_task.done():
+                run_task.cancel()
+                await asyncio.gather(run_task, return_exceptions=True)
+
+        result = self._build_result(results)
+        await self._store_result(payload, result)
+        yield "done", result
+
+    async def _run_pipeline(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        results = await self.card_pipeline.run(await self._pipeline_inputs(payload))
+        return self._build_result(results)
+
+    async def _store_result(self, payload: Dict[str, Any], result: Dict[str, Any]) -> None:
+        if self.result_cache is not None and result["highlighted_image_url"] and result["audio_url"]:
+            await self.result_cache.set(payload["image_url"], payload.get("user_preference"), result)
+
+    @staticmethod
+    def _stage_event(name: str, value: Any) -> Optional[Tuple[str, Dict[str, Any]]]:
+        if name == image_analysis.NAME:
+            return "central_object", {"central_object": value.central_object}
+        if name == image2card.NAME:
+            return "card", {"title": value.title, "desc": value.desc}
+        if name == image_highlighten.NAME:
+            return "highlighted_image_url", {
+                "highlighted_image_url": value.url if value else None,
+                "highlighted_thumbnail_url": value.thumbnail_url if value else None,
+            }
+        if name == card_text_tts.NAME:
+            return "audio_url", {"audio_url": value}
+        return None
+
+    @staticmethod
+    def _result_events(result: Dict[str, Any]) -> Tuple[Tuple[str, Dict[str, Any]], ...]:
+        return (
+            ("central_object", {"central_object": result["central_object"]}),
+            ("card", {"title": result["title"], "desc": result["desc"]}),
+            (
+                "highlighted_image_url",
+                {
+                    "highlighted_image_url": result["highlighted_image_url"],
+                    "highlighted_thumbnail_url": result.get("highlighted_thumbnail_url"),
+                },
+            ),
+            ("audio_url", {"audio_url": result["audio_url"]}),
         )
-        highlighted_url = await highlight_task
 
-        audio_url = await self._generate_audio(card_result)
+    async def _pipeline_inputs(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "image_url": payload["image_url"],
+            "upstream_image_url": await self.storage_service.upstream_image_url(payload["image_url"]),
+            "user_preference": payload.get("user_preference"),
+            "user_id": payload.get("user_id", "snapopedia"),
+        }
 
+    @staticmethod
+    def _build_result(results: Dict[str, Any]) -> Dict[str, Any]:
+        preprocess: PreprocessResult = results[image_analysis.NAME]
+        card_result: CardGenerationResult = results[image2card.NAME]
+        highlight: Optional[image_highlighten.HighlightImage] = results[image_highlighten.NAME]
         return {
             "title": card_result.title,
             "desc": card_result.desc,
             "central_object": preprocess.central_object,
-            "highlighted_image_url": highlighted_url,
-            "audio_url": audio_url,
+            "highlighted_image_url": highlight.url if highlight else None,
+            "highlighted_thumbnail_url": highlight.thumbnail_url if highlight else None,
+            "audio_url": results[card_text_tts.NAME],
         }
 
-    async def _generate_highlight(self, *, image_url: str, central_object: str) -> Optional[str]:
-        prompt = f"{HIGHLIGHT_PROMPT.strip()}\n中心物体：{central_object}"
-        try:
-            image_bytes = await self.gemini_client.highlight_object(image_url=image_url, prompt=prompt)
-            return await self.storage_service.upload_highlight_image(image_bytes)
-        except ExternalServiceError as exc:
-            self.logger.warning("高亮图生成失败: %s", exc)
-            return None
-        except AppException as exc:
-            self.logger.warning("高亮图上传失败: %s", exc)
-            return None
-
-    async def _generate_audio(self, card_result: CardGenerationResult) -> Optional[str]:
-        text = f"{card_result.title}。{card_result.desc}"
-        try:
-            audio_bytes = await self.elevenlabs_client.synthesize_speech(text=text)
-            return await self.storage_service.upload_audio(audio_bytes)
-        except ExternalServiceError as exc:
-            self.logger.warning("语音生成失败: %s", exc)
-            return None
-        except AppException as exc:
-            self.logger.warning("语音上传失败: %s", exc)
-            return None
+    def _build_card_pipeline(
+        self,
+        *,
+        stage_retries: int,
+        retry_backoff: float,
+        optional_stage_timeout: Optional[float],
+        optional_stage_max_concurrency: Optional[int],
+        optional_stage_min_budget: Optional[float] = None,
+        highlight_thumbnail_max_edge: int = 320,
+        highlight_webp_quality: int = 85,
+    ) -> Pipeline:
+        retry_options = {"retries": stage_retries, "retry_backoff": retry_backoff}
+        optional_options = {
+            "timeout": optional_stage_timeout,
+            "max_concurrency": optional_stage_max_concurrency,
+            "min_budget": optional_stage_min_budget,
+        }
+        return Pipeline(
+            [
+                image_analysis.build_node(self.preprocess_client, self.preprocess_cache, **retry_options),
+                image2card.build_node(self.card_client, **retry_options),
+                image_highlighten.build_node(
+                    self.gemini_client,
+                    self.storage_service,
+                    thumbnail_max_edge=highlight_thumbnail_max_edge,
+                    quality=highlight_webp_quality,
+                    **optional_options,
+                ),
+                card_text_tts.build_node(self.audio_service, **optional_options),
+            ],
+            name="card",
+            logger=self.logger,
+        )
 
 
 @lru_cache(maxsize=1)
@@ -101,7 +224,9 @@ def get_pipeline_service() -> PipelineService:
     from src.clients.dify_client import get_dify_card_generation_client, get_dify_preprocessing_client
     from src.clients.elevenlabs_client import get_elevenlabs_client
     from src.clients.gemini_client import get_gemini_client
+    from src.services.audio import get_audio_service
 
+    settings = get_settings()
     return PipelineService(
         preprocess_client=get_dify_preprocessing_client(),
         card_client=get_dify_card_generation_client(),
@@ -109,4 +234,14 @@ def get_pipeline_service() -> PipelineService:
         elevenlabs_client=get_elevenlabs_client(),
         storage_service=get_image_upload_service(),
         logger=get_logger("PipelineService"),
+        result_cache=get_card_result_cache(),
+        audio_service=get_audio_service(),
+        preprocess_cache=get_preprocess_cache(),
+        stage_retries=settings.pipeline_stage_retries,
+        retry_backoff=settings.pipeline_retry_backoff,
+        optional_stage_timeout=settings.pipeline_optional_stage_timeout,
+        optional_stage_max_concurrency=settings.pipeline_optional_stage_max_concurrency,
+        optional_stage_min_budget=settings.deadline_optional_stage_min_budget,
+        highlight_thumbnail_max_edge=settings.highlight_thumbnail_max_edge,
+        highlight_webp_quality=settings.highlight_webp_quality,
     )
@@ -1,17 +1,28 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import hashlib
+import math
+import os
 import time
-from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from http import HTTPStatus
-from typing import Dict, Optional
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
 from uuid import uuid4
 
 from fastapi import UploadFile
 
 from src.clients.r2_client import R2Client, R2ClientError
 from src.config import get_settings
-from src.utils.errors import AppException, ErrorCode
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breaker, guarded
+from src.utils.deadline import with_deadline
+from src.utils.errors import AppException, ErrorCode, ExternalServiceError
+from src.utils.images import pillow_available, probe, to_webp
 from src.utils.logger import get_logger
+from src.utils.metrics import PAYLOAD_BYTES, track_upstream
 
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "webp"}
 CONTENT_TYPE_MAPPING: Dict[str, str] = {
@@ -20,11 +31,41 @@ CONTENT_TYPE_MAPPING: Dict[str, str] = {
     "png": "image/png",
     "webp": "image/webp",
 }
+CONTENT_INDEX_SIZE = 10_000
+# How long a missing derivative is remembered before R2 is asked again.
+DERIVATIVE_MISS_TTL = 300.0
+ORIGINAL_PREFIX = "original_image"
+LOSSY_FORMATS = {"JPEG", "WEBP"}
 
 
 class ImageUploadService:
-    def __init__(self, r2_client: R2Client):
+    def __init__(
+        self,
+        r2_client: R2Client,
+        *,
+        max_workers: int = 8,
+        max_upload_bytes: int = 15 * 1024 * 1024,
+        chunk_size: int = 5 * 1024 * 1024,
+        content_addressed: bool = False,
+        derivative_max_edge: Optional[int] = None,
+        derivative_quality: int = 80,
+        derivative_workers: int = 2,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
         self._r2_client = r2_client
+        self._max_upload_bytes = max_upload_bytes
+        self._chunk_size = chunk_size
+        self._content_addressed = content_addressed
+        self._content_index: "OrderedDict[str, str]" = OrderedDict()
+        self._derivative_max_edge = derivative_max_edge if pillow_available() else None
+        self._derivative_quality = derivative_quality
+        self._derivative_idle = derivative_workers
+        self._derivative_executor = ThreadPoolExecutor(
+            max_workers=max(derivative_workers, 1), thread_name_prefix="image-derivative"
+        )
+        self._derivative_misses: "OrderedDict[str, float]" = OrderedDict()
+        self._breaker = breaker
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="r2-upload")
         self._logger = get_logger(self.__class__.__name__)
 
     async def upload_original_image(self, upload: UploadFile) -> str:
@@ -36,20 +77,138 @@ class ImageUploadService:
                 status_code=HTTPStatus.UNSUPPORTED_MEDIA_TYPE,
             )
 
-        content = await upload.read()
-        if not content:
-            raise AppException(error_code=ErrorCode.VALIDATION_ERROR, message="上传文件为空")
+        if upload.size is not None:
+            self._ensure_within_limit(upload.size)
+
+        if self._content_addressed:
+            digest = await self._hash_upload(upload)
+            key = self._build_content_key(ORIGINAL_PREFIX, digest, extension)
+            existing_url = await self._find_existing(key)
+            if existing_url:
+                # Its derivative, if any, was stored with the first upload.
+                return existing_url
+        else:
+            key = self._build_storage_key(ORIGINAL_PREFIX, extension)
+
+        url = await self._upload_stream(key=key, upload=upload, content_type=CONTENT_TYPE_MAPPING[extension])
+        await self._store_upstream_derivative(key, upload)
+        return url
+
+    async def upstream_image_url(self, image_url: str) -> str:
+        """URL of the downscaled derivative stored next to an uploaded original, or the original itself.
 
-        key = self._build_storage_key("original_image", extension)
-        return self._upload_bytes(key=key, data=content, content_type=CONTENT_TYPE_MAPPING[extension])
+        The derivative key follows from the original's key, so any worker can
+        find it through the content index or a HEAD request. Misses are
+        remembered for ``DERIVATIVE_MISS_TTL`` so repeated cards for an image
+        without one do not each pay a HEAD request.
+        """
+        base_url = self._r2_client.build_public_url("")
+        if not self._derivative_max_edge or not image_url.startswith(f"{base_url}{ORIGINAL_PREFIX}/"):
+            return image_url
+        key = self._derivative_key(image_url[len(base_url) :])
+        missed_until = self._derivative_misses.get(key)
+        if missed_until is not None and missed_until > time.monotonic():
+            return image_url
+        try:
+            derivative_url = await self._find_existing(key)
+        except AppException as exc:
+            self._logger.warning("查询派生图失败，使用原图: %s", exc)
+            return image_url
+        if derivative_url is None:
+            self._remember_miss(key)
+            return image_url
+        return derivative_url
 
     async def upload_highlight_image(self, data: bytes, extension: str = "png") -> str:
-        key = self._build_storage_key("highlighted_image", extension)
-        return self._upload_bytes(key=key, data=data, content_type=f"image/{extension}")
+        return await self._upload_derived(
+            "highlighted_image", data=data, extension=extension, content_type=f"image/{extension}"
+        )
+
+    async def upload_highlight_thumbnail(self, data: bytes, extension: str = "webp") -> str:
+        return await self._upload_derived(
+            "highlighted_thumbnail", data=data, extension=extension, content_type=f"image/{extension}"
+        )
 
     async def upload_audio(self, data: bytes, extension: str = "mp3") -> str:
-        key = self._build_storage_key("card_audio", extension)
-        return self._upload_bytes(key=key, data=data, content_type="audio/mpeg")
+        return await self._upload_derived("card_audio", data=data, extension=extension, content_type="audio/mpeg")
+
+    async def _upload_stream(self, *, key: str, upload: UploadFile, content_type: str) -> str:
+        first_chunk = await upload.read(self._chunk_size)
+        if not first_chunk:
+            raise AppException(error_code=ErrorCode.VALIDATION_ERROR, message="上传文件为空")
+        self._ensure_within_limit(len(first_chunk))
+        if len(first_chunk) < self._chunk_size:
+            return await self._upload_bytes(key=key, data=first_chunk, content_type=content_type)
+        return await self._upload_multipart(key=key, upload=upload, first_chunk=first_chunk, content_type=content_type)
+
+    async def _store_upstream_derivative(self, original_key: str, upload: UploadFile) -> None:
+        """Store a downscaled WebP of the upload next to the original for upstream vision calls.
+
+        Runs once the original is stored, on a small executor of its own so
+        photo encodes never queue behind (or hold up) other worker-thread
+        users. Pillow decodes straight from the spooled upload file. When every
+        encoder is busy the derivative is skipped and cards use the original;
+        failures are non-fatal.
+        """
+        if not self._derivative_max_edge:
+            return
+        if self._derivative_idle <= 0:
+            self._logger.info("派生图编码繁忙，跳过 key=%s", original_key)
+            return
+        self._derivative_idle -= 1
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(
+                self._derivative_executor, self._encode_from_file, upload.file
+            )
+        except Exception as exc:
+            self._logger.warning("生成缩略派生图失败: %s", exc)
+            return
+        finally:
+            self._derivative_idle += 1
+        if data is None:
+            return
+
+        key = self._derivative_key(original_key)
+        try:
+            url = await self._upload_bytes(key=key, data=data, content_type="image/webp")
+        except AppException:
+            self._logger.warning("派生图上传失败 key=%s", key)
+            return
+        self._remember(key, url)
+        self._derivative_misses.pop(key, None)
+
+    def _encode_from_file(self, file: BinaryIO) -> Optional[bytes]:
+        size = file.seek(0, os.SEEK_END)
+        if not size or size > self._max_upload_bytes:
+            # Empty or oversized uploads are rejected by the upload itself.
+            return None
+        file.seek(0)
+        header = probe(file)
+        if header is not None and header[0] in LOSSY_FORMATS and max(header[1]) <= self._derivative_max_edge:
+            # Already small and lossy: re-encoding would cost a full decode for no gain.
+            return None
+        try:
+            data = to_webp(file, max_edge=self._derivative_max_edge, quality=self._derivative_quality)
+        finally:
+            file.seek(0)
+        if data is None or len(data) >= size:
+            return None
+        return data
+
+    async def _upload_derived(self, prefix: str, *, data: bytes, extension: str, content_type: str) -> str:
+        if not self._content_addressed:
+            key = self._build_storage_key(prefix, extension)
+            return await self._upload_bytes(key=key, data=data, content_type=content_type)
+
+        key = self._build_content_key(prefix, hashlib.sha256(data).hexdigest(), extension)
+        existing_url = await self._find_existing(key)
+        if existing_url:
+            return existing_url
+        return await self._upload_bytes(key=key, data=data, content_type=content_type)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._derivative_executor.shutdown(wait=False)
 
     def _resolve_extension(self, upload: UploadFile) -> str:
         if upload.filename:
@@ -81,16 +240,136 @@ class ImageUploadService:
         random_id = uuid4().hex[:8]
         return f"{prefix}/{timestamp}_{random_id}.{extension}"
 
-    def _upload_bytes(self, *, key: str, data: bytes, content_type: str) -> str:
+    @staticmethod
+    def _derivative_key(original_key: str) -> str:
+        return f"{original_key.rsplit('.', 1)[0]}.upstream.webp"
+
+    @staticmethod
+    def _build_content_key(prefix: str, digest: str, extension: str) -> str:
+        return f"{prefix}/{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+    async def _hash_upload(self, upload: UploadFile) -> str:
+        digest = hashlib.sha256()
+        total = 0
+        while chunk := await upload.read(self._chunk_size):
+            total += len(chunk)
+            self._ensure_within_limit(total)
+            digest.update(chunk)
+        await upload.seek(0)
+        return digest.hexdigest()
+
+    async def _find_existing(self, key: str) -> Optional[str]:
+        url = self._content_index.get(key)
+        if url is not None:
+            self._content_index.move_to_end(key)
+        elif await self._call_r2(self._r2_client.object_exists, key=key):
+            url = self._r2_client.build_public_url(key)
+            self._remember(key, url)
+        if url is not None:
+            self._logger.info("R2 命中已存在内容 key=%s", key)
+        return url
+
+    def _remember(self, key: str, url: str) -> None:
+        self._content_index[key] = url
+        self._content_index.move_to_end(key)
+        while len(self._content_index) > CONTENT_INDEX_SIZE:
+            self._content_index.popitem(last=False)
+
+    def _remember_miss(self, key: str) -> None:
+        self._derivative_misses[key] = time.monotonic() + DERIVATIVE_MISS_TTL
+        self._derivative_misses.move_to_end(key)
+        while len(self._derivative_misses) > CONTENT_INDEX_SIZE:
+            self._derivative_misses.popitem(last=False)
+
+    def _ensure_within_limit(self, size: int) -> None:
+        if size > self._max_upload_bytes:
+            raise AppException(
+                error_code=ErrorCode.VALIDATION_ERROR,
+                message=f"上传文件超过 {self._max_upload_bytes // (1024 * 1024)}MB 限制",
+                status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            )
+
+    async def _call_r2(self, func: Callable[..., Any], **kwargs: Any) -> Any:
         try:
-            url = self._r2_client.upload_file(key=key, data=data, content_type=content_type)
-        except R2ClientError as exc:
+            with guarded(self._breaker), track_upstream("r2", func.__name__):
+                context = contextvars.copy_context()
+                try:
+                    # The executor thread cannot be cancelled; the deadline only stops the wait.
+                    result = await with_deadline(
+                        asyncio.get_running_loop().run_in_executor(
+                            self._executor, partial(context.run, func, **kwargs)
+                        )
+                    )
+                except R2ClientError as exc:
+                    # Re-raised as an upstream error so the breaker counts it.
+                    raise ExternalServiceError("r2", str(exc)) from exc
+        except CircuitOpenError as exc:
+            raise AppException(
+                error_code=ErrorCode.SERVICE_UNAVAILABLE,
+                message="存储服务暂不可用",
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(exc.retry_after))},
+            ) from exc
+        except ExternalServiceError as exc:
             self._logger.error("R2 上传失败: %s", exc)
             raise AppException(error_code=ErrorCode.STORAGE_ERROR, message="文件上传失败", status_code=502) from exc
+        if "data" in kwargs:
+            PAYLOAD_BYTES.inc(len(kwargs["data"]), peer="r2", direction="sent")
+        return result
 
+    async def _upload_bytes(self, *, key: str, data: bytes, content_type: str) -> str:
+        url = await self._call_r2(self._r2_client.upload_file, key=key, data=data, content_type=content_type)
+        if self._content_addressed:
+            self._remember(key, url)
         self._logger.info("R2 已上传 key=%s", key)
         return url
 
+    async def _upload_multipart(self, *, key: str, upload: UploadFile, first_chunk: bytes, content_type: str) -> str:
+        upload_id = await self._call_r2(self._r2_client.create_multipart_upload, key=key, content_type=content_type)
+        parts: List[Dict[str, Any]] = []
+        total = 0
+        chunk = first_chunk
+        try:
+            while chunk:
+                total += len(chunk)
+                self._ensure_within_limit(total)
+                part_number = len(parts) + 1
+                etag = await self._call_r2(
+                    self._r2_client.upload_part,
+                    key=key,
+                    upload_id=upload_id,
+                    part_number=part_number,
+                    data=chunk,
+                )
+                parts.append({"PartNumber": part_number, "ETag": etag})
+                chunk = await upload.read(self._chunk_size)
+            url = await self._call_r2(
+                self._r2_client.complete_multipart_upload,
+                key=key,
+                upload_id=upload_id,
+                parts=parts,
+            )
+        except BaseException:
+            await self._abort_multipart(key=key, upload_id=upload_id)
+            raise
+
+        if self._content_addressed:
+            self._remember(key, url)
+        self._logger.info("R2 已分片上传 key=%s parts=%d bytes=%d", key, len(parts), total)
+        return url
+
+    async def _abort_multipart(self, *, key: str, upload_id: str) -> None:
+        # Cleanup bypasses the breaker and the deadline: the failure that got us here
+        # may have just opened the breaker or spent the budget, and the orphaned
+        # parts would otherwise stay billed until a lifecycle rule removes them.
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                partial(self._r2_client.abort_multipart_upload, key=key, upload_id=upload_id),
+            )
+        except R2ClientError:
+            self._logger.warning("R2 分片上传清理失败 key=%s upload_id=%s", key, upload_id)
+
 
 @lru_cache(maxsize=1)
 def get_r2_client() -> R2Client:
@@ -100,4 +379,15 @@ def get_r2_client() -> R2Client:
 
 @lru_cache(maxsize=1)
 def get_image_upload_service() -> ImageUploadService:
-    return ImageUploadService(get_r2_client())
+    settings = get_settings()
+    return ImageUploadService(
+        get_r2_client(),
+        max_workers=settings.r2_upload_workers,
+        max_upload_bytes=settings.upload_max_bytes,
+        chunk_size=settings.upload_chunk_size,
+        content_addressed=settings.r2_content_addressed,
+        derivative_max_edge=settings.upload_derivative_max_edge or None,
+        derivative_quality=settings.upload_derivative_quality,
+        derivative_workers=settings.upload_derivative_workers,
+        breaker=get_circuit_breaker("r2"),
+    )
@@ -0,0 +1,207 @@
+"""Per-route admission control: bounded concurrency, bounded queue, fast 503s.
+
+Requests beyond ``max_concurrency`` wait in a FIFO queue of at most
+``max_queue`` entries; anything beyond that (or waiting longer than
+``queue_timeout``) is rejected with 503 and a ``Retry-After`` estimated from
+an EWMA of observed service time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from http import HTTPStatus
+from typing import AsyncIterator, Callable, Deque, Dict, Optional, Union
+
+from src.config import get_settings
+from src.utils.deadline import DeadlineExceeded, clip_timeout, expired
+from src.utils.errors import AppException, ErrorCode
+from src.utils.metrics import REGISTRY
+
+ADMISSION_ROUTES = ("cards", "chat")
+
+
+class AdmissionTicket:
+    """A granted slot; ``release`` is idempotent so several cleanup paths may call it."""
+
+    def __init__(self, controller: "AdmissionController") -> None:
+        self._controller = controller
+        self._started_at = time.monotonic()
+        self._released = False
+        self.handed_over = False
+
+    def hand_over(self) -> None:
+        """Mark that a streaming response now owns the ticket and releases it when the body ends."""
+        self.handed_over = True
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(time.monotonic() - self._started_at)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: Optional[float] = None,
+        ewma_alpha: float = 0.2,
+        initial_service_time: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._alpha = ewma_alpha
+        self.service_time = initial_service_time
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> AdmissionTicket:
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return AdmissionTicket(self)
+        if len(self._waiters) >= self.max_queue:
+            self._reject()
+
+        # Queueing past the request deadline is pointless; give up when it runs out.
+        timeout = clip_timeout(self.queue_timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self._release(None)
+            else:
+                waiter.cancel()
+                self._discard(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                if expired():
+                    raise DeadlineExceeded() from exc
+                self._reject()
+            raise
+        return AdmissionTicket(self)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[AdmissionTicket]:
+        ticket = await self.acquire()
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def retry_after(self) -> int:
+        waves = (len(self._waiters) + 1) / max(self.max_concurrency, 1)
+        return max(1, math.ceil(self.service_time * waves))
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "service_time_seconds": round(self.service_time, 3),
+        }
+
+    def _reject(self) -> None:
+        self.rejected += 1
+        raise AppException(
+            error_code=ErrorCode.SERVICE_UNAVAILABLE,
+            message="服务繁忙，请稍后重试",
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(self.retry_after())},
+        )
+
+    def _release(self, elapsed: Optional[float]) -> None:
+        if elapsed is not None:
+            self.service_time += self._alpha * (elapsed - self.service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+@lru_cache(maxsize=None)
+def get_admission_controller(route: str) -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(
+        route,
+        max_concurrency=getattr(settings, f"admission_{route}_max_concurrency"),
+        max_queue=getattr(settings, f"admission_{route}_max_queue"),
+        queue_timeout=settings.admission_queue_timeout,
+    )
+
+
+def admission_stats() -> Dict[str, Dict[str, Union[int, float]]]:
+    return {route: get_admission_controller(route).stats() for route in ADMISSION_ROUTES}
+
+
+REGISTRY.callback_gauge(
+    "snapopedia_admission_in_flight",
+    "Requests holding an admission slot per route group.",
+    lambda: [({"route": route}, stats["in_flight"]) for route, stats in admission_stats().items()],
+)
+REGISTRY.callback_gauge(
+    "snapopedia_admission_queued",
+    "Requests waiting for an admission slot per route group.",
+    lambda: [({"route": route}, stats["queued"]) for route, stats in admission_stats().items()],
+)
+REGISTRY.callback_counter(
+    "snapopedia_admission_rejected_total",
+    "Requests shed with 503 per route group since start.",
+    lambda: [({"route": route}, stats["rejected"]) for route, stats in admission_stats().items()],
+)
+
+
+def admission_slot(route: str) -> Callable[[], AsyncIterator[None]]:
+    """Dependency that holds a slot for the duration of the route handler."""
+
+    async def dependency() -> AsyncIterator[None]:
+        async with get_admission_controller(route).slot():
+            yield
+
+    return dependency
+
+
+def admission_ticket(route: str) -> Callable[[], AsyncIterator[AdmissionTicket]]:
+    """Dependency for streaming routes: the handler hands the ticket over to its response body.
+
+    Dependency teardown runs before a ``StreamingResponse`` body is sent, so a
+    handler that streams calls ``ticket.hand_over()`` and releases the ticket
+    when the body ends. Otherwise it is released here, including when the
+    handler never runs because the request failed validation.
+    """
+
+    async def dependency() -> AsyncIterator[AdmissionTicket]:
+        ticket = await get_admission_controller(route).acquire()
+        try:
+            yield ticket
+        finally:
+            if not ticket.handed_over:
+                ticket.release()
+
+    return dependency
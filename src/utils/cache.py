@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Protocol, Tuple
+
+
+class CacheBackend(Protocol):
+    # Whether get/set do blocking I/O and must run off the event loop.
+    blocking: bool
+
+    def get(self, key: str) -> Optional[Any]: ...
+
+    def set(self, key: str, value: Any) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def __len__(self) -> int: ...
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry expiry."""
+
+    blocking = False
+
+    def __init__(self, *, ttl_seconds: float, max_entries: int) -> None:
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """LRU with expiry persisted to a local SQLite file; values must be JSON-serializable."""
+
+    blocking = True
+
+    def __init__(self, path: str, *, ttl_seconds: float, max_entries: int) -> None:
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + self._ttl, now),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class ResultCache:
+    """Cache facade that counts hits and misses for a backend.
+
+    Calls into a blocking backend run in a worker thread so a slow disk
+    never stalls the event loop.
+    """
+
+    def __init__(self, backend: CacheBackend) -> None:
+        self._backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._call(self._backend.get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._call(self._backend.set, key, value)
+
+    async def delete(self, key: str) -> None:
+        await self._call(self._backend.delete, key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._backend)}
+
+    async def _call(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._backend.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+
+def build_cache_backend(
+    kind: str,
+    *,
+    ttl_seconds: float,
+    max_entries: int,
+    sqlite_path: str,
+) -> Optional[CacheBackend]:
+    kind = kind.lower()
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return MemoryCacheBackend(ttl_seconds=ttl_seconds, max_entries=max_entries)
+    if kind == "sqlite":
+        return SQLiteCacheBackend(sqlite_path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+    raise ValueError(f"Unknown cache backend: {kind}")
@@ -0,0 +1,181 @@
+"""Per-upstream circuit breakers.
+
+A breaker opens after ``failure_threshold`` consecutive upstream failures
+and rejects calls with ``CircuitOpenError`` for ``recovery_timeout`` seconds.
+After that it lets ``half_open_max_calls`` probes through: a successful probe
+closes it and a failed one opens it again. ``CircuitOpenError`` is an
+``ExternalServiceError``, so optional pipeline stages soft-fail on it right
+away instead of waiting out the upstream timeout.
+
+Only upstream trouble counts as a failure: timeouts, transport errors, 5xx
+and 429. Other 4xx responses are the caller's problem and leave the breaker
+alone. A call that is cancelled or cut short by the request deadline
+counts as neither success nor failure.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from contextlib import contextmanager, nullcontext
+from enum import Enum
+from functools import lru_cache
+from typing import Callable, ContextManager, Dict, Iterator, Optional, Union
+
+import httpx
+
+from src.config import get_settings
+from src.utils.errors import ExternalServiceError
+from src.utils.metrics import REGISTRY
+
+CIRCUIT_UPSTREAMS = ("dify", "gemini", "elevenlabs", "r2")
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ExternalServiceError):
+    def __init__(self, service: str, retry_after: float) -> None:
+        super().__init__(service, f"{service} 熔断中，暂停调用")
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, ExternalServiceError):
+        return exc.status_code is None or exc.status_code >= 500 or exc.status_code == 429
+    return isinstance(exc, (httpx.TransportError, TimeoutError))
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        is_failure: Callable[[BaseException], bool] = is_upstream_failure,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._is_failure = is_failure
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        if self.state is not CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (self._clock() - self._opened_at))
+
+    def allow(self) -> None:
+        """Claim permission for one call or raise ``CircuitOpenError``."""
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return
+        if state is CircuitState.HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.name, self.retry_after() or self.recovery_timeout)
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state is CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = CircuitState.OPEN
+            self._opened_at = self._clock()
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Run the body as one call through the breaker."""
+        self.allow()
+        probe = self._state is CircuitState.HALF_OPEN
+        try:
+            yield
+        except BaseException as exc:
+            failed = self._is_failure(exc)
+            if failed or isinstance(exc, ExternalServiceError):
+                self._settle(probe, failed=failed)
+            elif probe:
+                # Cancelled or out of request budget: hand the slot to the next caller.
+                self._probes -= 1
+            raise
+        else:
+            self._settle(probe, failed=False)
+
+    def _settle(self, probe: bool, *, failed: bool) -> None:
+        # Calls that started before the breaker opened do not move it; only
+        # closed-state calls and half-open probes do.
+        if not probe and self._state is not CircuitState.CLOSED:
+            return
+        if failed:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def stats(self) -> Dict[str, Union[str, int, float]]:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self._failures,
+            "rejected": self.rejected,
+            "retry_after_seconds": math.ceil(self.retry_after()),
+        }
+
+
+def guarded(breaker: Optional[CircuitBreaker]) -> ContextManager[None]:
+    """``breaker.guard()``, or a no-op when the caller was built without a breaker."""
+    return breaker.guard() if breaker is not None else nullcontext()
+
+
+@lru_cache(maxsize=None)
+def get_circuit_breaker(upstream: str) -> Optional[CircuitBreaker]:
+    settings = get_settings()
+    if not settings.circuit_breaker_enabled:
+        return None
+    return CircuitBreaker(
+        upstream,
+        failure_threshold=settings.circuit_breaker_failure_threshold,
+        recovery_timeout=settings.circuit_breaker_recovery_timeout,
+        half_open_max_calls=settings.circuit_breaker_half_open_max_calls,
+    )
+
+
+def circuit_stats() -> Dict[str, Dict[str, Union[str, int, float]]]:
+    breakers = {upstream: get_circuit_breaker(upstream) for upstream in CIRCUIT_UPSTREAMS}
+    return {upstream: breaker.stats() for upstream, breaker in breakers.items() if breaker is not None}
+
+
+_STATE_VALUES = {CircuitState.CLOSED.value: 0, CircuitState.HALF_OPEN.value: 1, CircuitState.OPEN.value: 2}
+
+REGISTRY.callback_gauge(
+    "snapopedia_circuit_state",
+    "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open).",
+    lambda: [({"upstream": name}, _STATE_VALUES[stats["state"]]) for name, stats in circuit_stats().items()],
+)
+REGISTRY.callback_counter(
+    "snapopedia_circuit_rejected_total",
+    "Calls rejected by an open circuit breaker per upstream.",
+    lambda: [({"upstream": name}, stats["rejected"]) for name, stats in circuit_stats().items()],
+)
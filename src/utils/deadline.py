@@ -0,0 +1,159 @@
+"""Request deadlines: one latency budget shared by every stage of a request.
+
+A route opts in with ``Depends(request_deadline(route))``. The budget is
+``deadline_{route}_seconds`` from settings (0 disables the default),
+shortened but never extended by an ``X-Request-Timeout`` header in
+seconds. It is bound to a context variable as an absolute event-loop time,
+so tasks spawned while handling the request inherit it. Clients clip their
+own timeouts to what is left with ``clip_timeout``; optional stages check
+``has_budget`` before starting.
+Running out surfaces as ``DeadlineExceeded`` (504). Work shared by several
+requests runs against a ``SharedDeadline`` derived from all of theirs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, TypeVar, Union
+
+from fastapi import Request
+
+from src.config import get_settings
+from src.utils.errors import AppException, ErrorCode
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "X-Request-Timeout"
+# A timeout this close to the deadline is blamed on the deadline, not the upstream.
+EXPIRY_SLACK = 0.05
+
+_deadline: ContextVar[Optional[Union[float, "SharedDeadline"]]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(AppException):
+    def __init__(self, message: str = "请求处理超时") -> None:
+        super().__init__(
+            error_code=ErrorCode.DEADLINE_EXCEEDED,
+            message=message,
+            status_code=HTTPStatus.GATEWAY_TIMEOUT,
+        )
+
+
+class SharedDeadline:
+    """Deadline of work that several requests wait on: the latest of the waiters' deadlines.
+
+    It starts as the first waiter's deadline and moves as waiters join and
+    leave; a waiter without a deadline lifts it entirely. Checks made later
+    (``has_budget``, ``clip_timeout``) see the current value, but a timeout
+    already armed keeps the value it was armed with.
+    """
+
+    def __init__(self) -> None:
+        self._waiters: List[Optional[Union[float, SharedDeadline]]] = []
+
+    def join(self) -> Optional[Union[float, SharedDeadline]]:
+        """Add the current context's deadline as a waiter; pass the result to ``leave``."""
+        deadline = _deadline.get()
+        self._waiters.append(deadline)
+        return deadline
+
+    def leave(self, deadline: Optional[Union[float, SharedDeadline]]) -> None:
+        self._waiters.remove(deadline)
+
+    @property
+    def at(self) -> Optional[float]:
+        deadlines = [_resolve(waiter) for waiter in self._waiters]
+        if not deadlines or None in deadlines:
+            return None
+        return max(deadlines)  # type: ignore[type-var]
+
+
+def _resolve(deadline: Optional[Union[float, SharedDeadline]]) -> Optional[float]:
+    return deadline.at if isinstance(deadline, SharedDeadline) else deadline
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or ``None`` without a deadline."""
+    deadline = _resolve(_deadline.get())
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+
+def expired() -> bool:
+    budget = remaining()
+    return budget is not None and budget <= EXPIRY_SLACK
+
+
+def has_budget(seconds: float) -> bool:
+    budget = remaining()
+    return budget is None or budget >= seconds
+
+
+def clip_timeout(timeout: Optional[float]) -> Optional[float]:
+    """The smaller of ``timeout`` and the remaining budget; raises once the budget is spent."""
+    budget = remaining()
+    if budget is None:
+        return timeout
+    if budget <= 0:
+        raise DeadlineExceeded()
+    return budget if timeout is None else min(timeout, budget)
+
+
+async def with_deadline(awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable``, cancelling it and raising ``DeadlineExceeded`` when the budget runs out."""
+    budget = remaining()
+    if budget is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=max(budget, 0))
+    except asyncio.TimeoutError as exc:
+        raise DeadlineExceeded() from exc
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Bind a deadline ``seconds`` from now, or none at all, for the body."""
+    deadline = None if seconds is None else asyncio.get_running_loop().time() + seconds
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def share_deadline() -> SharedDeadline:
+    """Bind a fresh ``SharedDeadline`` in the current context, for work shared by several requests."""
+    shared = SharedDeadline()
+    _deadline.set(shared)
+    return shared
+
+
+def parse_timeout_header(value: Optional[str]) -> Optional[float]:
+    try:
+        seconds = float(value) if value else None
+    except ValueError:
+        return None
+    if seconds is None or not seconds > 0 or seconds == float("inf"):
+        return None
+    return seconds
+
+
+def request_deadline(route: str) -> Callable[[Request], AsyncIterator[None]]:
+    """Dependency that binds the route's deadline for the duration of the handler.
+
+    The deadline is released when the handler returns, so streaming bodies
+    sent afterwards are not bound by it.
+    """
+
+    async def dependency(request: Request) -> AsyncIterator[None]:
+        default: float = getattr(get_settings(), f"deadline_{route}_seconds")
+        requested = parse_timeout_header(request.headers.get(DEADLINE_HEADER))
+        candidates = [seconds for seconds in (default, requested) if seconds is not None and seconds > 0]
+        with deadline_scope(min(candidates) if candidates else None):
+            yield
+
+    return dependency
@@ -1,6 +1,6 @@
 from enum import Enum
 from http import HTTPStatus
-from typing import Any
+from typing import Any, Dict, Optional
 
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
@@ -14,12 +14,22 @@ class ErrorCode(str, Enum):
     NOT_IMPLEMENTED = "not_implemented"
     STORAGE_ERROR = "storage_error"
     EXTERNAL_SERVICE_ERROR = "external_service_error"
+    NOT_FOUND = "not_found"
+    SERVICE_UNAVAILABLE = "service_unavailable"
+    DEADLINE_EXCEEDED = "deadline_exceeded"
 
 
 class AppException(StarletteHTTPException):
-    def __init__(self, *, error_code: ErrorCode, message: str, status_code: int = HTTPStatus.BAD_REQUEST):
+    def __init__(
+        self,
+        *,
+        error_code: ErrorCode,
+        message: str,
+        status_code: int = HTTPStatus.BAD_REQUEST,
+        headers: Optional[Dict[str, str]] = None,
+    ):
         self.error_code = error_code
-        super().__init__(status_code=status_code, detail=message)
+        super().__init__(status_code=status_code, detail=message, headers=headers)
 
 
 def format_error_response(error_code: ErrorCode, message: str) -> dict[str, Any]:
@@ -29,7 +39,11 @@ def format_error_response(error_code: ErrorCode, message: str) -> dict[str, Any]
 def register_exception_handlers(app: FastAPI) -> None:
     @app.exception_handler(AppException)
     async def app_exception_handler(_: Request, exc: AppException) -> JSONResponse:
-        return JSONResponse(status_code=exc.status_code, content=format_error_response(exc.error_code, str(exc.detail)))
+        return JSONResponse(
+            status_code=exc.status_code,
+            content=format_error_response(exc.error_code, str(exc.detail)),
+            headers=exc.headers,
+        )
 
     @app.exception_handler(RequestValidationError)
     async def validation_exception_handler(_: Request, exc: RequestValidationError) -> JSONResponse:
@@ -42,7 +56,11 @@ def register_exception_handlers(app: FastAPI) -> None:
     @app.exception_handler(StarletteHTTPException)
     async def http_exception_handler(_: Request, exc: StarletteHTTPException) -> JSONResponse:
         code = ErrorCode.INTERNAL_ERROR if exc.status_code >= 500 else ErrorCode.VALIDATION_ERROR
-        return JSONResponse(status_code=exc.status_code, content=format_error_response(code, str(exc.detail)))
+        return JSONResponse(
+            status_code=exc.status_code,
+            content=format_error_response(code, str(exc.detail)),
+            headers=exc.headers,
+        )
 
 
 class ExternalServiceError(RuntimeError):
@@ -0,0 +1,108 @@
+"""Hedged requests: send a backup call when the first one is slower than usual.
+
+The hedge delay tracks a quantile (p95 by default) of recently observed
+latencies, so only the slow tail gets a second call. Hedges are paid for
+from a token budget that every request tops up by ``budget_percent / 100``,
+which caps them at roughly that share of traffic even when the upstream is
+slow across the board.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from src.utils.metrics import REGISTRY
+
+T = TypeVar("T")
+
+HEDGE_REQUESTS = REGISTRY.counter(
+    "snapopedia_hedge_requests_total",
+    "Calls eligible for hedging by upstream and operation.",
+)
+HEDGES_SENT = REGISTRY.counter(
+    "snapopedia_hedges_total",
+    "Backup calls sent after the hedge delay by upstream and operation.",
+)
+HEDGE_WINS = REGISTRY.counter(
+    "snapopedia_hedge_wins_total",
+    "Backup calls that answered before the original by upstream and operation.",
+)
+
+
+class HedgePolicy:
+    def __init__(
+        self,
+        upstream: str,
+        operation: str,
+        *,
+        budget_percent: float = 5.0,
+        quantile: float = 0.95,
+        min_delay: float = 0.05,
+        window: int = 256,
+        min_samples: int = 20,
+        max_tokens: float = 10.0,
+    ) -> None:
+        self.upstream = upstream
+        self.operation = operation
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._earn_rate = budget_percent / 100
+        self._max_tokens = max_tokens
+        self._tokens = 0.0
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    def delay(self) -> Optional[float]:
+        """Current hedge delay, or ``None`` until enough latencies have been observed."""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.quantile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def record(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    async def run(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Await ``func()``, racing a second ``func()`` against it once the hedge delay passes.
+
+        The first successful call wins and the other is cancelled. If one call
+        fails while the other is still running, the other one decides the
+        outcome.
+        """
+        labels = {"upstream": self.upstream, "operation": self.operation}
+        HEDGE_REQUESTS.inc(**labels)
+        self._tokens = min(self._max_tokens, self._tokens + self._earn_rate)
+        delay = self.delay()
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(func())
+        pending = {primary}
+        try:
+            if delay is not None and self._tokens >= 1:
+                await asyncio.wait(pending, timeout=delay)
+            if delay is None or primary.done() or self._tokens < 1:
+                result = await primary
+                self.record(time.monotonic() - started)
+                return result
+
+            self._tokens -= 1
+            HEDGES_SENT.inc(**labels)
+            hedge = asyncio.ensure_future(func())
+            pending.add(hedge)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    self.record(time.monotonic() - started)
+                    if winner is hedge:
+                        HEDGE_WINS.inc(**labels)
+                    return winner.result()
+            # Both failed; surface the original call's error.
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,77 @@
+"""Image transcoding helpers. Pillow is optional; without it these return ``None``."""
+
+from __future__ import annotations
+
+from io import BytesIO
+from typing import BinaryIO, List, Optional, Sequence, Tuple, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    Image = None
+    ImageOps = None
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def probe(data: Union[bytes, BinaryIO]) -> Optional[Tuple[str, Tuple[int, int]]]:
+    """Format and size read from the image header without decoding pixels, or ``None``.
+
+    A file is rewound to where it was.
+    """
+    if Image is None:
+        return None
+    position = None if isinstance(data, bytes) else data.tell()
+    try:
+        with Image.open(BytesIO(data) if isinstance(data, bytes) else data) as image:
+            return image.format, image.size
+    except (OSError, ValueError):
+        return None
+    finally:
+        if position is not None:
+            data.seek(position)
+
+
+def to_webp(data: Union[bytes, BinaryIO], *, max_edge: Optional[int] = None, quality: int = 80) -> Optional[bytes]:
+    """Re-encode ``data`` as WebP, shrinking it so its long edge is at most ``max_edge``.
+
+    EXIF orientation is applied first so the derivative looks like the photo
+    the user saw. Returns ``None`` when Pillow is not installed.
+    """
+    variants = to_webp_variants(data, max_edges=(max_edge,), quality=quality)
+    return variants[0] if variants is not None else None
+
+
+def to_webp_variants(
+    data: Union[bytes, BinaryIO],
+    *,
+    max_edges: Sequence[Optional[int]],
+    quality: int = 80,
+) -> Optional[List[bytes]]:
+    """Decode ``data`` (bytes or a binary file) once and encode one WebP per entry of ``max_edges``.
+
+    A ``None`` edge keeps the full size. When every edge is bounded, JPEGs
+    are decoded in draft mode at the smallest 1/2, 1/4 or 1/8 scale that
+    still covers the largest one, which is much cheaper than a full decode.
+    """
+    if Image is None:
+        return None
+    with Image.open(BytesIO(data) if isinstance(data, bytes) else data) as source:
+        if max_edges and all(max_edges):
+            largest = max(edge for edge in max_edges if edge)
+            source.draft(None, (largest, largest))  # a no-op for other formats
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        return [_encode_webp(image, max_edge, quality) for max_edge in max_edges]
+
+
+def _encode_webp(image: "Image.Image", max_edge: Optional[int], quality: int) -> bytes:
+    if max_edge and max(image.size) > max_edge:
+        image = image.copy()
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    output = BytesIO()
+    image.save(output, format="WEBP", quality=quality, method=4)
+    return output.getvalue()
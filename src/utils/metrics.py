@@ -0,0 +1,315 @@
+"""In-process metrics registry rendered in the Prometheus text format.
+
+Metrics are only updated from the event loop thread (R2 calls are timed
+around the executor await, not inside the worker), so updates are plain
+dict operations without locks. Histograms use fixed buckets chosen at
+registration time; ``observe`` is a bisect plus two additions.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import httpx
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.errors import ExternalServiceError
+from src.utils.tracing import record_span
+
+LabelKey = Tuple[Tuple[str, str], ...]
+Sample = Tuple[Dict[str, str], float]
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_key(labels), 0.0)
+
+    def render(self) -> Iterator[str]:
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[_key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class CallbackGauge:
+    """Gauge whose samples are read from ``collect`` at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._collect = collect
+
+    def render(self) -> Iterator[str]:
+        for labels, value in self._collect():
+            yield f"{self.name}{_format_labels(_key(labels))} {_format_value(value)}"
+
+
+class CallbackCounter(CallbackGauge):
+    type = "counter"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(_key(labels))
+        return int(sum(state[:-1])) if state else 0
+
+    def render(self) -> Iterator[str]:
+        for key, state in list(self._values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(state[-1])}"
+            yield f"{self.name}_count{_format_labels(key)} {_format_value(cumulative)}"
+
+
+Metric = Union[Counter, Gauge, CallbackGauge, CallbackCounter, Histogram]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(name, lambda: Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(name, lambda: Gauge(name, documentation))
+
+    def callback_gauge(self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]]) -> CallbackGauge:
+        return self._register(name, lambda: CallbackGauge(name, documentation, collect))
+
+    def callback_counter(
+        self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]]
+    ) -> CallbackCounter:
+        return self._register(name, lambda: CallbackCounter(name, documentation, collect))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, name: str, factory: Callable[[], Metric]):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = factory()
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "snapopedia_http_request_seconds",
+    "Latency of API requests by route, method and status.",
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "snapopedia_http_requests_in_flight",
+    "API requests currently being handled.",
+)
+UPSTREAM_REQUEST_SECONDS = REGISTRY.histogram(
+    "snapopedia_upstream_request_seconds",
+    "Latency of upstream calls by upstream, operation and outcome status.",
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "snapopedia_upstream_errors_total",
+    "Failed upstream calls by upstream, operation and status.",
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    "snapopedia_upstream_in_flight",
+    "Upstream calls currently in flight.",
+)
+PAYLOAD_BYTES = REGISTRY.counter(
+    "snapopedia_payload_bytes_total",
+    "Bytes exchanged with upstreams and clients by peer and direction.",
+)
+PIPELINE_STAGE_SECONDS = REGISTRY.histogram(
+    "snapopedia_pipeline_stage_seconds",
+    "Duration of each pipeline stage by pipeline, stage and outcome.",
+)
+EVENT_LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "snapopedia_event_loop_lag_seconds",
+    "How late the event loop woke up a periodic probe.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+HIGHLIGHT_BYTES_SAVED = REGISTRY.counter(
+    "snapopedia_highlight_bytes_saved_total",
+    "Bytes saved by transcoding Gemini highlight images before upload.",
+)
+
+
+def _resident_memory_bytes() -> List[Sample]:
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return []
+    return [({}, pages * os.sysconf("SC_PAGE_SIZE"))]
+
+
+REGISTRY.callback_gauge(
+    "snapopedia_process_resident_memory_bytes",
+    "Resident set size of the API process (Linux only).",
+    _resident_memory_bytes,
+)
+
+
+async def monitor_event_loop_lag(interval: float = 0.25) -> None:
+    """Sleep ``interval`` repeatedly and record how much later than requested each wakeup was."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+
+
+def error_status(exc: BaseException) -> str:
+    if isinstance(exc, ExternalServiceError) and exc.status_code is not None:
+        return str(exc.status_code)
+    if isinstance(exc, httpx.HTTPStatusError):
+        return str(exc.response.status_code)
+    if isinstance(exc, httpx.TimeoutException) or isinstance(exc, TimeoutError):
+        return "timeout"
+    return "error"
+
+
+@contextmanager
+def track_upstream(upstream: str, operation: str) -> Iterator[None]:
+    """Time an upstream call, count failures by status and add it to the request's spans."""
+    UPSTREAM_IN_FLIGHT.inc(upstream=upstream)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException as exc:
+        status = "cancelled" if isinstance(exc, (asyncio.CancelledError, GeneratorExit)) else error_status(exc)
+        if status != "cancelled":
+            UPSTREAM_ERRORS.inc(upstream=upstream, operation=operation, status=status)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_IN_FLIGHT.dec(upstream=upstream)
+        UPSTREAM_REQUEST_SECONDS.observe(elapsed, upstream=upstream, operation=operation, status=status)
+        record_span(f"{upstream}-{operation}", elapsed)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency, in-flight requests and response bytes."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                PAYLOAD_BYTES.inc(len(message.get("body", b"")), peer="client", direction="sent")
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # Label by route template so path parameters do not explode cardinality.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, route=route, method=scope["method"], status=str(status)
+            )
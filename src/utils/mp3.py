@@ -0,0 +1,74 @@
+"""Frame-level MP3 helpers for joining separately synthesized segments."""
+
+from typing import Iterator, List, Optional, Sequence
+
+_BITRATES_MPEG1_L3 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_MPEG2_L3 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),  # MPEG-2.5
+}
+_VBR_TAGS = (b"Xing", b"Info", b"VBRI")
+
+
+def _frame_length(header: bytes) -> Optional[int]:
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_index == 3:
+        return None
+
+    sample_rate = _SAMPLE_RATES[version][sample_index]
+    if version == 3:
+        return 144_000 * _BITRATES_MPEG1_L3[bitrate_index] // sample_rate + padding
+    return 72_000 * _BITRATES_MPEG2_L3[bitrate_index] // sample_rate + padding
+
+
+def _skip_id3v2(data: bytes) -> int:
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def iter_frames(data: bytes) -> Iterator[memoryview]:
+    """Yield each MPEG layer III audio frame, skipping tags and stray bytes."""
+    view = memoryview(data)
+    end = len(data) - 128 if len(data) >= 128 and data[-128:-125] == b"TAG" else len(data)
+    offset = _skip_id3v2(data)
+    while offset + 4 <= end:
+        length = _frame_length(data[offset : offset + 4])
+        if length is None or offset + length > end:
+            offset += 1
+            continue
+        yield view[offset : offset + length]
+        offset += length
+
+
+def _is_vbr_header(frame: memoryview) -> bool:
+    head = bytes(frame[:64])
+    return any(tag in head for tag in _VBR_TAGS)
+
+
+def concat_mp3(segments: Sequence[bytes]) -> bytes:
+    """Join MP3 segments at frame boundaries.
+
+    ID3 tags and per-segment Xing/Info/VBRI header frames are dropped, since they would
+    describe only one segment and make players report the wrong duration.
+    Raises ``ValueError`` when a segment contains no audio frames.
+    """
+    frames: List[memoryview] = []
+    for segment in segments:
+        segment_frames = list(iter_frames(segment))
+        if segment_frames and _is_vbr_header(segment_frames[0]):
+            segment_frames = segment_frames[1:]
+        if not segment_frames:
+            raise ValueError("MP3 segment contains no audio frames")
+        frames.extend(segment_frames)
+    return b"".join(frames)
@@ -0,0 +1,84 @@
+"""JSON encoding and decoding with an optional orjson fast path.
+
+``orjson`` is an optional dependency (``pip install .[fast]``). Without it
+these helpers fall back to the stdlib with the same output: compact
+separators and non-ASCII kept as UTF-8. ``orjson.JSONDecodeError`` subclasses
+``json.JSONDecodeError``, so callers catch the stdlib exception either way.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Mapping, Optional, Union
+
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    orjson = None
+
+JSONDecodeError = json.JSONDecodeError
+
+FENCE = "```"
+
+
+def orjson_available() -> bool:
+    return orjson is not None
+
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_fenced_json(answer: str) -> Any:
+    """Parse a JSON answer that may be wrapped in a Markdown code fence (```json ... ```).
+
+    The fence is located by index checks on the stripped text and the body
+    is handed to the parser as one slice; JSON parsers skip the whitespace
+    around it themselves.
+    """
+    text = answer.strip()
+    if len(text) >= 2 * len(FENCE) and text.startswith(FENCE) and text.endswith(FENCE):
+        start = len(FENCE)
+        if text[start : start + 4].lower() == "json":
+            start += 4
+        text = text[start : -len(FENCE)]
+    return loads(text)
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered through :func:`dumps`; used as the app's default response class."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class ModelResponse(Response):
+    """Serialize a response model straight to JSON bytes.
+
+    Returning this from a route skips FastAPI's re-validation of the return
+    value against ``response_model`` and the intermediate dict it builds for
+    the JSON encoder; ``response_model`` still documents the schema.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        model: BaseModel,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ) -> None:
+        super().__init__(model.model_dump_json().encode("utf-8"), status_code, headers, self.media_type, background)
@@ -0,0 +1,36 @@
+"""HMAC tokens that tie client-supplied text back to an answer this service generated.
+
+Chat answers carry ``answer_token(answer)``; ``/chat/audio/stream`` only
+voices text whose token verifies, so it cannot be used to synthesize
+arbitrary text. The key comes from ``ANSWER_TOKEN_SECRET``. Without it a
+random per-process key is used, which only works with a single worker.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import secrets
+from functools import lru_cache
+
+from src.config import get_settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _key() -> bytes:
+    secret = get_settings().answer_token_secret
+    if not secret:
+        logger.warning("未配置 ANSWER_TOKEN_SECRET，回答令牌仅在当前进程内有效")
+        return secrets.token_bytes(32)
+    return secret.encode("utf-8")
+
+
+def answer_token(text: str) -> str:
+    return hmac.new(_key(), text.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def verify_answer_token(text: str, token: str) -> bool:
+    return hmac.compare_digest(answer_token(text), token)
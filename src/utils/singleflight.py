@@ -0,0 +1,80 @@
+"""Coalesce concurrent identical calls into one shared execution."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from typing import Any, Callable, Coroutine, Dict, Hashable, Tuple, TypeVar
+
+from src.utils.deadline import SharedDeadline, share_deadline
+from src.utils.tracing import detach_spans, merge_spans
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "deadline", "spans", "waiters")
+
+    def __init__(self, task: asyncio.Task, deadline: SharedDeadline, spans: Dict[str, float]) -> None:
+        self.task = task
+        self.deadline = deadline
+        self.spans = spans
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one ``func`` per key at a time; concurrent callers share its outcome.
+
+    Every waiter gets the same result or exception. A waiter that is
+    cancelled only detaches itself; the shared task is cancelled once no
+    waiters remain, so a single disconnect never aborts the others.
+
+    The shared task runs against the latest deadline of the callers still
+    waiting on it (``SharedDeadline``), so a caller with a short budget cannot
+    fail the work for a later one with more time, while a lone caller's budget
+    still trims optional work; each caller bounds its own wait
+    (``with_deadline``). Likewise the shared task records its stage spans into a table of its own, which every waiter that
+    sees it finish merges into its request's spans.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            context = contextvars.copy_context()
+            deadline, spans = context.run(_detach)
+            call = _Call(asyncio.get_running_loop().create_task(func(), context=context), deadline, spans)
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+
+        call.waiters += 1
+        waiter_deadline = call.deadline.join()
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            if call.task.done():
+                merge_spans(call.spans)
+            call.deadline.leave(waiter_deadline)
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        self._forget(key, call)
+        if not call.task.cancelled():
+            # Mark the exception as retrieved when every waiter has already left.
+            call.task.exception()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+def _detach() -> Tuple[SharedDeadline, Dict[str, float]]:
+    return share_deadline(), detach_spans()
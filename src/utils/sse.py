@@ -0,0 +1,40 @@
+from typing import Any, List, Optional, Tuple
+
+from src.utils.serialization import dumps
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_sse(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+class SSEDecoder:
+    """Incremental decoder for ``text/event-stream`` bodies, fed one line at a time."""
+
+    def __init__(self) -> None:
+        self._event: Optional[str] = None
+        self._data: List[str] = []
+
+    def feed(self, line: str) -> Optional[Tuple[str, str]]:
+        if not line:
+            return self.flush()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            self._event = value
+        elif field == "data":
+            self._data.append(value)
+        return None
+
+    def flush(self) -> Optional[Tuple[str, str]]:
+        if not self._data:
+            self._event = None
+            return None
+        event = (self._event or "message", "\n".join(self._data))
+        self._event = None
+        self._data = []
+        return event
@@ -0,0 +1,28 @@
+import re
+from typing import List
+
+SENTENCE_END_PATTERN = re.compile(r"(?<=[。！？；…!?;])|(?<=\.)(?=\s)|\n+")
+
+
+def split_sentences(text: str, max_chars: int) -> List[str]:
+    """Split text at Chinese/English sentence boundaries, packing sentences into chunks of at most ``max_chars``.
+
+    A single sentence longer than ``max_chars`` is kept whole rather than cut mid-sentence.
+    """
+    sentences = [part.strip() for part in SENTENCE_END_PATTERN.split(text) if part and part.strip()]
+    chunks: List[str] = []
+    current = ""
+    for sentence in sentences:
+        candidate = f"{current} {sentence}" if current and _needs_space(current, sentence) else current + sentence
+        if current and len(candidate) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _needs_space(left: str, right: str) -> bool:
+    return left[-1].isascii() and right[0].isascii()
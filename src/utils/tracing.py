@@ -0,0 +1,126 @@
+"""Per-request trace id and stage spans, surfaced as ``Server-Timing`` and a log line.
+
+The middleware binds a trace id (from ``X-Request-ID`` or a fresh one) and
+an empty span table to context variables. Code anywhere below it calls
+``record_span``; tasks spawned during the request inherit the context, so
+their spans land in the same table. Work shared by several requests runs
+against its own table (``detach_spans``), which each waiter then merges into
+its own with ``merge_spans``.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.utils.logger import get_logger
+
+TRACE_HEADER = "X-Request-ID"
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+_spans: ContextVar[Optional[Dict[str, float]]] = ContextVar("spans", default=None)
+
+logger = get_logger(__name__)
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+def record_span(name: str, seconds: float) -> None:
+    """Add ``seconds`` to span ``name`` of the current request; a no-op outside requests."""
+    spans = _spans.get()
+    if spans is not None:
+        spans[name] = spans.get(name, 0.0) + seconds
+
+
+def detach_spans() -> Dict[str, float]:
+    """Bind a fresh span table in the current context and return it."""
+    spans: Dict[str, float] = {}
+    _spans.set(spans)
+    return spans
+
+
+def merge_spans(spans: Dict[str, float]) -> None:
+    """Record every span of ``spans`` under the current request."""
+    for name, seconds in spans.items():
+        record_span(name, seconds)
+
+
+def format_server_timing(spans: Dict[str, float], total: Optional[float] = None) -> str:
+    entries: List[Tuple[str, float]] = list(spans.items())
+    if total is not None:
+        entries.append(("total", total))
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in entries)
+
+
+def _sanitize_trace_id(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    value = value.strip()[:128]
+    if value and all(char.isalnum() or char in "-_.:" for char in value):
+        return value
+    return None
+
+
+class TracingMiddleware:
+    """Bind a trace id per request, echo it back and add ``Server-Timing`` from recorded spans.
+
+    The header carries the spans finished when the response starts, which for
+    streaming responses is only the work done before the first byte; the log
+    line written at the end always has the full set.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        trace_id = _sanitize_trace_id(headers.get(TRACE_HEADER.lower().encode(), b"").decode("latin-1"))
+        trace_id = trace_id or uuid4().hex
+        spans: Dict[str, float] = {}
+        trace_token = _trace_id.set(trace_id)
+        spans_token = _spans.set(spans)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = format_server_timing(spans, time.perf_counter() - started)
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (TRACE_HEADER.lower().encode(), trace_id.encode()),
+                    (b"server-timing", timing.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration = time.perf_counter() - started
+            _trace_id.reset(trace_token)
+            _spans.reset(spans_token)
+            logger.info(
+                json.dumps(
+                    {
+                        "trace_id": trace_id,
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status,
+                        "duration_ms": round(duration * 1000, 1),
+                        "spans_ms": {name: round(seconds * 1000, 1) for name, seconds in spans.items()},
+                    },
+                    ensure_ascii=False,
+                )
+            )
@@ -0,0 +1,15 @@
+"""Synthetic MP3 segments shaped like ElevenLabs output, shared by the audio tests."""
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding -> 417-byte frames
+FRAME_HEADER = b"\xff\xfb\x90\x00"
+FRAME_LENGTH = 417
+
+
+def make_frame(fill: bytes = b"\x00", tag: bytes = b"") -> bytes:
+    body = tag + fill * (FRAME_LENGTH - 4 - len(tag))
+    return FRAME_HEADER + body
+
+
+def make_segment(frame_count: int, fill: bytes) -> bytes:
+    id3 = b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"x" * 5
+    return id3 + make_frame(tag=b"\x00" * 32 + b"Info") + make_frame(fill) * frame_count
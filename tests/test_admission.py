@@ -0,0 +1,72 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from src.api import cards
+from src.main import app
+from src.utils.admission import AdmissionController, get_admission_controller
+from src.utils.errors import AppException
+
+
+def test_admission_queues_then_sheds_with_retry_after():
+    async def run():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=1, initial_service_time=2.0)
+        first = await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        assert (controller.in_flight, controller.queued) == (1, 1)
+
+        try:
+            await controller.acquire()
+        except AppException as exc:
+            rejected = exc
+        first.release()
+        second = await queued
+        second.release()
+        return controller, rejected
+
+    controller, rejected = asyncio.run(run())
+
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "4"
+    assert (controller.in_flight, controller.queued, controller.rejected) == (0, 0, 1)
+
+
+def test_admission_queue_timeout_and_cancellation_free_the_queue():
+    async def run():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=2, queue_timeout=0.01)
+        ticket = await controller.acquire()
+        try:
+            await controller.acquire()
+        except AppException as exc:
+            assert exc.status_code == 503
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert controller.queued == 0
+        ticket.release()
+        ticket.release()
+        return controller
+
+    controller = asyncio.run(run())
+
+    assert controller.in_flight == 0
+
+
+def test_generate_endpoint_returns_503_when_over_capacity():
+    controller = get_admission_controller("cards")
+    saved = controller.in_flight, controller.max_queue
+    controller.in_flight, controller.max_queue = controller.max_concurrency, 0
+    app.dependency_overrides[cards.get_service] = lambda: None
+    try:
+        response = TestClient(app).post("/api/v1/cards/generate", json={"image_url": "http://img.example.com/a.jpg"})
+        health = TestClient(app).get("/health").json()
+    finally:
+        controller.in_flight, controller.max_queue = saved
+        app.dependency_overrides.pop(cards.get_service, None)
+
+    assert response.status_code == 503
+    assert response.json()["error"] == "service_unavailable"
+    assert int(response.headers["retry-after"]) >= 1
+    assert health["data"]["admission"]["cards"]["in_flight"] == controller.max_concurrency
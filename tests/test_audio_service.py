@@ -0,0 +1,153 @@
+import asyncio
+
+from src.services.audio import AudioService
+from src.services.cache import TTSCache
+from src.utils.cache import ResultCache, SQLiteCacheBackend
+from tests.mp3_samples import make_segment
+
+
+class CountingElevenLabsClient:
+    voice_id = "voice"
+
+    def __init__(self):
+        self.calls = []
+
+    async def synthesize_speech(self, *, text: str, model_id: str, output_format: str):
+        self.calls.append((text, model_id, output_format))
+        return b"audio"
+
+    async def stream_speech(self, *, text: str, model_id: str, output_format: str):
+        self.calls.append((text, model_id, output_format))
+        for chunk in (b"au", b"dio"):
+            yield chunk
+
+
+class CountingStorageService:
+    def __init__(self):
+        self.uploads = 0
+
+    async def upload_audio(self, data: bytes, extension: str = "mp3"):
+        self.uploads += 1
+        self.last_data = data
+        return f"https://files/audio-{self.uploads}.mp3"
+
+
+def build_audio_service(cache_path: str, **kwargs):
+    backend = SQLiteCacheBackend(cache_path, ttl_seconds=60, max_entries=10)
+    client = CountingElevenLabsClient()
+    storage = CountingStorageService()
+    service = AudioService(
+        elevenlabs_client=client,  # type: ignore[arg-type]
+        storage_service=storage,  # type: ignore[arg-type]
+        tts_cache=TTSCache(ResultCache(backend)),
+        **kwargs,
+    )
+    return service, client, storage
+
+
+def test_repeated_text_is_served_from_tts_cache(tmp_path):
+    service, client, storage = build_audio_service(str(tmp_path / "tts.sqlite3"))
+
+    async def run():
+        first = await service.text_to_audio_url("你好")
+        second = await service.text_to_audio_url("你好")
+        third = await service.text_to_audio_url("再见")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first == second == "https://files/audio-1.mp3"
+    assert third == "https://files/audio-2.mp3"
+    assert len(client.calls) == 2
+    assert storage.uploads == 2
+
+
+def test_tts_cache_survives_restart_and_separates_formats(tmp_path):
+    path = str(tmp_path / "tts.sqlite3")
+    service, _, _ = build_audio_service(path)
+    url = asyncio.run(service.text_to_audio_url("hello"))
+
+    restarted, client, _ = build_audio_service(path)
+    assert asyncio.run(restarted.text_to_audio_url("hello")) == url
+    assert client.calls == []
+
+    other_format, client, _ = build_audio_service(path, output_format="mp3_44100_128")
+    asyncio.run(other_format.text_to_audio_url("hello"))
+    assert client.calls == [("hello", "eleven_flash_v2_5", "mp3_44100_128")]
+
+
+def test_streamed_audio_is_relayed_then_stored_and_cached(tmp_path):
+    service, client, storage = build_audio_service(str(tmp_path / "tts.sqlite3"))
+
+    async def run():
+        received = [chunk async for chunk in service.stream_text_to_audio("你好")]
+        await asyncio.gather(*service._background_uploads)
+        return received
+
+    received = asyncio.run(run())
+    assert received == [b"au", b"dio"]
+    assert storage.last_data == b"audio"
+    assert asyncio.run(service.cached_audio_url("你好")) == "https://files/audio-1.mp3"
+
+
+def test_interrupted_audio_stream_uploads_nothing(tmp_path):
+    service, _, storage = build_audio_service(str(tmp_path / "tts.sqlite3"))
+
+    async def run():
+        chunks = service.stream_text_to_audio("你好")
+        await anext(chunks)
+        await chunks.aclose()
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert storage.uploads == 0
+    assert asyncio.run(service.cached_audio_url("你好")) is None
+
+
+def test_long_text_is_synthesized_in_parallel_chunks(tmp_path):
+    class ChunkedClient(CountingElevenLabsClient):
+        async def synthesize_speech(self, *, text: str, model_id: str, output_format: str):
+            self.calls.append((text, model_id, output_format))
+            return make_segment(2, b"\x01")
+
+    client = ChunkedClient()
+    storage = CountingStorageService()
+    service = AudioService(
+        elevenlabs_client=client,  # type: ignore[arg-type]
+        storage_service=storage,  # type: ignore[arg-type]
+        chunk_threshold_chars=10,
+        chunk_max_chars=12,
+    )
+
+    audio = asyncio.run(service.synthesize("第一句话很长很长。第二句话也很长。第三句。"))
+
+    assert [call[0] for call in client.calls] == ["第一句话很长很长。", "第二句话也很长。第三句。"]
+    assert len(audio) == 4 * 417
+
+
+def test_parallel_chunk_synthesis_is_bounded_by_max_parallel_chunks():
+    active = 0
+    peak = 0
+
+    class SlowClient(CountingElevenLabsClient):
+        async def synthesize_speech(self, *, text: str, model_id: str, output_format: str):
+            nonlocal active, peak
+            self.calls.append((text, model_id, output_format))
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return make_segment(1, b"\x01")
+
+    client = SlowClient()
+    service = AudioService(
+        elevenlabs_client=client,  # type: ignore[arg-type]
+        storage_service=CountingStorageService(),  # type: ignore[arg-type]
+        chunk_threshold_chars=4,
+        chunk_max_chars=3,
+        max_parallel_chunks=2,
+    )
+
+    asyncio.run(service.synthesize("一二。三四。五六。七八。九十。"))
+
+    assert len(client.calls) == 5
+    assert peak == 2
@@ -0,0 +1,34 @@
+import pytest
+
+from src.utils.mp3 import concat_mp3, iter_frames
+from src.utils.text import split_sentences
+from tests.mp3_samples import FRAME_LENGTH, make_segment
+
+
+def test_split_sentences_handles_chinese_and_english_punctuation():
+    text = "叶子是植物的器官。它能进行光合作用！Leaves are green. Pi is 3.14 today?"
+
+    assert split_sentences(text, max_chars=10) == [
+        "叶子是植物的器官。",
+        "它能进行光合作用！",
+        "Leaves are green.",
+        "Pi is 3.14 today?",
+    ]
+
+
+def test_split_sentences_packs_short_sentences_up_to_limit():
+    assert split_sentences("一。二。三。四。", max_chars=4) == ["一。二。", "三。四。"]
+    assert split_sentences("A long sentence without a break", max_chars=5) == ["A long sentence without a break"]
+
+
+def test_concat_mp3_keeps_only_audio_frames():
+    joined = concat_mp3([make_segment(2, b"\x01"), make_segment(3, b"\x02") + b"TAG" + b"\x00" * 125])
+
+    frames = list(iter_frames(joined))
+    assert len(joined) == 5 * FRAME_LENGTH
+    assert [bytes(frame[4:5]) for frame in frames] == [b"\x01"] * 2 + [b"\x02"] * 3
+
+
+def test_concat_mp3_rejects_segment_without_frames():
+    with pytest.raises(ValueError):
+        concat_mp3([make_segment(1, b"\x01"), b"not audio"])
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+from src.clients.dify_client import PreprocessResult
+from src.services.cache import CardResultCache, PreprocessCache, image_fingerprint
+from src.utils.cache import MemoryCacheBackend, ResultCache, SQLiteCacheBackend
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(ttl_seconds=60, max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1
+    backend.set("c", 3)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == 1
+    assert backend.get("c") == 3
+
+
+def test_memory_backend_expires_entries():
+    backend = MemoryCacheBackend(ttl_seconds=0.01, max_entries=10)
+    backend.set("a", 1)
+    time.sleep(0.02)
+    assert backend.get("a") is None
+    assert len(backend) == 0
+
+
+def test_sqlite_backend_persists_and_bounds_size(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteCacheBackend(path, ttl_seconds=60, max_entries=2)
+    backend.set("a", {"title": "标题"})
+    backend.set("b", {"title": "b"})
+    backend.set("c", {"title": "c"})
+    backend.close()
+
+    reopened = SQLiteCacheBackend(path, ttl_seconds=60, max_entries=2)
+    assert len(reopened) == 2
+    assert reopened.get("c") == {"title": "c"}
+    assert reopened.get("a") is None
+
+
+def test_result_cache_counts_hits_and_misses():
+    cache = ResultCache(MemoryCacheBackend(ttl_seconds=60, max_entries=10))
+
+    async def run():
+        assert await cache.get("k") is None
+        await cache.set("k", "v")
+        assert await cache.get("k") == "v"
+
+    asyncio.run(run())
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_result_cache_runs_sqlite_backend_off_the_event_loop(tmp_path):
+    threads = set()
+
+    class RecordingBackend(SQLiteCacheBackend):
+        def get(self, key):
+            threads.add(threading.get_ident())
+            return super().get(key)
+
+        def set(self, key, value):
+            threads.add(threading.get_ident())
+            super().set(key, value)
+
+    cache = ResultCache(RecordingBackend(str(tmp_path / "cache.sqlite3"), ttl_seconds=60, max_entries=10))
+
+    async def run():
+        await cache.set("k", {"v": 1})
+        return await cache.get("k")
+
+    assert asyncio.run(run()) == {"v": 1}
+    assert threads and threading.get_ident() not in threads
+
+
+ORIGINALS = "https://files/original_image/"
+
+
+def memory_cache() -> ResultCache:
+    return ResultCache(MemoryCacheBackend(ttl_seconds=60, max_entries=10))
+
+
+def test_card_cache_key_uses_content_hash_and_normalized_preference():
+    digest = "a" * 64
+    cache = CardResultCache(memory_cache(), content_url_prefix=ORIGINALS)
+    first = cache.key_for(f"https://files/original_image/aa/aa/{digest}.jpg", " Biology ")
+    second = cache.key_for(f"https://files/original_image/aa/aa/{digest}.png?v=1", "biology")
+
+    assert first == second
+    assert image_fingerprint(f"{ORIGINALS}aa/aa/{digest}.jpg", ORIGINALS) == digest
+    assert image_fingerprint("https://files/123_abc.jpg") != image_fingerprint("https://files/456_def.jpg")
+
+
+def test_digest_named_url_elsewhere_does_not_collide_with_our_original():
+    digest = "a" * 64
+    ours = f"{ORIGINALS}aa/aa/{digest}.jpg"
+    card_cache = CardResultCache(memory_cache(), content_url_prefix=ORIGINALS)
+    preprocess_cache = PreprocessCache(memory_cache(), content_url_prefix=ORIGINALS)
+
+    for foreign in (
+        f"https://attacker.example/anything/{digest}.png",
+        f"https://files/highlighted_image/aa/aa/{digest}.png",
+        f"{ORIGINALS}bb/bb/{digest}.jpg",
+    ):
+        assert image_fingerprint(foreign, ORIGINALS) != digest
+        assert card_cache.key_for(foreign, None) != card_cache.key_for(ours, None)
+        assert preprocess_cache.image_key_for(foreign) != preprocess_cache.image_key_for(ours)
+
+
+def test_preprocess_cache_falls_back_to_clear_image_result():
+    cache = PreprocessCache(ResultCache(MemoryCacheBackend(ttl_seconds=60, max_entries=10)))
+
+    async def run():
+        await cache.set(
+            "http://img", "biology", PreprocessResult(image_status="clear", central_object="leaf", conversation_id="c")
+        )
+        exact = await cache.get("http://img", "biology")
+        other = await cache.get("http://img", "physics")
+
+        assert exact == PreprocessResult(image_status="clear", central_object="leaf")
+        assert other == PreprocessResult(image_status="clear", central_object="leaf")
+        assert await cache.get("http://other", "biology") is None
+
+    asyncio.run(run())
+
+
+def test_preprocess_cache_does_not_generalize_unclear_result():
+    cache = PreprocessCache(ResultCache(MemoryCacheBackend(ttl_seconds=60, max_entries=10)))
+
+    async def run():
+        await cache.set("http://img", "biology", PreprocessResult(image_status="unclear"))
+
+        assert (await cache.get("http://img", "biology")).image_status == "unclear"
+        assert await cache.get("http://img", "physics") is None
+
+    asyncio.run(run())
+
+
+def test_preprocess_cache_fallback_can_be_disabled():
+    cache = PreprocessCache(ResultCache(MemoryCacheBackend(ttl_seconds=60, max_entries=10)), preference_fallback=False)
+
+    async def run():
+        await cache.set("http://img", "biology", PreprocessResult(image_status="clear", central_object="leaf"))
+
+        assert await cache.get("http://img", "physics") is None
+
+    asyncio.run(run())
@@ -0,0 +1,116 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.services.jobs import CardJobService, JobStatus, get_card_job_service
+from src.utils.errors import AppException, ErrorCode
+
+
+def test_job_service_runs_jobs_and_long_polls_result():
+    async def runner(payload):
+        await asyncio.sleep(0.01)
+        return {"title": payload["image_url"], "desc": "desc"}
+
+    async def run():
+        service = CardJobService(runner, workers=1, queue_size=4)
+        job = service.submit({"image_url": "http://img"})
+        assert job.status is JobStatus.QUEUED
+
+        finished = await service.wait(job.id, timeout=1)
+        await service.stop()
+        return finished
+
+    job = asyncio.run(run())
+
+    assert job.status is JobStatus.SUCCEEDED
+    assert job.result == {"title": "http://img", "desc": "desc"}
+
+
+def test_job_service_records_failures():
+    async def runner(payload):
+        raise AppException(error_code=ErrorCode.VALIDATION_ERROR, message="unclear")
+
+    async def run():
+        service = CardJobService(runner, workers=1, queue_size=4)
+        job = await service.wait(service.submit({}).id, timeout=1)
+        await service.stop()
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status is JobStatus.FAILED
+    assert job.error == {"success": False, "error": "validation_error", "message": "unclear"}
+
+
+def test_job_service_rejects_when_queue_is_full():
+    release = None
+
+    async def runner(payload):
+        await release.wait()
+        return {}
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        service = CardJobService(runner, workers=1, queue_size=1)
+        service.submit({})
+        await asyncio.sleep(0)
+        service.submit({})
+        try:
+            service.submit({})
+        except AppException as exc:
+            return exc
+        finally:
+            release.set()
+            await service.stop()
+
+    exc = asyncio.run(run())
+
+    assert exc.status_code == 503
+    assert exc.error_code is ErrorCode.SERVICE_UNAVAILABLE
+
+
+def test_job_service_purges_expired_jobs():
+    async def runner(payload):
+        return {}
+
+    async def run():
+        service = CardJobService(runner, workers=1, queue_size=4, ttl_seconds=0)
+        job = await service.wait(service.submit({}).id, timeout=1)
+        purged = service.purge_expired()
+        await service.stop()
+        return service, job, purged
+
+    service, job, purged = asyncio.run(run())
+
+    assert purged == 1
+    try:
+        service.get(job.id)
+    except AppException as exc:
+        assert exc.status_code == 404
+    else:
+        raise AssertionError("expired job should be gone")
+
+
+def test_job_endpoints_accept_and_return_result():
+    async def runner(payload):
+        return {"title": "叶子", "desc": "desc", "central_object": "leaf"}
+
+    service = CardJobService(runner, workers=1, queue_size=4)
+    app.dependency_overrides[get_card_job_service] = lambda: service
+    try:
+        with TestClient(app) as client:
+            submitted = client.post("/api/v1/cards/jobs", json={"image_url": "http://img.example.com/a.jpg"})
+            job_id = submitted.json()["job_id"]
+            polled = client.get(f"/api/v1/cards/jobs/{job_id}", params={"wait": 1})
+            missing = client.get("/api/v1/cards/jobs/unknown")
+    finally:
+        app.dependency_overrides.pop(get_card_job_service, None)
+
+    assert submitted.status_code == 202
+    assert submitted.headers["location"].endswith(f"/api/v1/cards/jobs/{job_id}")
+    assert polled.json()["status"] == "succeeded"
+    assert polled.json()["result"]["title"] == "叶子"
+    assert missing.status_code == 404
+    assert missing.json()["error"] == "not_found"
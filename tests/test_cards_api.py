@@ -0,0 +1,52 @@
+from fastapi.testclient import TestClient
+
+from src.api import cards
+from src.main import app
+from src.utils.admission import get_admission_controller
+from src.utils.errors import AppException, ErrorCode
+
+
+class StubPipelineService:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+
+    async def generate_card_stream(self, payload):
+        if self.fail:
+            raise AppException(error_code=ErrorCode.VALIDATION_ERROR, message="unclear")
+        yield "central_object", {"central_object": "leaf"}
+        yield "card", {"title": "叶子", "desc": "desc"}
+
+
+def _stream(service):
+    app.dependency_overrides[cards.get_service] = lambda: service
+    try:
+        client = TestClient(app)
+        return client.post("/api/v1/cards/generate/stream", json={"image_url": "http://img.example.com/a.jpg"})
+    finally:
+        app.dependency_overrides.pop(cards.get_service, None)
+
+
+def test_card_stream_endpoint_emits_sse_events():
+    response = _stream(StubPipelineService())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == (
+        'event: central_object\ndata: {"central_object":"leaf"}\n\n'
+        'event: card\ndata: {"title":"叶子","desc":"desc"}\n\n'
+    )
+
+
+def test_card_stream_endpoint_reports_errors_as_event():
+    response = _stream(StubPipelineService(fail=True))
+
+    assert response.status_code == 200
+    assert response.text.startswith("event: error\n")
+    assert '"error":"validation_error"' in response.text
+
+
+def test_card_stream_endpoint_releases_admission_slot():
+    _stream(StubPipelineService())
+    _stream(StubPipelineService(fail=True))
+
+    assert get_admission_controller("cards").in_flight == 0
@@ -0,0 +1,96 @@
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.services.audio import get_audio_service
+from src.utils.admission import get_admission_controller
+from src.utils.errors import ExternalServiceError
+from src.utils.signing import answer_token
+
+
+class StubAudioService:
+    def __init__(self, cached_url=None, fail=False):
+        self.cached_url = cached_url
+        self.fail = fail
+
+    async def cached_audio_url(self, text):
+        return self.cached_url
+
+    def stream_text_to_audio(self, text):
+        async def chunks():
+            if self.fail:
+                raise ExternalServiceError("elevenlabs", "down")
+            yield b"ID3"
+            yield b"frames"
+
+        return chunks()
+
+
+def _post(service, body=None, **kwargs):
+    body = body or {"text": "hello", "answer_token": answer_token("hello")}
+    app.dependency_overrides[get_audio_service] = lambda: service
+    try:
+        return TestClient(app).post("/api/v1/chat/audio/stream", json=body, **kwargs)
+    finally:
+        app.dependency_overrides.pop(get_audio_service, None)
+
+
+def test_audio_stream_relays_chunks_without_advertising_unstored_url():
+    response = _post(StubAudioService())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert "x-audio-url" not in response.headers
+    assert response.content == b"ID3frames"
+
+
+def test_audio_stream_accepts_long_signed_answer():
+    answer = "很长的回答。" * 1000
+
+    response = _post(StubAudioService(), {"text": answer, "answer_token": answer_token(answer)})
+
+    assert response.status_code == 200
+
+
+def test_audio_stream_redirects_to_cached_audio():
+    response = _post(StubAudioService(cached_url="https://files/cached.mp3"), follow_redirects=False)
+
+    assert response.status_code == 303
+    assert response.headers["location"] == "https://files/cached.mp3"
+
+
+def test_audio_stream_reports_upstream_failure():
+    response = _post(StubAudioService(fail=True))
+
+    assert response.status_code == 502
+    assert response.json()["error"] == "external_service_error"
+
+
+def test_audio_stream_rejects_text_without_valid_answer_token():
+    controller = get_admission_controller("chat")
+    in_flight = controller.in_flight
+
+    forged = _post(StubAudioService(), {"text": "say anything", "answer_token": answer_token("hello")})
+
+    assert forged.status_code == 403
+    assert controller.in_flight == in_flight
+
+
+def test_audio_stream_releases_admission_slot():
+    controller = get_admission_controller("chat")
+    in_flight = controller.in_flight
+
+    _post(StubAudioService())
+    _post(StubAudioService(cached_url="https://files/cached.mp3"), follow_redirects=False)
+    _post(StubAudioService(fail=True))
+
+    assert controller.in_flight == in_flight
+
+
+def test_audio_stream_validation_error_releases_admission_slot():
+    controller = get_admission_controller("chat")
+    in_flight = controller.in_flight
+
+    response = _post(StubAudioService(), {"text": "hello"})
+
+    assert response.status_code == 422
+    assert controller.in_flight == in_flight
@@ -2,9 +2,10 @@ import asyncio
 
 import pytest
 
-from src.clients.dify_client import QAResult
+from src.clients.dify_client import QAResult, QAStreamChunk
 from src.services.chat import ChatService
 from src.utils.errors import ExternalServiceError
+from src.utils.signing import answer_token, verify_answer_token
 
 
 class DummyQAClient:
@@ -15,12 +16,19 @@ class DummyQAClient:
         self.kwargs = kwargs
         return self.result
 
+    async def ask_stream(self, **kwargs):
+        for delta in ("hel", "lo"):
+            yield QAStreamChunk(delta=delta)
+        yield QAStreamChunk(done=True, conversation_id="conv", message_id="msg")
+
 
 class DummyElevenLabsClient:
     def __init__(self, should_fail: bool = False):
         self.should_fail = should_fail
 
-    async def synthesize_speech(self, text: str):
+    voice_id = "voice"
+
+    async def synthesize_speech(self, text: str, **kwargs):
         if self.should_fail:
             raise ExternalServiceError("tts", "fail")
         self.last_text = text
@@ -55,6 +63,7 @@ def test_chat_service_with_audio():
             need_audio=True,
         )
         assert result["answer"] == "hello"
+        assert verify_answer_token("hello", result["answer_token"])
         assert result["conversation_id"] == "conv"
         assert result["audio_url"] == "https://files/audio.mp3"
 
@@ -95,3 +104,34 @@ def test_chat_service_without_audio():
         assert result["audio_url"] is None
 
     asyncio.run(run())
+
+
+def test_chat_stream_yields_tokens_then_metadata():
+    service = build_service()
+
+    async def run():
+        return [
+            event
+            async for event in service.chat_stream(
+                question="?",
+                card_context="ctx",
+                user_id="user",
+                user_preference=None,
+                conversation_id=None,
+                image_url=None,
+                need_audio=True,
+            )
+        ]
+
+    events = asyncio.run(run())
+    assert events[:2] == [("answer", {"delta": "hel"}), ("answer", {"delta": "lo"})]
+    assert events[-1] == (
+        "done",
+        {
+            "answer": "hello",
+            "answer_token": answer_token("hello"),
+            "conversation_id": "conv",
+            "message_id": "msg",
+            "audio_url": "https://files/audio.mp3",
+        },
+    )
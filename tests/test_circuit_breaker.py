@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src.clients.dify_client import CardGenerationResult, PreprocessResult
+from src.clients.elevenlabs_client import ElevenLabsClient
+from src.clients.gemini_client import GeminiClient
+from src.pipeline import is_retryable
+from src.services.pipeline import PipelineService
+from src.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from src.utils.errors import ExternalServiceError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _fail(breaker: CircuitBreaker, exc: Exception) -> None:
+    with pytest.raises(type(exc)):
+        with breaker.guard():
+            raise exc
+
+
+def test_breaker_opens_after_consecutive_failures_and_recovers_through_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker("dify", failure_threshold=2, recovery_timeout=10, clock=clock)
+
+    _fail(breaker, ExternalServiceError("dify", "boom", status_code=502))
+    assert breaker.state is CircuitState.CLOSED
+    _fail(breaker, ExternalServiceError("dify", "timeout"))
+    assert breaker.state is CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.allow()
+    assert exc.value.retry_after == 10
+    assert breaker.rejected == 1
+
+    clock.now = 10
+    assert breaker.state is CircuitState.HALF_OPEN
+    with breaker.guard():
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()  # only one probe at a time
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_failed_probe_reopens_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker("gemini", failure_threshold=1, recovery_timeout=5, clock=clock)
+    _fail(breaker, ExternalServiceError("gemini", "boom"))
+
+    clock.now = 5
+    _fail(breaker, ExternalServiceError("gemini", "still down"))
+
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.retry_after() == 5
+
+
+def test_client_errors_and_cancellations_do_not_trip_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker("elevenlabs", failure_threshold=1, recovery_timeout=5, clock=clock)
+
+    _fail(breaker, ExternalServiceError("elevenlabs", "bad voice", status_code=400))
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.guard():
+            raise asyncio.CancelledError()
+    assert breaker.state is CircuitState.CLOSED
+
+    _fail(breaker, ExternalServiceError("elevenlabs", "slow down", status_code=429))
+    clock.now = 5
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.guard():
+            raise asyncio.CancelledError()
+    # The cancelled probe released its slot.
+    with breaker.guard():
+        pass
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_open_circuit_is_not_retried_by_pipeline():
+    assert not is_retryable(CircuitOpenError("dify", 3))
+    assert is_retryable(ExternalServiceError("dify", "boom"))
+
+
+def _open_breaker(name: str) -> CircuitBreaker:
+    breaker = CircuitBreaker(name, failure_threshold=1, recovery_timeout=60)
+    breaker.record_failure()
+    return breaker
+
+
+class HangingCompletions:
+    calls = 0
+
+    async def create(self, **kwargs):
+        HangingCompletions.calls += 1
+        await asyncio.sleep(30)
+
+
+class HangingOpenAI:
+    chat = type("Chat", (), {"completions": HangingCompletions()})()
+
+
+class StubDify:
+    def __init__(self, result):
+        self.result = result
+
+    async def analyze(self, **kwargs):
+        return self.result
+
+    async def generate_card(self, **kwargs):
+        return self.result
+
+
+class StubStorage:
+    async def upstream_image_url(self, image_url: str) -> str:
+        return image_url
+
+
+def test_open_breakers_return_text_only_card_without_waiting():
+    async def hanging_tts(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(30)
+        return httpx.Response(200, content=b"audio")
+
+    async def run():
+        gemini = GeminiClient(
+            api_key="key",
+            base_url="http://openrouter",
+            timeout=30,
+            openai_client=HangingOpenAI(),
+            breaker=_open_breaker("gemini"),
+        )
+        elevenlabs = ElevenLabsClient(
+            api_key="key",
+            voice_id="voice",
+            timeout=30,
+            transport=httpx.MockTransport(hanging_tts),
+            breaker=_open_breaker("elevenlabs"),
+        )
+        service = PipelineService(
+            preprocess_client=StubDify(PreprocessResult(image_status="clear", central_object="leaf")),
+            card_client=StubDify(CardGenerationResult(title="Leaf", desc="Green")),
+            gemini_client=gemini,
+            elevenlabs_client=elevenlabs,
+            storage_service=StubStorage(),
+            logger=type("Logger", (), {"info": lambda *a, **k: None, "warning": lambda *a, **k: None})(),
+        )
+        started = time.perf_counter()
+        result = await service.generate_card({"image_url": "http://img"})
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(run())
+
+    assert elapsed < 1
+    assert HangingCompletions.calls == 0
+    assert (result["title"], result["highlighted_image_url"], result["audio_url"]) == ("Leaf", None, None)
@@ -14,3 +14,8 @@ def test_log_level_normalization():
 def test_r2_endpoint_url_building():
     settings = AppSettings(r2_account_id="abcd1234")
     assert settings.r2_endpoint_url == "https://abcd1234.r2.cloudflarestorage.com"
+
+
+def test_r2_endpoint_override_takes_precedence():
+    settings = AppSettings(r2_account_id="abcd1234", r2_endpoint="http://127.0.0.1:9000/")
+    assert settings.r2_endpoint_url == "http://127.0.0.1:9000"
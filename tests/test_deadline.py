@@ -0,0 +1,239 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from src.api import cards
+from src.clients.dify_client import CardGenerationResult, PreprocessResult
+from src.main import app
+from src.pipeline import Node, Pipeline
+from src.services.pipeline import PipelineService
+from src.utils import deadline
+from src.utils.circuit_breaker import CircuitBreaker, CircuitState
+from src.utils.deadline import DeadlineExceeded, clip_timeout, has_budget, parse_timeout_header, with_deadline
+
+
+async def _within(seconds, coro):
+    token = deadline._deadline.set(asyncio.get_running_loop().time() + seconds)
+    try:
+        return await coro
+    finally:
+        deadline._deadline.reset(token)
+
+
+def test_helpers_are_noops_without_deadline():
+    async def run():
+        assert clip_timeout(5) == 5
+        assert clip_timeout(None) is None
+        assert has_budget(1000)
+        return await with_deadline(asyncio.sleep(0, result="ok"))
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_clip_timeout_and_with_deadline_respect_remaining_budget():
+    async def run():
+        assert clip_timeout(30) <= 1
+        assert clip_timeout(0.5) == 0.5
+        assert not has_budget(2)
+        with pytest.raises(DeadlineExceeded):
+            await with_deadline(asyncio.sleep(5))
+        with pytest.raises(DeadlineExceeded):
+            clip_timeout(30)
+
+    started = time.perf_counter()
+    asyncio.run(_within(1, run()))
+    assert time.perf_counter() - started < 2
+
+
+def test_parse_timeout_header_ignores_invalid_values():
+    assert parse_timeout_header("2.5") == 2.5
+    assert parse_timeout_header(None) is None
+    for value in ("abc", "0", "-1", "inf", "nan"):
+        assert parse_timeout_header(value) is None
+
+
+def test_pipeline_turns_stage_timeout_into_deadline_error_without_retrying():
+    calls = 0
+
+    async def slow(context):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(5)
+
+    pipeline = Pipeline([Node("slow", slow, timeout=30, retries=3)])
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(_within(0.2, pipeline.run({})))
+    assert calls == 1
+
+
+class StubDify:
+    def __init__(self, result):
+        self.result = result
+
+    async def analyze(self, **kwargs):
+        return self.result
+
+    async def generate_card(self, **kwargs):
+        await asyncio.sleep(0.05)
+        return self.result
+
+
+class StubStorage:
+    async def upstream_image_url(self, image_url: str) -> str:
+        return image_url
+
+    async def upload_highlight_image(self, data, extension="png"):
+        return "http://cdn/highlight.png"
+
+
+class StubGemini:
+    async def highlight_object(self, **kwargs):
+        await asyncio.sleep(0.3)
+        return b"not-an-image"
+
+
+class StubAudio:
+    async def text_to_audio_url(self, text):
+        await asyncio.sleep(0.3)
+        return "http://cdn/audio.mp3"
+
+
+class UnexpectedCall:
+    def __getattr__(self, name):
+        raise AssertionError(f"optional stage should have been skipped: {name}")
+
+
+def test_optional_stages_are_skipped_when_budget_is_low():
+    service = PipelineService(
+        preprocess_client=StubDify(PreprocessResult(image_status="clear", central_object="leaf")),
+        card_client=StubDify(CardGenerationResult(title="Leaf", desc="Green")),
+        gemini_client=UnexpectedCall(),
+        elevenlabs_client=UnexpectedCall(),
+        storage_service=StubStorage(),
+        audio_service=UnexpectedCall(),
+        logger=type("Logger", (), {"info": lambda *a, **k: None, "warning": lambda *a, **k: None})(),
+        optional_stage_min_budget=3,
+    )
+
+    result = asyncio.run(_within(2, service.generate_card({"image_url": "http://img"})))
+
+    assert (result["title"], result["highlighted_image_url"], result["audio_url"]) == ("Leaf", None, None)
+
+
+def test_short_deadline_of_one_caller_does_not_leak_into_shared_run():
+    service = PipelineService(
+        preprocess_client=StubDify(PreprocessResult(image_status="clear", central_object="leaf")),
+        card_client=StubDify(CardGenerationResult(title="Leaf", desc="Green")),
+        gemini_client=StubGemini(),
+        elevenlabs_client=UnexpectedCall(),
+        storage_service=StubStorage(),
+        audio_service=StubAudio(),
+        logger=type("Logger", (), {"info": lambda *a, **k: None, "warning": lambda *a, **k: None})(),
+        optional_stage_min_budget=3,
+    )
+    payload = {"image_url": "http://img"}
+
+    async def run():
+        leader = asyncio.create_task(_within(0.2, service.generate_card(payload)))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(service.generate_card(payload))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(run())
+
+    assert isinstance(leader, DeadlineExceeded)
+    assert follower["highlighted_image_url"] == "http://cdn/highlight.png"
+    assert follower["audio_url"] == "http://cdn/audio.mp3"
+
+
+class SlowGemini:
+    async def highlight_object(self, **kwargs):
+        await asyncio.sleep(2)
+        return b"not-an-image"
+
+
+def test_short_request_timeout_returns_text_only_card_instead_of_504():
+    service = PipelineService(
+        preprocess_client=StubDify(PreprocessResult(image_status="clear", central_object="leaf")),
+        card_client=StubDify(CardGenerationResult(title="Leaf", desc="Green")),
+        gemini_client=SlowGemini(),
+        elevenlabs_client=UnexpectedCall(),
+        storage_service=StubStorage(),
+        audio_service=StubAudio(),
+        logger=type("Logger", (), {"info": lambda *a, **k: None, "warning": lambda *a, **k: None})(),
+        optional_stage_min_budget=3,
+    )
+    app.dependency_overrides[cards.get_service] = lambda: service
+    try:
+        started = time.perf_counter()
+        response = TestClient(app).post(
+            "/api/v1/cards/generate",
+            json={"image_url": "http://img.example.com/a.jpg"},
+            headers={"X-Request-Timeout": "1"},
+        )
+    finally:
+        app.dependency_overrides.pop(cards.get_service, None)
+
+    assert time.perf_counter() - started < 1
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["title"], body["highlighted_image_url"], body["audio_url"]) == ("Leaf", None, None)
+
+
+class SlowPipelineService:
+    async def generate_card(self, payload):
+        # Mirrors the real service: waiting on work is bounded by the deadline.
+        return await with_deadline(asyncio.sleep(5))
+
+
+def _generate(headers):
+    app.dependency_overrides[cards.get_service] = lambda: SlowPipelineService()
+    try:
+        client = TestClient(app)
+        return client.post(
+            "/api/v1/cards/generate", json={"image_url": "http://img.example.com/a.jpg"}, headers=headers
+        )
+    finally:
+        app.dependency_overrides.pop(cards.get_service, None)
+
+
+def test_request_timeout_header_shortens_deadline_and_returns_504():
+    started = time.perf_counter()
+    response = _generate({"X-Request-Timeout": "0.2"})
+
+    assert time.perf_counter() - started < 2
+    assert response.status_code == 504
+    assert response.json()["error"] == "deadline_exceeded"
+
+
+def test_request_deadline_dependency_uses_shorter_budget_and_resets():
+    def request(headers):
+        raw = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+        return Request({"type": "http", "headers": raw})
+
+    async def budget_for(headers):
+        dependency = deadline.request_deadline("chat")(request(headers))
+        await dependency.__anext__()
+        budget = deadline.remaining()
+        with pytest.raises(StopAsyncIteration):
+            await dependency.__anext__()
+        assert deadline.remaining() is None
+        return budget
+
+    assert 4 < asyncio.run(budget_for({"X-Request-Timeout": "5"})) <= 5
+    # The header can shorten the route default (30s) but never extend it.
+    assert 29 < asyncio.run(budget_for({"X-Request-Timeout": "600"})) <= 30
+
+
+def test_deadline_exceeded_does_not_trip_breaker():
+    breaker = CircuitBreaker("dify", failure_threshold=1)
+
+    with pytest.raises(DeadlineExceeded):
+        with breaker.guard():
+            raise DeadlineExceeded()
+
+    assert breaker.state is CircuitState.CLOSED
@@ -140,6 +140,69 @@ def test_qa_client_returns_answer():
         assert result.message_id == "m1"
 
     asyncio.run(run())
+def test_qa_client_streams_answer_chunks():
+    stream_body = (
+        'data: {"event": "message", "answer": "Hel", "conversation_id": "c1", "message_id": "m1"}\n\n'
+        "event: ping\n\n"
+        'data: {"event": "message", "answer": "lo", "conversation_id": "c1", "message_id": "m1"}\n\n'
+        'data: {"event": "message_end", "conversation_id": "c1", "message_id": "m1"}\n\n'
+    )
+
+    async def run():
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            assert body["response_mode"] == "streaming"
+            return httpx.Response(200, content=stream_body.encode(), headers={"content-type": "text/event-stream"})
+
+        client = DifyQAClient(api_key="key", timeout=5, transport=httpx.MockTransport(handler))
+        return [chunk async for chunk in client.ask_stream(question="?", card_context="ctx", user_id="u")]
+
+    chunks = asyncio.run(run())
+    assert [chunk.delta for chunk in chunks if not chunk.done] == ["Hel", "lo"]
+    assert chunks[-1].done and chunks[-1].conversation_id == "c1" and chunks[-1].message_id == "m1"
+
+
+def test_qa_stream_raises_on_error_event():
+    async def run():
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, content=b'data: {"event": "error", "status": 500, "message": "boom"}\n\n')
+
+        client = DifyQAClient(api_key="key", timeout=5, transport=httpx.MockTransport(handler))
+        with pytest.raises(ExternalServiceError) as exc:
+            async for _ in client.ask_stream(question="?", card_context="ctx", user_id="u"):
+                pass
+        assert exc.value.status_code == 500
+
+    asyncio.run(run())
+
+
+def test_qa_stream_raises_on_http_error():
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(401, text="unauthorized"))
+        client = DifyQAClient(api_key="key", timeout=5, transport=transport)
+        with pytest.raises(ExternalServiceError) as exc:
+            async for _ in client.ask_stream(question="?", card_context="ctx", user_id="u"):
+                pass
+        assert exc.value.status_code == 401
+
+    asyncio.run(run())
+
+
+def test_transport_errors_surface_as_external_service_errors():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    async def run():
+        client = DifyQAClient(api_key="key", timeout=5, transport=httpx.MockTransport(handler))
+        with pytest.raises(ExternalServiceError):
+            await client.ask(question="?", card_context="ctx", user_id="u")
+        with pytest.raises(ExternalServiceError):
+            async for _ in client.ask_stream(question="?", card_context="ctx", user_id="u"):
+                pass
+
+    asyncio.run(run())
+
+
 CODE_BLOCK_ANSWER = """```json
 {
   "image_status": "clear",
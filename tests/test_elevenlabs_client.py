@@ -42,3 +42,74 @@ def test_elevenlabs_client_handles_http_error():
             await client.synthesize_speech(text="hello world")
 
     asyncio.run(run())
+
+
+def test_elevenlabs_client_streams_audio_chunks():
+    async def run():
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert request.url.path == "/v1/text-to-speech/aria/stream"
+            assert request.url.params["output_format"] == "mp3_22050_32"
+            return httpx.Response(200, content=b"chunk-1chunk-2")
+
+        client = ElevenLabsClient(
+            api_key="key",
+            voice_id="aria",
+            timeout=5,
+            transport=httpx.MockTransport(handler),
+        )
+        return b"".join([chunk async for chunk in client.stream_speech(text="hello")])
+
+    assert asyncio.run(run()) == b"chunk-1chunk-2"
+
+
+def test_elevenlabs_stream_handles_http_error():
+    async def run():
+        client = ElevenLabsClient(
+            api_key="key",
+            voice_id="aria",
+            timeout=5,
+            transport=httpx.MockTransport(lambda request: httpx.Response(429, text="busy")),
+        )
+        with pytest.raises(ExternalServiceError) as exc:
+            async for _ in client.stream_speech(text="hello"):
+                pass
+        assert exc.value.status_code == 429
+
+    asyncio.run(run())
+
+
+def test_elevenlabs_transport_errors_surface_as_external_service_errors():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadError("connection reset", request=request)
+
+    async def run():
+        client = ElevenLabsClient(api_key="key", voice_id="aria", timeout=5, transport=httpx.MockTransport(handler))
+        with pytest.raises(ExternalServiceError):
+            await client.synthesize_speech(text="hello")
+        with pytest.raises(ExternalServiceError):
+            async for _ in client.stream_speech(text="hello"):
+                pass
+
+    asyncio.run(run())
+
+
+def test_elevenlabs_client_coalesces_identical_concurrent_requests():
+    requests = []
+
+    async def run():
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, content=b"audio-bytes")
+
+        client = ElevenLabsClient(api_key="key", voice_id="aria", timeout=5, transport=httpx.MockTransport(handler))
+        return await asyncio.gather(
+            client.synthesize_speech(text="hello"),
+            client.synthesize_speech(text="hello"),
+            client.synthesize_speech(text="other"),
+        )
+
+    results = asyncio.run(run())
+
+    assert results == [b"audio-bytes"] * 3
+    assert len(requests) == 2
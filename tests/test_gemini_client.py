@@ -1,10 +1,11 @@
 import asyncio
 import base64
-from unittest.mock import patch
 
+import httpx
 import pytest
 
 from src.clients.gemini_client import GeminiClient
+from src.utils.deadline import deadline_scope
 from src.utils.errors import ExternalServiceError
 
 
@@ -28,7 +29,7 @@ class DummyCompletions:
         self._response = response
         self.last_kwargs = None
 
-    def create(self, **kwargs):
+    async def create(self, **kwargs):
         self.last_kwargs = kwargs
         return self._response
 
@@ -76,23 +77,20 @@ def test_gemini_client_downloads_remote_image_when_not_data_url():
         )
         dummy_client = DummyOpenAI(response)
 
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert str(request.url) == "https://file.example.com/img.png"
+            return httpx.Response(200, content=b"bytes")
+
         client = GeminiClient(
             api_key="key",
             base_url="https://openrouter.ai/api/v1",
             timeout=5,
             openai_client=dummy_client,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
         )
 
-        with patch("httpx.get") as mock_get:
-            class Resp:
-                content = b"bytes"
-
-                def raise_for_status(self):
-                    return None
-
-            mock_get.return_value = Resp()
-            data = await client.highlight_object("http://image", "prompt")
-            assert data == b"bytes"
+        data = await client.highlight_object("http://image", "prompt")
+        assert data == b"bytes"
 
     asyncio.run(run())
 
@@ -111,3 +109,97 @@ def test_gemini_client_errors_when_no_image():
             await client.highlight_object("http://image", "prompt")
 
     asyncio.run(run())
+
+
+def test_gemini_client_caps_concurrent_highlights():
+    active = 0
+    peak = 0
+
+    class SlowCompletions:
+        async def create(self, **kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            encoded = base64.b64encode(b"png").decode("utf-8")
+            return DummyCompletion(
+                DummyMessage(images=[{"image_url": {"url": f"data:image/png;base64,{encoded}"}}])
+            )
+
+    class SlowOpenAI:
+        chat = type("Chat", (), {"completions": SlowCompletions()})()
+
+    async def run():
+        client = GeminiClient(
+            api_key="key",
+            base_url="https://openrouter.ai/api/v1",
+            timeout=5,
+            openai_client=SlowOpenAI(),
+            max_concurrency=2,
+        )
+        results = await asyncio.gather(*(client.highlight_object("http://image", "prompt") for _ in range(6)))
+        assert results == [b"png"] * 6
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_gemini_highlight_is_cancellable():
+    started = asyncio.Event()
+
+    class HangingCompletions:
+        async def create(self, **kwargs):
+            started.set()
+            await asyncio.sleep(60)
+
+    class HangingOpenAI:
+        chat = type("Chat", (), {"completions": HangingCompletions()})()
+
+    async def run():
+        client = GeminiClient(
+            api_key="key",
+            base_url="https://openrouter.ai/api/v1",
+            timeout=5,
+            openai_client=HangingOpenAI(),
+        )
+        task = asyncio.create_task(client.highlight_object("http://image", "prompt"))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(asyncio.wait_for(run(), timeout=2))
+
+
+def test_decode_data_url_rejects_malformed_payloads():
+    assert GeminiClient._decode_data_url("data:image/png;base64,aGVsbG8=") == b"hello"
+    with pytest.raises(ExternalServiceError):
+        GeminiClient._decode_data_url("data:image/png;base64")
+    with pytest.raises(ExternalServiceError):
+        GeminiClient._decode_data_url("data:image/png;base64,a")
+
+
+def test_gemini_client_clips_completion_timeout_to_request_deadline():
+    encoded = base64.b64encode(b"png-data").decode("utf-8")
+    response = DummyCompletion(
+        DummyMessage(images=[{"type": "image_url", "image_url": {"url": f"data:image/png;base64,{encoded}"}}])
+    )
+    dummy_client = DummyOpenAI(response)
+    client = GeminiClient(
+        api_key="key", base_url="https://openrouter.ai/api/v1", timeout=30, openai_client=dummy_client
+    )
+
+    async def run():
+        await client.highlight_object("http://image", "prompt")
+        unbounded = dummy_client.chat.completions.last_kwargs["timeout"]
+        with deadline_scope(2):
+            await client.highlight_object("http://image", "prompt")
+        return unbounded, dummy_client.chat.completions.last_kwargs["timeout"]
+
+    unbounded, clipped = asyncio.run(run())
+
+    assert unbounded == 30
+    assert 0 < clipped <= 2
+    with pytest.raises(ExternalServiceError):
+        GeminiClient._decode_data_url("data:image/png;base64,aGVsbG8é")
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.clients.dify_client import DifyCardGenerationClient
+from src.utils.hedging import HEDGE_WINS, HEDGES_SENT, HedgePolicy
+
+
+def _warmed_policy(operation: str, *, latency: float = 0.01, samples: int = 5, **options) -> HedgePolicy:
+    policy = HedgePolicy("test", operation, min_samples=5, min_delay=0.0, **options)
+    for _ in range(samples):
+        policy.record(latency)
+    return policy
+
+
+def test_hedge_delay_waits_for_samples_and_tracks_quantile():
+    policy = HedgePolicy("test", "quantile", min_samples=3, min_delay=0.02, quantile=0.5)
+    policy.record(0.001)
+    assert policy.delay() is None
+
+    policy.record(0.3)
+    policy.record(0.1)
+    assert policy.delay() == 0.1
+
+
+def test_hedge_wins_when_original_call_is_slow_and_loser_is_cancelled():
+    policy = _warmed_policy("slow", budget_percent=100)
+    cancelled = []
+    delays = iter([1.0, 0.0])
+
+    async def call():
+        delay = next(delays)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    async def run():
+        result = await policy.run(call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == 0.0
+    assert cancelled == [1.0]
+    assert HEDGES_SENT.value(upstream="test", operation="slow") == 1
+    assert HEDGE_WINS.value(upstream="test", operation="slow") == 1
+
+
+def test_fast_calls_are_not_hedged():
+    policy = _warmed_policy("fast", latency=1.0, budget_percent=100)
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        return "ok"
+
+    assert asyncio.run(policy.run(call)) == "ok"
+    assert calls == 1
+    assert HEDGES_SENT.value(upstream="test", operation="fast") == 0
+
+
+def test_budget_caps_hedges_to_a_share_of_traffic():
+    policy = _warmed_policy("budget", samples=50, quantile=0.5, budget_percent=25)
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.03)
+        return "ok"
+
+    async def run():
+        for _ in range(8):
+            await policy.run(call)
+
+    asyncio.run(run())
+
+    assert HEDGES_SENT.value(upstream="test", operation="budget") == 2
+    assert calls == 10
+
+
+def test_hedge_result_is_used_when_original_call_fails_late():
+    policy = _warmed_policy("failover", budget_percent=100)
+    outcomes = iter(["fail", "ok"])
+
+    async def call():
+        outcome = next(outcomes)
+        await asyncio.sleep(0.05 if outcome == "fail" else 0.08)
+        if outcome == "fail":
+            raise RuntimeError("boom")
+        return outcome
+
+    assert asyncio.run(policy.run(call)) == "ok"
+
+
+def test_original_error_is_raised_when_both_calls_fail():
+    policy = _warmed_policy("both-fail", budget_percent=100)
+    attempts = iter(["first", "second"])
+
+    async def call():
+        name = next(attempts)
+        await asyncio.sleep(0.03)
+        raise RuntimeError(name)
+
+    with pytest.raises(RuntimeError, match="first"):
+        asyncio.run(policy.run(call))
+
+
+def test_card_client_hedges_slow_dify_call():
+    async def run():
+        requests = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal requests
+            requests += 1
+            if requests == 1:
+                await asyncio.sleep(1.0)
+            answer = json.dumps({"title": f"call {requests}", "desc": "d"})
+            return httpx.Response(status_code=200, json={"answer": answer})
+
+        client = DifyCardGenerationClient(
+            api_key="key",
+            timeout=5,
+            transport=httpx.MockTransport(handler),
+            hedge=_warmed_policy("card-client", budget_percent=100),
+        )
+        result = await client.generate_card(
+            image_url="http://image", central_object="leaf", user_preference=None, user_id="u1"
+        )
+        return result, requests
+
+    result, requests = asyncio.run(run())
+
+    assert requests == 2
+    assert result.title == "call 2"
@@ -0,0 +1,66 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from src.clients import http_pool
+from src.clients.dify_client import DifyQAClient, get_dify_qa_client
+from src.config import AppSettings, get_settings
+from src.main import app
+
+
+def test_build_http_client_applies_pool_settings():
+    settings = AppSettings(http_max_connections=7, http_max_keepalive_connections=3, http_keepalive_expiry=12)
+    client = http_pool.build_http_client(settings=settings)
+    pool = client._transport._pool
+
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    assert pool._keepalive_expiry == 12
+    asyncio.run(client.aclose())
+
+
+def test_get_http_client_is_shared_until_closed():
+    async def run():
+        first = http_pool.get_http_client("dify")
+        assert http_pool.get_http_client("dify") is first
+
+        await http_pool.close_http_clients()
+        assert first.is_closed
+        assert http_pool.get_http_client("dify") is not first
+        await http_pool.close_http_clients()
+
+    asyncio.run(run())
+
+
+def test_dify_client_reuses_injected_pool():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(str(request.url))
+        return httpx.Response(200, json={"answer": "hi"})
+
+    async def run():
+        shared = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        first = DifyQAClient(api_key="key", timeout=5, http_client=shared)
+        second = DifyQAClient(api_key="key", timeout=5, http_client=shared)
+
+        await first.ask(question="?", card_context="ctx", user_id="u")
+        await second.ask(question="?", card_context="ctx", user_id="u")
+        assert not shared.is_closed
+        await shared.aclose()
+
+    asyncio.run(run())
+    assert seen == ["https://api.dify.ai/v1/chat-messages"] * 2
+
+
+def test_pooled_clients_are_rebuilt_on_fresh_pools_after_restart(monkeypatch):
+    monkeypatch.setattr(get_settings(), "dify_api_key_qa", "key")
+    with TestClient(app):
+        first = get_dify_qa_client()
+    assert first._client._http_client.is_closed
+
+    with TestClient(app):
+        second = get_dify_qa_client()
+        assert second is not first
+        assert not second._client._http_client.is_closed
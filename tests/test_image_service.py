@@ -1,12 +1,19 @@
 import asyncio
+import hashlib
+import threading
+import time
 from io import BytesIO
 
 import pytest
 from fastapi import UploadFile
+from fastapi.testclient import TestClient
 from starlette.datastructures import Headers
 
 from src.clients.r2_client import R2ClientError
+from src.main import app
+from src.services import storage
 from src.services.storage import ImageUploadService
+from src.utils.circuit_breaker import CircuitBreaker
 from src.utils.errors import AppException, ErrorCode
 
 
@@ -25,6 +32,37 @@ class DummyR2Client:
         self.data = data
         return f"https://files.example.com/{key}"
 
+    def build_public_url(self, key: str) -> str:
+        return f"https://files.example.com/{key}"
+
+    def object_exists(self, *, key: str) -> bool:
+        self.exists_checks = getattr(self, "exists_checks", 0) + 1
+        return key in getattr(self, "existing_keys", set())
+
+    def create_multipart_upload(self, *, key: str, content_type: str) -> str:
+        self.last_key = key
+        self.last_content_type = content_type
+        self.parts = []
+        self.aborted = False
+        return "upload-1"
+
+    def upload_part(self, *, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        self.parts.append(data)
+        return f"etag-{part_number}"
+
+    def complete_multipart_upload(self, *, key: str, upload_id: str, parts) -> str:
+        self.completed_parts = parts
+        return f"https://files.example.com/{key}"
+
+    def abort_multipart_upload(self, *, key: str, upload_id: str) -> None:
+        self.aborted = True
+
+
+class SlowR2Client(DummyR2Client):
+    def upload_file(self, *, key: str, data: bytes, content_type: str) -> str:
+        time.sleep(0.2)
+        return super().upload_file(key=key, data=data, content_type=content_type)
+
 
 def make_upload_file(filename: str, content: bytes, content_type: str) -> UploadFile:
     file = BytesIO(content)
@@ -67,3 +105,305 @@ def test_upload_handles_r2_failure():
         asyncio.run(service.upload_original_image(upload))
 
     assert exc.value.error_code == ErrorCode.STORAGE_ERROR
+
+
+def test_upload_fails_fast_with_503_once_r2_circuit_opens():
+    client = DummyR2Client(should_fail=True)
+    breaker = CircuitBreaker("r2", failure_threshold=2, recovery_timeout=30)
+    service = ImageUploadService(client, breaker=breaker)  # type: ignore[arg-type]
+
+    for _ in range(2):
+        with pytest.raises(AppException) as exc:
+            asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", b"data", "image/jpeg")))
+        assert exc.value.error_code == ErrorCode.STORAGE_ERROR
+
+    client.should_fail = False
+    with pytest.raises(AppException) as exc:
+        asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", b"data", "image/jpeg")))
+
+    assert exc.value.status_code == 503
+    assert exc.value.error_code == ErrorCode.SERVICE_UNAVAILABLE
+    assert exc.value.headers == {"Retry-After": "30"}
+    assert client.data is None
+
+
+def test_upload_does_not_block_event_loop():
+    service = ImageUploadService(SlowR2Client())  # type: ignore[arg-type]
+
+    async def run():
+        max_gap = 0.0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal max_gap
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                max_gap = max(max_gap, now - last)
+                last = now
+
+        ticker_task = asyncio.create_task(ticker())
+        await asyncio.gather(service.upload_highlight_image(b"img"), service.upload_audio(b"audio"))
+        done.set()
+        await ticker_task
+        return max_gap
+
+    assert asyncio.run(run()) < 0.05
+
+
+def test_large_upload_streams_in_multipart_chunks():
+    client = DummyR2Client()
+    service = ImageUploadService(client, chunk_size=4, max_upload_bytes=100)  # type: ignore[arg-type]
+
+    upload = make_upload_file("sample.png", b"0123456789", "image/png")
+    url = asyncio.run(service.upload_original_image(upload))
+
+    assert url.endswith(".png")
+    assert client.parts == [b"0123", b"4567", b"89"]
+    assert [part["PartNumber"] for part in client.completed_parts] == [1, 2, 3]
+    assert client.data is None
+
+
+def test_upload_over_limit_is_rejected_and_aborted():
+    client = DummyR2Client()
+    service = ImageUploadService(client, chunk_size=4, max_upload_bytes=6)  # type: ignore[arg-type]
+
+    upload = make_upload_file("sample.jpg", b"0123456789", "image/jpeg")
+    upload.size = None
+
+    with pytest.raises(AppException) as exc:
+        asyncio.run(service.upload_original_image(upload))
+
+    assert exc.value.status_code == 413
+    assert client.parts == [b"0123"]
+    assert client.aborted is True
+
+
+def test_multipart_is_aborted_even_after_part_failure_opens_breaker():
+    class FailingPartClient(DummyR2Client):
+        def upload_part(self, *, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+            raise R2ClientError("boom")
+
+    client = FailingPartClient()
+    breaker = CircuitBreaker("r2", failure_threshold=1, recovery_timeout=30)
+    service = ImageUploadService(client, breaker=breaker, chunk_size=4)  # type: ignore[arg-type]
+
+    with pytest.raises(AppException) as exc:
+        asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", b"0123456789", "image/jpeg")))
+
+    assert exc.value.error_code == ErrorCode.STORAGE_ERROR
+    assert client.aborted is True
+
+
+def test_upload_with_known_oversize_is_rejected_before_reading():
+    client = DummyR2Client()
+    service = ImageUploadService(client, max_upload_bytes=3)  # type: ignore[arg-type]
+
+    upload = make_upload_file("sample.jpg", b"0123456789", "image/jpeg")
+    upload.size = 10
+
+    with pytest.raises(AppException) as exc:
+        asyncio.run(service.upload_original_image(upload))
+
+    assert exc.value.status_code == 413
+    assert client.last_key is None
+
+
+def test_content_addressed_upload_uses_sharded_hash_key():
+    client = DummyR2Client()
+    service = ImageUploadService(client, content_addressed=True)  # type: ignore[arg-type]
+    digest = hashlib.sha256(b"data").hexdigest()
+
+    url = asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", b"data", "image/jpeg")))
+
+    assert client.last_key == f"original_image/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+    assert url == f"https://files.example.com/{client.last_key}"
+    assert client.data == b"data"
+
+
+def test_content_addressed_duplicate_skips_put_object():
+    client = DummyR2Client()
+    service = ImageUploadService(client, content_addressed=True)  # type: ignore[arg-type]
+
+    first = asyncio.run(service.upload_audio(b"audio"))
+    client.data = None
+    second = asyncio.run(service.upload_audio(b"audio"))
+
+    assert first == second
+    assert client.data is None
+    assert client.exists_checks == 1
+
+
+def test_content_addressed_reuses_object_already_in_bucket():
+    client = DummyR2Client()
+    digest = hashlib.sha256(b"data").hexdigest()
+    client.existing_keys = {f"original_image/{digest[:2]}/{digest[2:4]}/{digest}.jpg"}
+    service = ImageUploadService(client, content_addressed=True)  # type: ignore[arg-type]
+
+    url = asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", b"data", "image/jpeg")))
+
+    assert url.endswith(f"{digest}.jpg")
+    assert client.data is None
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    image_module = pytest.importorskip("PIL.Image")
+    output = BytesIO()
+    image_module.new("RGB", (width, height), (200, 40, 40)).save(output, format="JPEG", quality=95)
+    return output.getvalue()
+
+
+class RecordingR2Client(DummyR2Client):
+    def __init__(self):
+        super().__init__()
+        self.uploads = {}
+
+    def upload_file(self, *, key: str, data: bytes, content_type: str) -> str:
+        self.uploads[key] = (data, content_type)
+        return super().upload_file(key=key, data=data, content_type=content_type)
+
+    def object_exists(self, *, key: str) -> bool:
+        return key in self.uploads or super().object_exists(key=key)
+
+
+def test_upload_stores_downscaled_webp_derivative_next_to_original():
+    image_module = pytest.importorskip("PIL.Image")
+    client = RecordingR2Client()
+    service = ImageUploadService(client, derivative_max_edge=64)  # type: ignore[arg-type]
+    original = make_jpeg(400, 200)
+
+    url = asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", original, "image/jpeg")))
+
+    derivative_key = next(key for key in client.uploads if key.endswith(".upstream.webp"))
+    data, content_type = client.uploads[derivative_key]
+    assert derivative_key == url.removeprefix("https://files.example.com/").replace(".jpg", ".upstream.webp")
+    assert content_type == "image/webp"
+    assert image_module.open(BytesIO(data)).size == (64, 32)
+    assert list(client.uploads)[0] == url.removeprefix("https://files.example.com/")
+    assert asyncio.run(service.upstream_image_url(url)) == f"https://files.example.com/{derivative_key}"
+    assert asyncio.run(service.upstream_image_url("https://elsewhere/a.jpg")) == "https://elsewhere/a.jpg"
+
+
+def test_derivative_is_found_by_key_from_another_service_instance():
+    pytest.importorskip("PIL.Image")
+    client = RecordingR2Client()
+    url = asyncio.run(
+        ImageUploadService(client, derivative_max_edge=64).upload_original_image(  # type: ignore[arg-type]
+            make_upload_file("sample.jpg", make_jpeg(400, 200), "image/jpeg")
+        )
+    )
+
+    # A restarted process or another worker has an empty content index.
+    other = ImageUploadService(client, derivative_max_edge=64)  # type: ignore[arg-type]
+
+    assert asyncio.run(other.upstream_image_url(url)) == url.replace(".jpg", ".upstream.webp")
+
+
+def test_derivative_is_decoded_from_spooled_file_without_reading_upload(monkeypatch):
+    pytest.importorskip("PIL.Image")
+    client = RecordingR2Client()
+    service = ImageUploadService(client, derivative_max_edge=64, chunk_size=1024)  # type: ignore[arg-type]
+    upload = make_upload_file("sample.jpg", make_jpeg(400, 200), "image/jpeg")
+    reads = []
+    original_read = upload.read
+
+    async def read(size=-1):
+        reads.append(size)
+        return await original_read(size)
+
+    monkeypatch.setattr(upload, "read", read)
+    asyncio.run(service.upload_original_image(upload))
+
+    assert reads and all(0 < size <= 1024 for size in reads)
+    assert any(key.endswith(".upstream.webp") for key in client.uploads)
+
+
+def test_content_addressed_hit_skips_derivative_encoding(monkeypatch):
+    pytest.importorskip("PIL.Image")
+    original = make_jpeg(400, 200)
+    digest = hashlib.sha256(original).hexdigest()
+    client = RecordingR2Client()
+    client.existing_keys = {f"original_image/{digest[:2]}/{digest[2:4]}/{digest}.jpg"}
+    service = ImageUploadService(client, content_addressed=True, derivative_max_edge=64)  # type: ignore[arg-type]
+    monkeypatch.setattr(storage, "to_webp", lambda *args, **kwargs: pytest.fail("derivative re-encoded"))
+
+    url = asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", original, "image/jpeg")))
+
+    assert url.endswith(f"{digest}.jpg")
+    assert client.uploads == {}
+
+
+def test_upload_keeps_original_when_derivative_cannot_be_decoded():
+    pytest.importorskip("PIL.Image")
+    client = RecordingR2Client()
+    service = ImageUploadService(client, derivative_max_edge=64)  # type: ignore[arg-type]
+
+    url = asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", b"not an image", "image/jpeg")))
+
+    assert list(client.uploads) == [url.removeprefix("https://files.example.com/")]
+    assert asyncio.run(service.upstream_image_url(url)) == url
+
+
+def test_derivative_is_encoded_on_its_own_executor_and_skipped_when_busy(monkeypatch):
+    pytest.importorskip("PIL.Image")
+    client = RecordingR2Client()
+    service = ImageUploadService(client, derivative_max_edge=64, derivative_workers=1)  # type: ignore[arg-type]
+    threads = []
+
+    def slow_to_webp(file, **kwargs):
+        threads.append(threading.current_thread().name)
+        time.sleep(0.1)
+        return b"webp"
+
+    monkeypatch.setattr(storage, "to_webp", slow_to_webp)
+
+    async def run():
+        return await asyncio.gather(
+            *(
+                service.upload_original_image(make_upload_file(f"{name}.jpg", make_jpeg(400, 200), "image/jpeg"))
+                for name in ("a", "b")
+            )
+        )
+
+    asyncio.run(run())
+
+    assert len(threads) == 1 and threads[0].startswith("image-derivative")
+    assert len([key for key in client.uploads if key.endswith(".upstream.webp")]) == 1
+
+
+def test_missing_derivative_lookup_is_cached():
+    pytest.importorskip("PIL.Image")
+    client = DummyR2Client()
+    service = ImageUploadService(client, derivative_max_edge=64)  # type: ignore[arg-type]
+    url = "https://files.example.com/original_image/1_abc.jpg"
+
+    async def run():
+        return [await service.upstream_image_url(url) for _ in range(3)]
+
+    assert asyncio.run(run()) == [url] * 3
+    assert client.exists_checks == 1
+
+
+def test_small_jpeg_is_not_reencoded(monkeypatch):
+    pytest.importorskip("PIL.Image")
+    client = RecordingR2Client()
+    service = ImageUploadService(client, derivative_max_edge=1280)  # type: ignore[arg-type]
+    monkeypatch.setattr(storage, "to_webp", lambda *args, **kwargs: pytest.fail("small JPEG re-encoded"))
+
+    url = asyncio.run(service.upload_original_image(make_upload_file("sample.jpg", make_jpeg(400, 200), "image/jpeg")))
+
+    assert list(client.uploads) == [url.removeprefix("https://files.example.com/")]
+
+
+def test_upload_service_is_rebuilt_after_app_shutdown(monkeypatch):
+    monkeypatch.setattr(storage, "get_r2_client", DummyR2Client)
+    with TestClient(app):
+        first = storage.get_image_upload_service()
+
+    with TestClient(app):
+        second = storage.get_image_upload_service()
+        url = asyncio.run(second.upload_audio(b"audio"))
+
+    assert second is not first
+    assert url.endswith(".mp3")
@@ -0,0 +1,81 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src.clients.dify_client import DifyClient
+from src.main import app
+from src.pipeline import Node, Pipeline
+from src.utils.errors import ExternalServiceError
+from src.utils.metrics import (
+    PIPELINE_STAGE_SECONDS,
+    UPSTREAM_ERRORS,
+    UPSTREAM_REQUEST_SECONDS,
+    MetricsRegistry,
+    track_upstream,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="a")
+    histogram.observe(0.5, route="a")
+    histogram.observe(3, route="a")
+    registry.counter("calls_total", "Calls.").inc(2, status='5"00')
+
+    text = registry.render()
+
+    assert 'latency_seconds_bucket{route="a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="a"} 3' in text
+    assert 'latency_seconds_sum{route="a"} 3.55' in text
+    assert 'calls_total{status="5\\"00"} 2' in text
+    assert "# TYPE latency_seconds histogram" in text
+
+
+def test_track_upstream_counts_errors_by_status():
+    labels = {"upstream": "test", "operation": "op"}
+    with track_upstream(**labels):
+        pass
+    with pytest.raises(ExternalServiceError):
+        with track_upstream(**labels):
+            raise ExternalServiceError("test", "boom", status_code=503)
+
+    assert UPSTREAM_REQUEST_SECONDS.count(**labels, status="ok") == 1
+    assert UPSTREAM_REQUEST_SECONDS.count(**labels, status="503") == 1
+    assert UPSTREAM_ERRORS.value(**labels, status="503") == 1
+
+
+def test_dify_and_pipeline_stages_are_instrumented():
+    async def run():
+        client = DifyClient(
+            api_key="key",
+            timeout=5,
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"answer": "{}"})),
+            operation="metrics_test",
+        )
+
+        async def call(context):
+            return await client.send_message({"query": "hi"})
+
+        await Pipeline([Node(name="call", func=call)], name="metrics_test").run({})
+
+    asyncio.run(run())
+
+    assert UPSTREAM_REQUEST_SECONDS.count(upstream="dify", operation="metrics_test", status="ok") == 1
+    assert PIPELINE_STAGE_SECONDS.count(pipeline="metrics_test", stage="call", outcome="ok") == 1
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    client = TestClient(app)
+    client.get("/health")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'snapopedia_http_request_seconds_count{method="GET",route="/health",status="200"}' in response.text
+    assert 'snapopedia_admission_in_flight{route="cards"} 0' in response.text
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from src.pipeline import Node, Pipeline
+from src.utils.errors import ExternalServiceError
+
+
+def test_nodes_start_as_soon_as_dependencies_finish():
+    events = []
+
+    async def stage(name, delay, value=None):
+        events.append(f"start:{name}")
+        await asyncio.sleep(delay)
+        events.append(f"end:{name}")
+        return value or name
+
+    pipeline = Pipeline(
+        [
+            Node("a", lambda ctx: stage("a", 0)),
+            Node("slow", lambda ctx: stage("slow", 0.05), deps=("a",)),
+            Node("fast", lambda ctx: stage("fast", 0.01), deps=("a",)),
+            Node("after_fast", lambda ctx: stage("after_fast", 0, ctx["fast"] + "!"), deps=("fast",)),
+        ]
+    )
+
+    results = asyncio.run(pipeline.run({}))
+
+    assert results["after_fast"] == "fast!"
+    assert events.index("start:after_fast") < events.index("end:slow")
+
+
+def test_optional_failure_resolves_to_none_and_skips_dependents():
+    called = []
+
+    async def fail(ctx):
+        raise ExternalServiceError("gemini", "down")
+
+    async def child(ctx):
+        called.append("child")
+
+    pipeline = Pipeline(
+        [
+            Node("optional", fail, optional=True),
+            Node("child", child, deps=("optional",)),
+            Node("other", lambda ctx: asyncio.sleep(0, result="ok")),
+        ]
+    )
+
+    results = asyncio.run(pipeline.run({}))
+
+    assert results == {"optional": None, "child": None, "other": "ok"}
+    assert called == []
+
+
+def test_required_failure_cancels_running_nodes():
+    cancelled = asyncio.Event()
+
+    async def hang(ctx):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def fail(ctx):
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    pipeline = Pipeline([Node("hang", hang), Node("fail", fail)])
+
+    async def run():
+        with pytest.raises(ValueError):
+            await pipeline.run({})
+        assert cancelled.is_set()
+
+    asyncio.run(run())
+
+
+def test_retries_retryable_errors_and_times_out():
+    attempts = 0
+
+    async def flaky(ctx):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ExternalServiceError("dify", "boom", status_code=502)
+        return "ok"
+
+    async def slow(ctx):
+        await asyncio.sleep(1)
+
+    pipeline = Pipeline([Node("flaky", flaky, retries=2), Node("slow", slow, timeout=0.01, optional=True)])
+
+    results = asyncio.run(pipeline.run({}))
+    assert results == {"flaky": "ok", "slow": None}
+    assert attempts == 2
+
+
+def test_client_errors_are_not_retried():
+    attempts = 0
+
+    async def bad_request(ctx):
+        nonlocal attempts
+        attempts += 1
+        raise ExternalServiceError("dify", "bad", status_code=400)
+
+    with pytest.raises(ExternalServiceError):
+        asyncio.run(Pipeline([Node("bad", bad_request, retries=3)]).run({}))
+    assert attempts == 1
+
+
+def test_node_concurrency_limit_applies_across_runs():
+    active = 0
+    peak = 0
+
+    async def work(ctx):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    async def run():
+        pipeline = Pipeline([Node("work", work, max_concurrency=2)])
+        await asyncio.gather(*(pipeline.run({}) for _ in range(5)))
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_rejects_cycles_and_unknown_dependencies():
+    noop = lambda ctx: asyncio.sleep(0)  # noqa: E731
+    with pytest.raises(ValueError):
+        Pipeline([Node("a", noop, deps=("b",)), Node("b", noop, deps=("a",))])
+    with pytest.raises(ValueError):
+        Pipeline([Node("a", noop, deps=("missing",))])
@@ -1,17 +1,23 @@
 import asyncio
+from io import BytesIO
 
 import pytest
 
 from src.clients.dify_client import CardGenerationResult, PreprocessResult
+from src.services.cache import CardResultCache, PreprocessCache
 from src.services.pipeline import PipelineService
+from src.utils.cache import MemoryCacheBackend, ResultCache
 from src.utils.errors import AppException, ErrorCode, ExternalServiceError
+from src.utils.metrics import HIGHLIGHT_BYTES_SAVED
 
 
 class DummyPreprocessClient:
     def __init__(self, result: PreprocessResult):
         self.result = result
+        self.calls = 0
 
     async def analyze(self, **kwargs):
+        self.calls += 1
         self.kwargs = kwargs
         return self.result
 
@@ -40,7 +46,9 @@ class DummyElevenLabsClient:
     def __init__(self, should_fail: bool = False):
         self.should_fail = should_fail
 
-    async def synthesize_speech(self, text: str):
+    voice_id = "voice"
+
+    async def synthesize_speech(self, text: str, **kwargs):
         if self.should_fail:
             raise ExternalServiceError("tts", "fail")
         self.last_text = text
@@ -52,6 +60,9 @@ class DummyStorageService:
         self.highlight_data = None
         self.audio_data = None
 
+    async def upstream_image_url(self, image_url: str) -> str:
+        return image_url
+
     async def upload_highlight_image(self, data: bytes, extension: str = "png"):
         self.highlight_data = data
         return "https://files/highlight.png"
@@ -67,13 +78,14 @@ def build_service(
     card: CardGenerationResult,
     gemini_fail: bool = False,
     audio_fail: bool = False,
+    storage_service=None,
 ):
     return PipelineService(
         preprocess_client=DummyPreprocessClient(preprocess),
         card_client=DummyCardClient(card),
         gemini_client=DummyGeminiClient(should_fail=gemini_fail),
         elevenlabs_client=DummyElevenLabsClient(should_fail=audio_fail),
-        storage_service=DummyStorageService(),
+        storage_service=storage_service or DummyStorageService(),
         logger=type("Logger", (), {"info": lambda *a, **k: None, "warning": lambda *a, **k: None})(),
     )
 
@@ -117,3 +129,218 @@ def test_pipeline_downgrades_when_highlight_fails():
         assert result["audio_url"] is None
 
     asyncio.run(run())
+
+
+def test_pipeline_uploads_highlight_and_audio_concurrently():
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    active = 0
+    peak = 0
+
+    class OverlapStorageService(DummyStorageService):
+        async def _track(self):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+
+        async def upload_highlight_image(self, data: bytes, extension: str = "png"):
+            await self._track()
+            return await super().upload_highlight_image(data, extension)
+
+        async def upload_audio(self, data: bytes, extension: str = "mp3"):
+            await self._track()
+            return await super().upload_audio(data, extension)
+
+    service = build_service(preprocess=preprocess, card=card, storage_service=OverlapStorageService())
+    asyncio.run(service.generate_card({"image_url": "http://img"}))
+    assert peak == 2
+
+
+def test_pipeline_serves_repeated_request_from_cache():
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    service = build_service(preprocess=preprocess, card=card)
+    service.result_cache = CardResultCache(ResultCache(MemoryCacheBackend(ttl_seconds=60, max_entries=10)))
+
+    async def run():
+        first = await service.generate_card({"image_url": "http://img", "user_preference": "Biology"})
+        service.preprocess_client.result = PreprocessResult(image_status="unclear")
+        second = await service.generate_card({"image_url": "http://img", "user_preference": "biology"})
+        assert second == first
+
+    asyncio.run(run())
+    assert service.result_cache.stats()["hits"] == 1
+
+
+def test_pipeline_does_not_cache_degraded_result():
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    service = build_service(preprocess=preprocess, card=card, gemini_fail=True)
+    service.result_cache = CardResultCache(ResultCache(MemoryCacheBackend(ttl_seconds=60, max_entries=10)))
+
+    asyncio.run(service.generate_card({"image_url": "http://img"}))
+    assert service.result_cache.stats()["size"] == 0
+
+
+def test_pipeline_audio_does_not_wait_for_highlight():
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    order = []
+
+    class SlowGeminiClient(DummyGeminiClient):
+        async def highlight_object(self, **kwargs):
+            await asyncio.sleep(0.05)
+            order.append("highlight")
+            return b"img-bytes"
+
+    class RecordingStorageService(DummyStorageService):
+        async def upload_audio(self, data: bytes, extension: str = "mp3"):
+            order.append("audio")
+            return await super().upload_audio(data, extension)
+
+    service = build_service(preprocess=preprocess, card=card, storage_service=RecordingStorageService())
+    service.gemini_client = SlowGeminiClient()
+    service.card_pipeline = service._build_card_pipeline(
+        stage_retries=0, retry_backoff=0, optional_stage_timeout=None, optional_stage_max_concurrency=None
+    )
+
+    result = asyncio.run(service.generate_card({"image_url": "http://img"}))
+    assert result["highlighted_image_url"] == "https://files/highlight.png"
+    assert order == ["audio", "highlight"]
+
+
+def test_pipeline_stream_emits_stages_as_they_complete():
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    service = build_service(preprocess=preprocess, card=card)
+
+    async def run():
+        return [event async for event in service.generate_card_stream({"image_url": "http://img"})]
+
+    events = asyncio.run(run())
+    names = [name for name, _ in events]
+
+    assert names[0] == "central_object"
+    assert sorted(names[1:4]) == ["audio_url", "card", "highlighted_image_url"]
+    assert names.index("card") < names.index("audio_url")
+    assert ("card", {"title": "Title", "desc": "Desc"}) in events
+    assert events[-1] == ("done", {
+        "title": "Title",
+        "desc": "Desc",
+        "central_object": "camera",
+        "highlighted_image_url": "https://files/highlight.png",
+        "highlighted_thumbnail_url": None,
+        "audio_url": "https://files/audio.mp3",
+    })
+
+
+def test_pipeline_stream_raises_for_unclear_image():
+    service = build_service(
+        preprocess=PreprocessResult(image_status="unclear"),
+        card=CardGenerationResult(title="Title", desc="Desc"),
+    )
+
+    async def run():
+        with pytest.raises(AppException):
+            async for _ in service.generate_card_stream({"image_url": "http://img"}):
+                pass
+
+    asyncio.run(run())
+
+
+def test_pipeline_reuses_preprocess_result_for_new_preference():
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    service = build_service(preprocess=preprocess, card=card)
+    service.preprocess_cache = PreprocessCache(ResultCache(MemoryCacheBackend(ttl_seconds=60, max_entries=10)))
+    service.card_pipeline = service._build_card_pipeline(
+        stage_retries=0, retry_backoff=0, optional_stage_timeout=None, optional_stage_max_concurrency=None
+    )
+
+    async def run():
+        await service.generate_card({"image_url": "http://img", "user_preference": "biology"})
+        result = await service.generate_card({"image_url": "http://img", "user_preference": "physics"})
+        assert result["central_object"] == "camera"
+        assert service.card_client.kwargs["user_preference"] == "physics"
+
+    asyncio.run(run())
+    assert service.preprocess_client.calls == 1
+
+
+def test_pipeline_coalesces_identical_concurrent_requests():
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    service = build_service(preprocess=preprocess, card=card)
+    payload = {"image_url": "http://img", "user_preference": "biology"}
+
+    async def run():
+        return await asyncio.gather(
+            service.generate_card(dict(payload)),
+            service.generate_card(dict(payload)),
+            service.generate_card({**payload, "user_preference": "physics"}),
+        )
+
+    first, second, other = asyncio.run(run())
+
+    assert first is second
+    assert other is not first
+    assert service.preprocess_client.calls == 2
+
+
+def test_pipeline_sends_upstream_derivative_to_vision_stages():
+    class DerivativeStorageService(DummyStorageService):
+        async def upstream_image_url(self, image_url: str) -> str:
+            return "http://img.upstream.webp"
+
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    service = build_service(preprocess=preprocess, card=card, storage_service=DerivativeStorageService())
+
+    asyncio.run(service.generate_card({"image_url": "http://img", "user_preference": "biology"}))
+
+    assert service.preprocess_client.kwargs["image_url"] == "http://img.upstream.webp"
+    assert service.card_client.kwargs["image_url"] == "http://img.upstream.webp"
+
+
+def test_pipeline_transcodes_highlight_to_webp_with_thumbnail():
+    image_module = pytest.importorskip("PIL.Image")
+    png = BytesIO()
+    image_module.effect_noise((800, 600), 64).convert("RGB").save(png, format="PNG")
+
+    class PngGeminiClient(DummyGeminiClient):
+        async def highlight_object(self, **kwargs):
+            return png.getvalue()
+
+    class VariantStorageService(DummyStorageService):
+        async def upload_highlight_image(self, data: bytes, extension: str = "png"):
+            self.highlight_data = data
+            return f"https://files/highlight.{extension}"
+
+        async def upload_highlight_thumbnail(self, data: bytes, extension: str = "webp"):
+            self.thumbnail_data = data
+            return f"https://files/thumbnail.{extension}"
+
+    preprocess = PreprocessResult(image_status="clear", central_object="camera")
+    card = CardGenerationResult(title="Title", desc="Desc")
+    storage = VariantStorageService()
+    service = build_service(preprocess=preprocess, card=card, storage_service=storage)
+    service.gemini_client = PngGeminiClient()
+    service.card_pipeline = service._build_card_pipeline(
+        stage_retries=0,
+        retry_backoff=0,
+        optional_stage_timeout=None,
+        optional_stage_max_concurrency=None,
+        highlight_thumbnail_max_edge=100,
+    )
+    saved_before = HIGHLIGHT_BYTES_SAVED.value()
+
+    result = asyncio.run(service.generate_card({"image_url": "http://img"}))
+
+    assert result["highlighted_image_url"] == "https://files/highlight.webp"
+    assert result["highlighted_thumbnail_url"] == "https://files/thumbnail.webp"
+    assert image_module.open(BytesIO(storage.highlight_data)).size == (800, 600)
+    assert image_module.open(BytesIO(storage.thumbnail_data)).size == (100, 75)
+    saved = HIGHLIGHT_BYTES_SAVED.value() - saved_before
+    assert saved == len(png.getvalue()) - len(storage.highlight_data) > 0
@@ -0,0 +1,55 @@
+import pytest
+
+from src.models.response import CardGenerationResponse
+from src.utils import serialization
+from src.utils.serialization import FastJSONResponse, JSONDecodeError, ModelResponse, dumps, parse_fenced_json
+
+
+@pytest.mark.parametrize(
+    "answer",
+    [
+        '{"title": "叶子"}',
+        '  ```json\n{"title": "叶子"}\n```  ',
+        '```JSON {"title": "叶子"}```',
+        '```\n{"title": "叶子"}\n```',
+    ],
+)
+def test_parse_fenced_json_accepts_plain_and_fenced_answers(answer):
+    assert parse_fenced_json(answer) == {"title": "叶子"}
+
+
+def test_parse_fenced_json_raises_stdlib_decode_error():
+    with pytest.raises(JSONDecodeError):
+        parse_fenced_json("```json\nnot json\n```")
+    with pytest.raises(JSONDecodeError):
+        parse_fenced_json("```")
+
+
+def test_stdlib_fallback_matches_orjson_output(monkeypatch):
+    data = {"title": "叶子", "tags": [1, 2.5, None, True]}
+    fast = dumps(data)
+    monkeypatch.setattr(serialization, "orjson", None)
+
+    assert dumps(data) == fast == '{"title":"叶子","tags":[1,2.5,null,true]}'.encode("utf-8")
+    assert parse_fenced_json("```json\n" + fast.decode("utf-8") + "\n```") == data
+
+
+def test_fast_json_response_keeps_unicode():
+    assert FastJSONResponse({"desc": "叶"}).body == '{"desc":"叶"}'.encode("utf-8")
+
+
+def test_model_response_serializes_model_directly():
+    response = ModelResponse(CardGenerationResponse(title="叶子", desc="desc"), status_code=202, headers={"X-A": "1"})
+
+    assert response.status_code == 202
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["x-a"] == "1"
+    assert serialization.loads(response.body) == {
+        "success": True,
+        "title": "叶子",
+        "desc": "desc",
+        "central_object": None,
+        "highlighted_image_url": None,
+        "highlighted_thumbnail_url": None,
+        "audio_url": None,
+    }
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from src.utils import deadline, tracing
+from src.utils.singleflight import SingleFlight
+
+
+def test_singleflight_shares_result_between_concurrent_callers():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        assert len(flight) == 0
+        return results
+
+    results = asyncio.run(run())
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_singleflight_propagates_exception_to_every_waiter():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert [str(result) for result in results] == ["boom", "boom", "boom"]
+
+
+def test_singleflight_survives_one_waiter_cancelling():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        flight = SingleFlight()
+        leaving = asyncio.create_task(flight.do("key", work))
+        staying = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_singleflight_cancels_shared_task_when_all_waiters_leave():
+    started = []
+
+    async def work():
+        started.append(asyncio.current_task())
+        await asyncio.sleep(10)
+
+    async def run():
+        flight = SingleFlight()
+        waiter = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert len(flight) == 0
+        return started[0]
+
+    task = asyncio.run(run())
+
+    assert task.cancelled()
+
+
+def test_singleflight_shared_task_runs_to_latest_waiter_deadline():
+    budgets = []
+
+    async def work():
+        budgets.append(deadline.remaining())
+        await asyncio.sleep(0.02)
+        budgets.append(deadline.remaining())
+
+    async def waiter(flight, seconds):
+        with deadline.deadline_scope(seconds):
+            await flight.do("key", work)
+
+    async def run(late_budget):
+        flight = SingleFlight()
+        first = asyncio.create_task(waiter(flight, 0.5))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(first, waiter(flight, late_budget))
+
+    asyncio.run(run(5))
+    assert budgets[0] <= 0.5 and 4 < budgets[1] <= 5
+    budgets.clear()
+    asyncio.run(run(None))
+    assert budgets[0] <= 0.5 and budgets[1] is None
+
+
+def test_singleflight_records_shared_spans_under_every_waiter():
+    async def work():
+        tracing.record_span("card", 0.25)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def waiter(flight):
+        spans = tracing.detach_spans()
+        tracing.record_span("own", 0.5)
+        await flight.do("key", work)
+        return spans
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(waiter(flight), waiter(flight), waiter(flight))
+
+    assert asyncio.run(run()) == [{"own": 0.5, "card": 0.25}] * 3
@@ -0,0 +1,21 @@
+from src.utils.sse import SSEDecoder, format_sse
+
+
+def test_decoder_joins_multiline_data_and_skips_comments():
+    decoder = SSEDecoder()
+    lines = [": keepalive", "event: update", "data: first", "data: second", ""]
+
+    events = [event for event in (decoder.feed(line) for line in lines) if event]
+
+    assert events == [("update", "first\nsecond")]
+
+
+def test_decoder_flushes_trailing_event_without_blank_line():
+    decoder = SSEDecoder()
+    assert decoder.feed("data:{}") is None
+    assert decoder.flush() == ("message", "{}")
+    assert decoder.flush() is None
+
+
+def test_format_sse_keeps_unicode():
+    assert format_sse("card", {"title": "叶"}) == 'event: card\ndata: {"title":"叶"}\n\n'.encode("utf-8")
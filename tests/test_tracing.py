@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import cards
+from src.clients.http_pool import build_http_client
+from src.main import app
+from src.utils.tracing import TracingMiddleware, format_server_timing, record_span
+
+
+class SpanPipelineService:
+    async def generate_card(self, payload):
+        record_span("preprocess", 0.012)
+        record_span("dify-card", 0.2)
+        record_span("dify-card", 0.1)
+        return {"title": "t", "desc": "d"}
+
+
+def test_format_server_timing_lists_spans_and_total():
+    assert format_server_timing({"preprocess": 0.0123, "card": 1.5}, total=2) == (
+        "preprocess;dur=12.3, card;dur=1500.0, total;dur=2000.0"
+    )
+
+
+def test_generate_response_carries_server_timing_and_request_id():
+    app.dependency_overrides[cards.get_service] = lambda: SpanPipelineService()
+    try:
+        response = TestClient(app).post(
+            "/api/v1/cards/generate",
+            json={"image_url": "http://img.example.com/a.jpg"},
+            headers={"X-Request-ID": "req-123"},
+        )
+    finally:
+        app.dependency_overrides.pop(cards.get_service, None)
+
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "req-123"
+    timing = response.headers["server-timing"]
+    assert "preprocess;dur=12.0" in timing
+    assert "dify-card;dur=300.0" in timing
+    assert "total;dur=" in timing
+
+
+def test_invalid_request_id_is_replaced():
+    response = TestClient(app).get("/health", headers={"X-Request-ID": "bad id!"})
+
+    assert response.headers["x-request-id"] != "bad id!"
+    assert len(response.headers["x-request-id"]) == 32
+
+
+def test_trace_id_is_forwarded_to_upstream_requests():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("X-Request-ID"))
+        return httpx.Response(200)
+
+    upstream = build_http_client(transport=httpx.MockTransport(handler))
+    inner = FastAPI()
+
+    @inner.get("/call")
+    async def call():
+        await upstream.get("http://upstream/")
+        return {}
+
+    client = TestClient(TracingMiddleware(inner))
+    client.get("/call", headers={"X-Request-ID": "trace-1"})
+    response = client.get("/call")
+    asyncio.run(upstream.aclose())
+
+    assert seen == ["trace-1", response.headers["x-request-id"]]